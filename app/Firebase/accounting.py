@@ -0,0 +1,345 @@
+# accounting.py
+"""
+Firestore operation accounting.
+
+`CountingClient` wraps the Firestore client so every document read, query and
+write is counted against the request scope that is active in the current
+thread/task (see `request_scope`). A scope can carry a read budget; going over
+it raises `ReadBudgetExceeded` in the middle of the scan instead of letting it run.
+
+Inside a `unit_of_work()` block, document gets and query results are memoized
+(identity map): the same document or query is read from Firestore at most once,
+query results also answer later gets of their documents, and any write to a
+collection drops what was cached for it. Reads answered from the map are counted
+as `cached_reads` instead of `reads`.
+"""
+import contextvars
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+# 0 = unlimited. Applies to every request scope unless overridden per scope.
+FIRESTORE_READ_BUDGET = int(os.getenv("FIRESTORE_READ_BUDGET", "0"))
+
+
+class ReadBudgetExceeded(RuntimeError):
+    pass
+
+
+class RequestStats:
+    def __init__(self, intent="unknown", read_budget=None):
+        self.intent = intent
+        self.read_budget = FIRESTORE_READ_BUDGET if read_budget is None else read_budget
+        self.reads = 0
+        self.queries = 0
+        self.writes = 0
+        self.cached_reads = 0
+
+    def as_dict(self):
+        return {"intent": self.intent, "reads": self.reads, "queries": self.queries, "writes": self.writes,
+                "cached_reads": self.cached_reads}
+
+
+_current = contextvars.ContextVar("firestore_request", default=None)
+_unit = contextvars.ContextVar("firestore_unit_of_work", default=None)
+_totals_lock = threading.Lock()
+_totals = defaultdict(lambda: {"reads": 0, "queries": 0, "writes": 0, "cached_reads": 0})  # intent -> counts
+
+
+@contextmanager
+def request_scope(intent="unknown", read_budget=None):
+    """ Count Firestore operations done inside the block; yields the RequestStats. """
+    stats = RequestStats(intent, read_budget)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        with _totals_lock:
+            t = _totals[stats.intent]
+            t["reads"] += stats.reads
+            t["queries"] += stats.queries
+            t["writes"] += stats.writes
+            t["cached_reads"] += stats.cached_reads
+
+
+def current_stats():
+    return _current.get()
+
+
+def totals():
+    """ Cumulative counts per intent (operations outside any scope are under 'unscoped'). """
+    with _totals_lock:
+        return {k: dict(v) for k, v in _totals.items()}
+
+
+def _add(reads=0, queries=0, writes=0, cached_reads=0):
+    stats = _current.get()
+    if stats is None:
+        with _totals_lock:
+            t = _totals["unscoped"]
+            t["reads"] += reads
+            t["queries"] += queries
+            t["writes"] += writes
+            t["cached_reads"] += cached_reads
+        return
+    stats.reads += reads
+    stats.queries += queries
+    stats.writes += writes
+    stats.cached_reads += cached_reads
+    if reads and stats.read_budget and stats.reads > stats.read_budget:
+        raise ReadBudgetExceeded(
+            f"Firestore read budget exceeded for '{stats.intent}': "
+            f"{stats.reads} reads > budget of {stats.read_budget}"
+        )
+
+
+# ---------------------- Identity map ---------------------- #
+
+class IdentityMap:
+    """ Snapshots read during one unit of work: document path -> snapshot, query key -> [snapshots]. """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # prefetch / fan-out threads share the caller's map
+        self._docs = {}
+        self._queries = {}
+
+    def document(self, path):
+        with self._lock:
+            return self._docs.get(path)
+
+    def query(self, key):
+        with self._lock:
+            return self._queries.get(key)
+
+    def remember_document(self, path, snap):
+        with self._lock:
+            self._docs[path] = snap
+
+    def remember_query(self, key, snaps):
+        with self._lock:
+            self._queries[key] = snaps
+            for snap in snaps:
+                self._docs[snap.reference.path] = snap
+
+    def invalidate(self, path):
+        """ A write to `path` (a document, or a collection for add()) drops its collection's cached reads. """
+        parts = path.split("/")
+        collection_id = parts[-2] if len(parts) % 2 == 0 else parts[-1]
+        with self._lock:
+            self._docs.pop(path, None)
+            for key in [k for k in self._queries if _collection_id(k) == collection_id]:
+                del self._queries[key]
+            if len(parts) % 2 == 1:
+                for doc_path in [p for p in self._docs if p.split("/")[-2] == collection_id]:
+                    del self._docs[doc_path]
+
+
+def _collection_id(key):
+    """ Last collection segment of a query key ("collection", "barbers/x/barber_appointments") -> "barber_appointments". """
+    return key[0][1].rsplit("/", 1)[-1]
+
+
+@contextmanager
+def unit_of_work():
+    """ Memoize document and query reads inside the block (nested blocks share the outer map). """
+    if _unit.get() is not None:
+        yield _unit.get()
+        return
+    identity_map = IdentityMap()
+    token = _unit.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _unit.reset(token)
+
+
+def _invalidate(path):
+    identity_map = _unit.get()
+    if identity_map is not None and path:
+        identity_map.invalidate(path)
+
+
+def _freeze(value):
+    """ Hashable form of a query-builder argument, or raise TypeError. """
+    if isinstance(value, CountingSnapshot):
+        return ("snapshot", value.reference.path)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    hash(value)
+    return value
+
+
+# ---------------------- Wrappers ---------------------- #
+
+class _Proxy:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def _unwrap(value):
+    return value._inner if isinstance(value, _Proxy) else value
+
+
+class CountingSnapshot(_Proxy):
+    """ Document snapshot whose `.reference` keeps counting writes (e.g. `.reference.delete()`). """
+
+    @property
+    def reference(self):
+        return CountingDocument(self._inner.reference)
+
+
+class CountingDocument(_Proxy):
+    def get(self, *args, **kwargs):
+        identity_map = _unit.get()
+        if identity_map is not None and not args and not kwargs:
+            snap = identity_map.document(self._inner.path)
+            if snap is not None:
+                _add(cached_reads=1)
+                return CountingSnapshot(snap)
+        snap = self._inner.get(*args, **kwargs)
+        _add(reads=1)  # a missing document is still billed as one read
+        if identity_map is not None and not args and not kwargs:
+            identity_map.remember_document(self._inner.path, snap)
+        return CountingSnapshot(snap)
+
+    def set(self, *args, **kwargs):
+        _add(writes=1)
+        _invalidate(self._inner.path)
+        return self._inner.set(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        _add(writes=1)
+        _invalidate(self._inner.path)
+        return self._inner.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        _add(writes=1)
+        _invalidate(self._inner.path)
+        return self._inner.delete(*args, **kwargs)
+
+    def collection(self, collection_id):
+        return CountingQuery(self._inner.collection(collection_id),
+                             key=(("collection", f"{self._inner.path}/{collection_id}"),))
+
+
+class CountingQuery(_Proxy):
+    """
+    Wraps a CollectionReference / Query; chained query builders stay wrapped. `key` describes
+    the query (collection + builder calls) for the identity map; None = never memoized.
+    """
+
+    def __init__(self, inner, key=None):
+        super().__init__(inner)
+        self._key = key
+
+    def _wrap(name):
+        def method(self, *args, **kwargs):
+            key = None
+            if self._key is not None:
+                try:
+                    key = self._key + ((name, _freeze(args), _freeze(kwargs)),)
+                except TypeError:
+                    pass
+            args = [_unwrap(a) for a in args]  # e.g. start_after(snapshot)
+            return CountingQuery(getattr(self._inner, name)(*args, **kwargs), key=key)
+        method.__name__ = name
+        return method
+
+    where = _wrap("where")
+    limit = _wrap("limit")
+    limit_to_last = _wrap("limit_to_last")
+    offset = _wrap("offset")
+    order_by = _wrap("order_by")
+    select = _wrap("select")
+    start_at = _wrap("start_at")
+    start_after = _wrap("start_after")
+    end_at = _wrap("end_at")
+    end_before = _wrap("end_before")
+    del _wrap
+
+    def stream(self, *args, **kwargs):
+        identity_map = _unit.get() if self._key is not None and not args and not kwargs else None
+        if identity_map is not None:
+            cached = identity_map.query(self._key)
+            if cached is not None:
+                _add(cached_reads=max(1, len(cached)))
+                for snap in cached:
+                    yield CountingSnapshot(snap)
+                return
+        _add(queries=1)
+        snaps = []
+        for snap in self._inner.stream(*args, **kwargs):
+            snaps.append(snap)
+            _add(reads=1)  # raises mid-scan once the budget is gone
+            yield CountingSnapshot(snap)
+        if not snaps:
+            _add(reads=1)  # queries are billed at least one read
+        if identity_map is not None:
+            identity_map.remember_query(self._key, snaps)  # only complete scans are memoized
+
+    def get(self, *args, **kwargs):
+        # Stream instead of a bulk get so a runaway scan can be stopped early
+        return list(self.stream(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return CountingDocument(self._inner.document(*args, **kwargs))
+
+    def add(self, *args, **kwargs):
+        _add(writes=1)
+        if self._key is not None:
+            _invalidate(self._key[0][1])
+        return self._inner.add(*args, **kwargs)
+
+
+class CountingBatch(_Proxy):
+    """ Batched writes; cached reads of the written documents are dropped on commit too. """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self._paths = []
+
+    def _written(self, ref):
+        ref = _unwrap(ref)
+        self._paths.append(ref.path)
+        _invalidate(ref.path)
+        return ref
+
+    def set(self, ref, *args, **kwargs):
+        _add(writes=1)
+        return self._inner.set(self._written(ref), *args, **kwargs)
+
+    def update(self, ref, *args, **kwargs):
+        _add(writes=1)
+        return self._inner.update(self._written(ref), *args, **kwargs)
+
+    def delete(self, ref, *args, **kwargs):
+        _add(writes=1)
+        return self._inner.delete(self._written(ref), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        try:
+            return self._inner.commit(*args, **kwargs)
+        finally:
+            for path in self._paths:
+                _invalidate(path)
+
+
+class CountingClient(_Proxy):
+    def collection(self, *path):
+        return CountingQuery(self._inner.collection(*path), key=(("collection", "/".join(path)),))
+
+    def collection_group(self, collection_id):
+        return CountingQuery(self._inner.collection_group(collection_id), key=(("group", collection_id),))
+
+    def document(self, *args, **kwargs):
+        return CountingDocument(self._inner.document(*args, **kwargs))
+
+    def batch(self, *args, **kwargs):
+        return CountingBatch(self._inner.batch(*args, **kwargs))
@@ -0,0 +1,218 @@
+# archive.py
+"""
+Archival of old appointments.
+
+Appointments whose date is older than the horizon (ARCHIVE_HORIZON_DAYS, default 30)
+are moved out of the hot appointment storage (flat collection and/or barber partitions,
+see layout.py), in batched writes, either to
+    firestore: appointments_archive_YYYY_MM (same document id; copy + delete in one batch)
+    file:      <dir>/appointments-YYYY-MM.jsonl.gz (originals deleted only after the file is synced)
+so live queries only scan the current window. History stays available through
+get_appointment_history() / get_archived_appointments_for_user().
+
+    python archive.py run --horizon-days 30 --target firestore --dry-run
+    python archive.py run --target file --dir ../../archive
+    python archive.py history someone@example.com --months 2025-01:2025-06
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+try:
+    from Firebase import firebase_utils as fu
+except ImportError:
+    import firebase_utils as fu
+
+# ---------------- CONFIG ----------------
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "30"))
+ARCHIVE_TARGET = os.getenv("ARCHIVE_TARGET", "firestore")        # firestore | file
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_BATCH_SIZE = 200   # 2 writes per document; a Firestore batch holds at most 500
+
+
+def archive_collection(month):
+    """ "2025-03" -> "appointments_archive_2025_03" """
+    return "appointments_archive_" + month.replace("-", "_")
+
+
+def cutoff_date(horizon_days=ARCHIVE_HORIZON_DAYS):
+    return (fu._now_local().date() - timedelta(days=horizon_days)).strftime("%Y-%m-%d")
+
+
+def _months(start, end):
+    """ Inclusive list of "YYYY-MM" between two "YYYY-MM" strings. """
+    y, m = map(int, start.split("-"))
+    ey, em = map(int, end.split("-"))
+    out = []
+    while (y, m) <= (ey, em):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+# ---------------- Archival job ----------------
+def _old_appointments(source, cutoff, batch_size, after=None):
+    q = source.where("date", "<", cutoff).order_by("date").limit(batch_size)
+    if after is not None:
+        q = q.start_after(after)
+    return list(q.stream())
+
+
+def _write_file_batch(directory, docs):
+    """ Append docs to their month's .jsonl.gz and fsync before the originals are deleted. """
+    by_month = defaultdict(list)
+    for doc in docs:
+        by_month[doc.get("date")[:7]].append(doc)
+    for month, month_docs in by_month.items():
+        path = os.path.join(directory, f"appointments-{month}.jsonl.gz")
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                for doc in month_docs:
+                    gz.write((json.dumps(dict(doc.to_dict(), _id=doc.id), default=str) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def archive_old_appointments(horizon_days=ARCHIVE_HORIZON_DAYS, target=ARCHIVE_TARGET, directory=ARCHIVE_DIR,
+                             batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, max_docs=None):
+    """ Move appointments dated before today - horizon_days. Returns a report dict. """
+    if target not in ("firestore", "file"):
+        raise ValueError(f"Unknown archive target {target!r}")
+    cutoff = cutoff_date(horizon_days)
+    if target == "file" and not dry_run:
+        os.makedirs(directory, exist_ok=True)
+    moved = defaultdict(int)
+    batches = 0
+    start = time.perf_counter()
+    cursor = None
+
+    layout = fu.appointments
+    # in dual mode every copy is deleted with the flat one, so the partition pass only sees the rest
+    batch_size = min(batch_size, 160) if layout.layout == "dual" else batch_size   # 3 writes per document
+    seen = set()
+
+    with fu.request_scope("archive", read_budget=0) as ops:  # batch job: the per-turn budget does not apply
+        for source in layout.sources():
+            cursor = None
+            while True:
+                limit = batch_size if max_docs is None else min(batch_size, max_docs - sum(moved.values()))
+                if limit <= 0:
+                    break
+                # Moved documents leave the query, so each batch re-reads from the start (cursor only for dry runs)
+                docs = _old_appointments(source, cutoff, limit, after=cursor if dry_run else None)
+                if not docs:
+                    break
+                fresh = [d for d in docs if d.id not in seen]
+                seen.update(d.id for d in docs)
+                if dry_run:
+                    cursor = docs[-1]
+                elif target == "file":
+                    _write_file_batch(directory, fresh)
+                    batch = fu.db.batch()
+                    for doc in docs:
+                        layout.delete_in(batch, doc)
+                    batch.commit()
+                else:
+                    batch = fu.db.batch()
+                    for doc in docs:
+                        data = doc.to_dict()
+                        data["archivedAt"] = fu.gcf.SERVER_TIMESTAMP
+                        batch.set(fu.db.collection(archive_collection(data["date"][:7])).document(doc.id), data)
+                        layout.delete_in(batch, doc)
+                    batch.commit()
+                for doc in fresh:
+                    moved[doc.get("date")[:7]] += 1
+                batches += 1
+                if len(docs) < limit:
+                    break
+
+    report = {
+        "cutoff": cutoff,
+        "target": target,
+        "dry_run": dry_run,
+        "moved": sum(moved.values()),
+        "by_month": dict(sorted(moved.items())),
+        "batches": batches,
+        "seconds": round(time.perf_counter() - start, 2),
+        "firestore": ops.as_dict(),
+    }
+    verb = "Would move" if dry_run else "Moved"
+    print(f"✅ {verb} {report['moved']} appointments dated before {cutoff} → {target} "
+          f"in {batches} batches ({report['seconds']}s)")
+    return report
+
+
+# ---------------- History API ----------------
+def get_archived_appointments_for_user(user_email, start_month=None, end_month=None,
+                                       target=ARCHIVE_TARGET, directory=ARCHIVE_DIR):
+    """
+    Archived appointments of a user between two "YYYY-MM" months (inclusive; default: the
+    12 months before the archive cutoff).
+    """
+    end_month = end_month or cutoff_date()[:7]
+    if not start_month:
+        y, m = map(int, end_month.split("-"))
+        first = y * 12 + (m - 1) - 11
+        start_month = f"{first // 12:04d}-{first % 12 + 1:02d}"
+    months = _months(start_month, end_month)
+    results = []
+    if target == "file":
+        wanted = {os.path.join(directory, f"appointments-{m}.jsonl.gz") for m in months}
+        for path in sorted(p for p in glob.glob(os.path.join(directory, "appointments-*.jsonl.gz")) if p in wanted):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    if rec.get("userId") == user_email:
+                        results.append(rec)
+    else:
+        for m in months:
+            docs = fu.db.collection(archive_collection(m)).where("userId", "==", user_email).stream()
+            results.extend(dict(d.to_dict(), _id=d.id) for d in docs)
+    return sorted(results, key=lambda a: (a.get("date", ""), a.get("time", "")))
+
+
+def get_appointment_history(user_email, start_month=None, end_month=None, target=ARCHIVE_TARGET,
+                            directory=ARCHIVE_DIR):
+    """ Archived + live appointments of a user, oldest first. """
+    live = [dict(a, archived=False) for a in fu.get_appointments_for_user(user_email)]
+    archived = [dict(a, archived=True) for a in
+                get_archived_appointments_for_user(user_email, start_month, end_month, target, directory)]
+    return sorted(archived + live, key=lambda a: (a.get("date", ""), a.get("time", "")))
+
+
+# ---------------- CLI ----------------
+def main():
+    ap = argparse.ArgumentParser(description="Archive old appointments / query archived history")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="Move appointments older than the horizon")
+    r.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS)
+    r.add_argument("--target", choices=["firestore", "file"], default=ARCHIVE_TARGET)
+    r.add_argument("--dir", default=ARCHIVE_DIR, help="Folder for --target file")
+    r.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    r.add_argument("--max-docs", type=int, default=None, help="Stop after this many documents")
+    r.add_argument("--dry-run", action="store_true")
+    h = sub.add_parser("history", help="Archived + live appointments of a user")
+    h.add_argument("user_email")
+    h.add_argument("--months", default=None, help="YYYY-MM:YYYY-MM (default: last 12 archived months)")
+    h.add_argument("--target", choices=["firestore", "file"], default=ARCHIVE_TARGET)
+    h.add_argument("--dir", default=ARCHIVE_DIR)
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        report = archive_old_appointments(args.horizon_days, args.target, args.dir,
+                                          min(args.batch_size, 250), args.dry_run, args.max_docs)
+        print(json.dumps(report, indent=2))
+    else:
+        start, end = (args.months.split(":") + [None])[:2] if args.months else (None, None)
+        for a in get_appointment_history(args.user_email, start, end, args.target, args.dir):
+            flag = "archived" if a["archived"] else "live"
+            print(f"{a.get('date')} {a.get('time')}  {a.get('barberName')}  {a.get('status')}  ({flag})")
+
+
+if __name__ == "__main__":
+    main()
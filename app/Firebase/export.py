@@ -0,0 +1,348 @@
+# export.py
+"""
+Appointment export for shop owners (CSV, or Parquet when pyarrow is installed).
+
+Appointments between two dates are paged out of Firestore with query cursors
+(EXPORT_PAGE_SIZE documents per page) and streamed through generators into the writer, so
+memory stays constant however many rows there are:
+
+    pages (cursor queries) -> rows (flat dicts) -> CSV file / Parquet part files
+
+Months moved out by archive.py are read back from the archive (ARCHIVE_TARGET /
+ARCHIVE_DIR) before the live storage, so old periods export complete.
+
+After every page the output is flushed and a checkpoint (<output>.ckpt: cursor + bytes or
+parts written) is saved; an interrupted export started again with the same arguments
+continues from there. The checkpoint is removed when the export completes. While an export
+runs, <output>.lock holds its pid, so a second export to the same output fails instead of
+writing into the same file.
+
+    python export.py day 2025-06-01
+    python export.py month 2025-06 --format parquet
+    python export.py range 2025-01-01 2025-03-31 --out q1.csv
+"""
+import argparse
+import calendar
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+try:
+    from Firebase import firebase_utils as fu
+    from Firebase import archive
+except ImportError:
+    import firebase_utils as fu
+    import archive
+
+# ---------------- CONFIG ----------------
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+FIELDS = ["id", "date", "time", "barberId", "barberName", "userId", "serviceId", "serviceName",
+          "duration", "status", "createdAt", "updatedAt"]
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def period_range(period, value):
+    """ ("day", "2025-06-01") / ("month", "2025-06") -> (first date, last date, label) """
+    if period == "day":
+        day = datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+        return day, day, day
+    if period == "month":
+        y, m = map(int, datetime.strptime(value, "%Y-%m").strftime("%Y-%m").split("-"))
+        return f"{y:04d}-{m:02d}-01", f"{y:04d}-{m:02d}-{calendar.monthrange(y, m)[1]:02d}", f"{y:04d}-{m:02d}"
+    raise ValueError(f"Unknown period {period!r} (day or month)")
+
+
+# ---------------- Reading ----------------
+def _source():
+    """ Where to read from: during a dual-layout cutover the flat collection still holds every appointment. """
+    layout = fu.appointments
+    return layout.flat() if layout.uses_flat else layout.partitions()
+
+
+def _query_pages(make_query, end_date, page_size, cursor=None):
+    """
+    Pages of one Firestore source. make_query(first_date) is that source's query for
+    first_date..end_date ordered by (date, document); `cursor` is {"date", "path"} of the
+    last exported document.
+    """
+    base = make_query()
+    after, skip_until = None, None
+    if cursor:
+        snap = fu.db.document(cursor["path"]).get()
+        if snap.exists:
+            after = snap
+        else:  # the last exported document is gone (archived/cancelled): restart at its date and skip
+            base = make_query(cursor["date"])
+            skip_until = (cursor["date"], tuple(cursor["path"].split("/")))
+    while True:
+        q = base.limit(page_size)
+        if after is not None:
+            q = q.start_after(after)
+        docs = list(q.stream())
+        if not docs:
+            return
+        after = docs[-1]
+        page = docs
+        if skip_until:
+            page = [d for d in docs if (d.get("date"), tuple(d.reference.path.split("/"))) > skip_until]
+            skip_until = None if page else skip_until  # sorted: once one row is past it, all are
+        if page:
+            yield page, {"date": docs[-1].get("date"), "path": docs[-1].reference.path}
+        if len(docs) < page_size:
+            return
+
+
+def _file_pages(path, start_date, end_date, page_size, cursor=None):
+    """ Pages of records from an archive .jsonl.gz; `cursor` is {"line"} of the last line read. """
+    if not os.path.exists(path):
+        return
+    skip = cursor["line"] if cursor else 0
+    page, line_no = [], 0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line_no <= skip:
+                continue
+            rec = json.loads(line)
+            if start_date <= rec.get("date", "") <= end_date:
+                page.append(rec)
+            if len(page) >= page_size:
+                yield page, {"line": line_no}
+                page = []
+    if page:
+        yield page, {"line": line_no}
+
+
+def _stages(start_date, end_date, page_size):
+    """
+    [(name, pages(cursor))]: the archive months of the range first (see archive.py), then the
+    live storage. Months that were never archived are simply empty.
+    """
+    def ordered(source):
+        return lambda first=start_date: source.where("date", ">=", first).where("date", "<=", end_date) \
+            .order_by("date").order_by("__name__")
+
+    stages = []
+    this_month = fu._now_local().strftime("%Y-%m")
+    for month in archive._months(start_date[:7], min(end_date[:7], this_month)):
+        if archive.ARCHIVE_TARGET == "file":
+            path = os.path.join(archive.ARCHIVE_DIR, f"appointments-{month}.jsonl.gz")
+            pages = lambda c, path=path: _file_pages(path, start_date, end_date, page_size, c)
+        else:
+            query = ordered(fu.db.collection(archive.archive_collection(month)))
+            pages = lambda c, query=query: _query_pages(query, end_date, page_size, c)
+        stages.append((f"archive:{month}", pages))
+    live = ordered(_source())
+    stages.append(("live", lambda c: _query_pages(live, end_date, page_size, c)))
+    return stages
+
+
+def iter_pages(start_date, end_date, page_size=EXPORT_PAGE_SIZE, cursor=None):
+    """
+    Yield (rows, cursor) pages of appointments dated start_date..end_date, archived ones
+    first. `cursor` (the last one yielded) says which stage to resume and where in it.
+    """
+    stages = _stages(start_date, end_date, page_size)
+    resume_at = cursor.get("stage", "live") if cursor else None
+    if resume_at and resume_at not in {name for name, _ in stages}:
+        raise RuntimeError(f"❌ Checkpoint stage {resume_at!r} no longer exists; delete the .ckpt file to start over")
+    for name, pages in stages:
+        if resume_at and name != resume_at:
+            continue  # finished before the checkpoint
+        stage_cursor, resume_at = (cursor if resume_at else None), None
+        for page, position in pages(stage_cursor):
+            yield page, dict(position, stage=name)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def to_rows(snapshots):
+    """ Snapshots, or archive-file records (dicts with "_id"), as FIELDS rows. """
+    for doc in snapshots:
+        if isinstance(doc, dict):
+            data, doc_id = doc, doc.get("_id")
+        else:
+            data, doc_id = doc.to_dict() or {}, doc.id
+        yield {f: _cell(doc_id if f == "id" else data.get(f)) for f in FIELDS}
+
+
+# ---------------- Checkpoint ----------------
+def _load_checkpoint(path, params):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        ckpt = json.load(f)
+    return ckpt if ckpt.get("params") == params else None
+
+
+def _save_checkpoint(path, ckpt):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _acquire_lock(path):
+    """ Create <output>.lock (O_EXCL) holding our pid; a lock left by a dead process is taken over. """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            with open(path, "r") as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            pid = 0
+        if pid and _pid_alive(pid):
+            raise RuntimeError(f"❌ An export to {path[:-5]} is already running (pid {pid})")
+        os.remove(path)
+        return _acquire_lock(path)
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+
+
+# ---------------- Writers ----------------
+def _write_csv(out, pages, ckpt, save):
+    exists = ckpt and os.path.exists(out)
+    with open(out, "r+" if exists else "w", newline="", encoding="utf-8") as f:
+        if exists:
+            f.truncate(ckpt["bytes"])  # drop anything written after the last checkpoint
+            f.seek(ckpt["bytes"])
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if not exists:
+            writer.writeheader()
+        for snapshots, cursor in pages:
+            writer.writerows(to_rows(snapshots))
+            f.flush()
+            os.fsync(f.fileno())
+            save(cursor, len(snapshots), bytes=f.tell())
+
+
+def _write_parquet(out, pages, ckpt, save):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("❌ Parquet export needs pyarrow (pip install pyarrow); use --format csv")
+    schema = pa.schema([(f, pa.int64() if f == "duration" else pa.string()) for f in FIELDS])
+    parts = ckpt["parts"] if ckpt else 0
+    if not ckpt and os.path.isdir(out):
+        shutil.rmtree(out)
+    os.makedirs(out, exist_ok=True)
+    for name in os.listdir(out):  # parts written after the last checkpoint
+        if not name.startswith("part-") or int(name[5:10]) >= parts:
+            os.remove(os.path.join(out, name))
+    for snapshots, cursor in pages:
+        rows = list(to_rows(snapshots))  # one page = one part file
+        columns = {f: [str(r[f]) for r in rows] for f in FIELDS}
+        columns["duration"] = [int(r["duration"]) if r["duration"] != "" else None for r in rows]
+        path = os.path.join(out, f"part-{parts:05d}.parquet")
+        pq.write_table(pa.table(columns, schema=schema), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        parts += 1
+        save(cursor, len(rows), parts=parts)
+
+
+def export_appointments(start_date, end_date, fmt="csv", out=None, page_size=EXPORT_PAGE_SIZE,
+                        directory=EXPORT_DIR, label=None):
+    """
+    Export appointments dated start_date..end_date (inclusive) to `out` (a .csv file, or a
+    folder of part-NNNNN.parquet files). Resumes from <out>.ckpt. Returns a report dict.
+    """
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unknown export format {fmt!r} (csv or parquet)")
+    label = label or (start_date if start_date == end_date else f"{start_date}_{end_date}")
+    out = out or os.path.join(directory, f"appointments-{label}" + (".csv" if fmt == "csv" else ""))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    ckpt_path = out.rstrip("/") + ".ckpt"
+    lock_path = out.rstrip("/") + ".lock"
+    _acquire_lock(lock_path)  # one writer per output file and checkpoint
+    try:
+        params = {"start": start_date, "end": end_date, "format": fmt, "layout": fu.appointments.layout,
+                  "archive": archive.ARCHIVE_TARGET}
+        ckpt = _load_checkpoint(ckpt_path, params)
+        if ckpt and not os.path.exists(out):
+            ckpt = None  # output removed since: start over
+        rows = ckpt["rows"] if ckpt else 0
+        resumed_from = rows
+
+        def save(cursor, n, **progress):
+            nonlocal rows
+            rows += n
+            _save_checkpoint(ckpt_path, dict(params=params, cursor=cursor, rows=rows, **progress))
+
+        start = time.perf_counter()
+        with fu.request_scope("export", read_budget=0) as ops:  # batch job: the per-turn budget does not apply
+            pages = iter_pages(start_date, end_date, page_size, cursor=ckpt and ckpt["cursor"])
+            (_write_csv if fmt == "csv" else _write_parquet)(out, pages, ckpt, save)
+        if os.path.exists(ckpt_path):
+            os.remove(ckpt_path)
+    finally:
+        os.remove(lock_path)
+
+    report = {
+        "out": out,
+        "format": fmt,
+        "from": start_date,
+        "to": end_date,
+        "rows": rows,
+        "resumed_from": resumed_from,
+        "seconds": round(time.perf_counter() - start, 2),
+        "firestore": ops.as_dict(),
+    }
+    print(f"✅ Exported {rows} appointments ({start_date} → {end_date}) to {out}"
+          f"{f' (resumed after {resumed_from})' if resumed_from else ''} in {report['seconds']}s")
+    return report
+
+
+def export_period(period, value, fmt="csv", directory=EXPORT_DIR, page_size=EXPORT_PAGE_SIZE):
+    start_date, end_date, label = period_range(period, value)
+    return export_appointments(start_date, end_date, fmt, page_size=page_size, directory=directory, label=label)
+
+
+# ---------------- CLI ----------------
+def main():
+    ap = argparse.ArgumentParser(description="Export appointments to CSV / Parquet")
+    ap.add_argument("period", choices=["day", "month", "range"])
+    ap.add_argument("value", help="YYYY-MM-DD (day, range start) or YYYY-MM (month)")
+    ap.add_argument("end", nargs="?", default=None, help="YYYY-MM-DD (range end)")
+    ap.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    ap.add_argument("--out", default=None, help="Output .csv file / Parquet folder (default: under --dir)")
+    ap.add_argument("--dir", default=EXPORT_DIR)
+    ap.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    args = ap.parse_args()
+
+    if args.period == "range":
+        if not args.end:
+            ap.error("range needs a start and an end date")
+        start_date, end_date, label = args.value, args.end, None
+    else:
+        start_date, end_date, label = period_range(args.period, args.value)
+    report = export_appointments(start_date, end_date, args.format, args.out, args.page_size, args.dir, label)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,29 +5,66 @@ from datetime import datetime, timedelta
 import pytz
 import re
 import os, json
+import functools
+
+try:
+    from Firebase.accounting import CountingClient, ReadBudgetExceeded, request_scope, unit_of_work, \
+        totals as firestore_totals
+except ImportError:
+    from accounting import CountingClient, ReadBudgetExceeded, request_scope, unit_of_work, \
+        totals as firestore_totals
+try:
+    from Firebase.prefetch import MISSING, PREFETCH_ENABLED, PrefetchCache
+except ImportError:
+    from prefetch import MISSING, PREFETCH_ENABLED, PrefetchCache
+try:
+    from Firebase.singleflight import SingleFlight
+except ImportError:
+    from singleflight import SingleFlight
+try:
+    from Firebase.layout import AppointmentLayout
+except ImportError:
+    from layout import AppointmentLayout
 
 # ---------------------- Timezone ---------------------- #
 TZ = pytz.timezone("Asia/Karachi")
 from dotenv import load_dotenv
 
 # ---------------------- Firebase Setup ---------------------- #
-try:
-    if not firebase_admin._apps:
+# "firestore" (default) or "memory" (seeded in-memory stand-in for benchmarks / load tests)
+FIREBASE_BACKEND = os.getenv("FIREBASE_BACKEND", "firestore").lower()
 
-        firebase_json = os.getenv("FIREBASE_CREDENTIALS")
-        if not firebase_json:
-            # Try loading from .env if not found
-            load_dotenv()
-            firebase_json = os.getenv("FIREBASE_CREDENTIALS")
-        cred_dict = json.loads(firebase_json)
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
+if FIREBASE_BACKEND == "memory":
+    try:
+        from Firebase.memory_store import MemoryClient, seed_from_env
+    except ImportError:
+        from memory_store import MemoryClient, seed_from_env
+    db = CountingClient(MemoryClient(server_timestamp=gcf.SERVER_TIMESTAMP))
+    seed_from_env(db, tz=TZ, add_appointment=AppointmentLayout(db).add)
+else:
+    try:
+        if not firebase_admin._apps:
 
-    db = firestore.client()
-except Exception as e:
-    raise RuntimeError(f"❌ Failed to initialize Firebase: {e}")
+            firebase_json = os.getenv("FIREBASE_CREDENTIALS")
+            if not firebase_json:
+                # Try loading from .env if not found
+                load_dotenv()
+                firebase_json = os.getenv("FIREBASE_CREDENTIALS")
+            cred_dict = json.loads(firebase_json)
+            cred = credentials.Certificate(cred_dict)
+            firebase_admin.initialize_app(cred)
+
+        # Every read/query/write is counted against the active request_scope()
+        db = CountingClient(firestore.client())
+    except Exception as e:
+        raise RuntimeError(f"❌ Failed to initialize Firebase: {e}")
 
 # ---------------------- Firestore Utilities ---------------------- #
+# Identical reads that are in flight at the same time share one query (see singleflight.py)
+flights = SingleFlight()
+# Flat `appointments` collection or per-barber partitions (APPOINTMENTS_LAYOUT, see layout.py)
+appointments = AppointmentLayout(db)
+
 
 def get_barber_by_id(barber_id: str):
     try:
@@ -56,11 +93,20 @@ def create_barber(barber_data: dict):
         return f"❌ Error creating barber: {e}"
 
 def get_appointments_for_barber_on_date(barber_id: str, date: str):
+    cached = prefetch_cache.lookup(("barber_day", barber_id, date))
+    if cached is not MISSING:
+        return cached
+    return _query_barber_day(barber_id, date)
+
+def _load_barber_day(barber_id: str, date: str):
+    return [doc.to_dict() for doc in appointments.barber_day(barber_id, date)]
+
+def _query_barber_day(barber_id: str, date: str):
     try:
-        snapshot = db.collection("appointments") \
-            .where("barberId", "==", barber_id) \
-            .where("date", "==", date).stream()
-        return [doc.to_dict() for doc in snapshot]
+        return flights.do(("barber_day", barber_id, date), _load_barber_day, barber_id, date,
+                          private_errors=(ReadBudgetExceeded,))
+    except ReadBudgetExceeded:
+        raise
     except Exception as e:
         return f"❌ Error fetching appointments: {e}"
 
@@ -76,41 +122,100 @@ def add_document(collection: str, data: dict, doc_id: str = None):
     except Exception as e:
         return f"❌ Error adding document: {e}"
 
+def _load_barbers():
+    barbers_ref = db.collection("barbers")
+    docs = barbers_ref.stream()
+    barbers = []
+    for doc in docs:
+        data = doc.to_dict()
+        if "name" in data:
+            barbers.append({"name": data["name"], **data})
+    return barbers
+
 def get_all_barbers():
     try:
-        barbers_ref = db.collection("barbers")
-        docs = barbers_ref.stream()
-        barbers = []
-        for doc in docs:
-            data = doc.to_dict()
-            if "name" in data:
-                barbers.append({"name": data["name"], **data})
-        return barbers
+        return flights.do(("barbers",), _load_barbers, private_errors=(ReadBudgetExceeded,))
+    except ReadBudgetExceeded:
+        raise
     except Exception as e:
         print(f"Error fetching barbers: {e}")
         return []
 
+def _load_services():
+    services_ref = db.collection("services")
+    docs = services_ref.stream()
+    return [doc.to_dict() for doc in docs]
+
 def get_all_services():
     try:
-        services_ref = db.collection("services")
-        docs = services_ref.stream()
-        return [doc.to_dict() for doc in docs]
+        return flights.do(("services",), _load_services, private_errors=(ReadBudgetExceeded,))
+    except ReadBudgetExceeded:
+        raise
     except Exception as e:
         print(f"Error fetching services: {e}")
         return []
 
 def get_all_appointments():
     try:
-        docs = db.collection("appointments").stream()
+        docs = appointments.query()
         return [doc.to_dict() for doc in docs]
+    except ReadBudgetExceeded:
+        raise
     except Exception as e:
         print("Error fetching appointments:", e)
         return []
 
 def get_appointments_for_user(user_email):
-    docs = db.collection("appointments").where("userId", "==", user_email).get()
+    docs = appointments.query(("userId", "==", user_email))
     return [d.to_dict() for d in docs]
 
+# ---------------------- Booking Prefetch ---------------------- #
+# Started by the app when a message arrives; book_appointment consumes the results
+prefetch_cache = PrefetchCache()
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "2"))          # days scanned when no date is known
+PREFETCH_MAX_BARBERS = int(os.getenv("PREFETCH_MAX_BARBERS", "8"))
+
+def _fetch_barbers():
+    return db.collection("barbers").get()
+
+def _fetch_user_day(user_email, date):
+    return appointments.query(("userId", "==", user_email), ("date", "==", date))
+
+def _prefetched(key, fn, *args):
+    cached = prefetch_cache.lookup(key)
+    return fn(*args) if cached is MISSING else cached
+
+def _prefetch_read(fn, *args):
+    with request_scope("prefetch"):
+        return fn(*args)
+
+def _plan_booking_prefetch(session_id, user_email, barber_name, dates):
+    """ Runs in the prefetch pool: load barbers, then fan out the per-barber/date reads. """
+    barbers = _prefetch_read(_fetch_barbers)
+    targets = barbers
+    if barber_name:
+        key = barber_name.strip().lower()
+        targets = [b for b in barbers if (b.to_dict() or {}).get("name", "").strip().lower() == key]
+    for b in targets[:PREFETCH_MAX_BARBERS]:
+        for d in dates:
+            prefetch_cache.submit(session_id, ("barber_day", b.id, d), _prefetch_read, _query_barber_day, b.id, d)
+    return barbers
+
+def prefetch_booking(session_id, user_email, barber_name=None, dates=None):
+    """
+    Speculatively load what book_appointment will need for this session.
+    `dates` are the likely booking dates (default: the next PREFETCH_DAYS days).
+    """
+    if not PREFETCH_ENABLED:
+        return
+    if not dates:
+        today = _now_local().date()
+        dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(PREFETCH_DAYS)]
+    dates = tuple(dates)
+    prefetch_cache.submit(session_id, ("barbers",), _plan_booking_prefetch, session_id, user_email, barber_name, dates)
+    for d in dates:
+        prefetch_cache.submit(session_id, ("user_day", user_email, d), _prefetch_read, _fetch_user_day, user_email, d)
+
 # ---------------------- Helpers ---------------------- #
 
 def add_minutes(time_str: str, minutes: int) -> str:
@@ -126,6 +231,14 @@ def is_overlapping(start1, end1, start2, end2) -> bool:
     e2 = datetime.strptime(end2, fmt)
     return not (e1 <= s2 or s1 >= e2)
 
+def _memoized_reads(fn):
+    """ Run fn in one unit of work: each distinct document/query is read at most once per call. """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with unit_of_work():
+            return fn(*args, **kwargs)
+    return wrapper
+
 # ---------------------- Scheduling Constants ---------------------- #
 SLOT_STEP_MIN = 15
 LEAD_TIME_MIN = 15
@@ -188,21 +301,24 @@ def is_valid_time(requested_date, requested_time, duration_minutes, barber_data,
 
     return True, "✅ Time is available."
 
-def find_next_available_slot(barber_id, duration_minutes=60, max_days=MAX_LOOKAHEAD_DAYS):
+@_memoized_reads
+def find_next_available_slot(barber_id, duration_minutes=60, max_days=MAX_LOOKAHEAD_DAYS, barber_data=None):
     now = _now_local()
     today = now.date()
 
-    bdoc = db.collection("barbers").document(barber_id).get()
-    if not bdoc.exists: return None
-    bdata = bdoc.to_dict()
+    bdata = barber_data
+    if bdata is None:
+        bdoc = db.collection("barbers").document(barber_id).get()
+        if not bdoc.exists: return None
+        bdata = bdoc.to_dict()
+
+    wh = bdata.get("workingHours", {"start":"10:00","end":"22:00"})
+    open_t, close_t = wh.get("start","10:00"), wh.get("end","22:00")
 
     for d in range(max_days + 1):
         day = today + timedelta(days=d)
         day_str = day.strftime("%Y-%m-%d")
 
-        wh = bdata.get("workingHours", {"start":"10:00","end":"22:00"})
-        open_t, close_t = wh.get("start","10:00"), wh.get("end","22:00")
-
         existing = get_appointments_for_barber_on_date(barber_id, day_str)
         if isinstance(existing, str): continue
 
@@ -221,6 +337,7 @@ def find_next_available_slot(barber_id, duration_minutes=60, max_days=MAX_LOOKAH
                 return (day_str, t)
     return None
 
+@_memoized_reads
 def book_appointment(user_email, barber_name=None, service_name=None,
                      requested_date=None, requested_time=None, duration_minutes=60):
     """
@@ -255,14 +372,15 @@ def book_appointment(user_email, barber_name=None, service_name=None,
             q = db.collection("services").where("name", "==", service_name).limit(1).get()
             if q: service_id = q[0].id
 
-        barbers = db.collection("barbers").get()
+        barbers = _prefetched(("barbers",), _fetch_barbers)
         if not barbers: return False, "❌ No barbers found."
+        barber_data = {b.id: b.to_dict() or {} for b in barbers}
 
         chosen = None
         if barber_name:
             key = barber_name.strip().lower()
             for b in barbers:
-                if b.to_dict().get("name", "").strip().lower() == key:
+                if barber_data[b.id].get("name", "").strip().lower() == key:
                     chosen = b; break
             if not chosen: return False, f"❌ Barber '{barber_name}' not found."
 
@@ -275,7 +393,7 @@ def book_appointment(user_email, barber_name=None, service_name=None,
             for b in target_barbers:
                 existing = get_appointments_for_barber_on_date(b.id, requested_date)
                 if isinstance(existing, str): continue
-                ok, msg = is_valid_time(requested_date, requested_time, duration_minutes, b.to_dict(), existing)
+                ok, msg = is_valid_time(requested_date, requested_time, duration_minutes, barber_data[b.id], existing)
                 if ok:
                     final_date, final_time, final_barber = requested_date, requested_time, b
                     break
@@ -285,12 +403,12 @@ def book_appointment(user_email, barber_name=None, service_name=None,
         elif requested_date:
             target_barbers = [chosen] if chosen else barbers
             for b in target_barbers:
-                wh = b.to_dict().get("workingHours", {"start":"10:00","end":"22:00"})
+                wh = barber_data[b.id].get("workingHours", {"start":"10:00","end":"22:00"})
                 open_t, close_t = wh.get("start","10:00"), wh.get("end","22:00")
                 existing = get_appointments_for_barber_on_date(b.id, requested_date)
                 if isinstance(existing, str): continue
                 for t in _iter_slots(open_t, close_t, SLOT_STEP_MIN, duration_minutes):
-                    ok, _ = is_valid_time(requested_date, t, duration_minutes, b.to_dict(), existing)
+                    ok, _ = is_valid_time(requested_date, t, duration_minutes, barber_data[b.id], existing)
                     if ok:
                         final_date, final_time, final_barber = requested_date, t, b
                         break
@@ -305,7 +423,7 @@ def book_appointment(user_email, barber_name=None, service_name=None,
                     d = (_now_local() + timedelta(days=delta)).strftime("%Y-%m-%d")
                     existing = get_appointments_for_barber_on_date(b.id, d)
                     if isinstance(existing, str): continue
-                    ok, _ = is_valid_time(d, requested_time, duration_minutes, b.to_dict(), existing)
+                    ok, _ = is_valid_time(d, requested_time, duration_minutes, barber_data[b.id], existing)
                     if ok:
                         final_date, final_time, final_barber = d, requested_time, b
                         break
@@ -317,7 +435,7 @@ def book_appointment(user_email, barber_name=None, service_name=None,
             target_barbers = [chosen] if chosen else barbers
             slots = []
             for b in target_barbers:
-                slot = find_next_available_slot(b.id, duration_minutes)
+                slot = find_next_available_slot(b.id, duration_minutes, barber_data=barber_data[b.id])
                 if slot: slots.append((slot[0], slot[1], b))
             if not slots: return False, "❌ Couldn’t find any available barber in the next 30 days."
             final_date, final_time, final_barber = sorted(slots, key=lambda x: (x[0], x[1]))[0]
@@ -327,15 +445,13 @@ def book_appointment(user_email, barber_name=None, service_name=None,
 
         existing = get_appointments_for_barber_on_date(final_barber.id, final_date)
         if isinstance(existing, str): return False, existing
-        ok, msg = is_valid_time(final_date, final_time, duration_minutes, final_barber.to_dict(), existing)
+        ok, msg = is_valid_time(final_date, final_time, duration_minutes, barber_data[final_barber.id], existing)
         if not ok: return False, msg
 
         fmt = "%H:%M"
         new_start = datetime.strptime(final_time, fmt)
         new_end = new_start + timedelta(minutes=duration_minutes)
-        user_same_day = db.collection("appointments") \
-                          .where("userId", "==", user_email) \
-                          .where("date", "==", final_date).get()
+        user_same_day = _prefetched(("user_day", user_email, final_date), _fetch_user_day, user_email, final_date)
         for appt in user_same_day:
             d = appt.to_dict()
             if d.get("status") == "cancelled": continue
@@ -344,7 +460,7 @@ def book_appointment(user_email, barber_name=None, service_name=None,
             if (new_start < ex_end) and (ex_start < new_end):
                 return False, "⚠️ You already have an overlapping appointment."
 
-        barber_display = final_barber.to_dict().get("name")
+        barber_display = barber_data[final_barber.id].get("name")
         new_appt = {
             "userId": user_email,
             "barberId": final_barber.id,
@@ -358,7 +474,7 @@ def book_appointment(user_email, barber_name=None, service_name=None,
             "createdAt": gcf.SERVER_TIMESTAMP,
             "updatedAt": gcf.SERVER_TIMESTAMP
         }
-        db.collection("appointments").add(new_appt)
+        appointments.add(new_appt)
         return True, f"✅ Appointment booked with {barber_display} on {final_date} at {final_time}"
 
     except Exception as e:
@@ -368,33 +484,27 @@ def book_appointment(user_email, barber_name=None, service_name=None,
 
 def view_appointments(user_email):
     try:
-        snapshot = db.collection("appointments") \
-            .where("userId", "==", user_email) \
-            .order_by("date") \
-            .order_by("time") \
-            .stream()
+        snapshot = appointments.query(("userId", "==", user_email), order_by=("date", "time"))
         return [doc.to_dict() for doc in snapshot]
     except Exception as e:
         return f"❌ Error viewing appointments: {e}"
 
 def cancel_latest_appointment(user_email):
-    docs = db.collection("appointments") \
-         .where("userId", "==", user_email) \
-         .where("status", "==", "booked") \
-         .get()
+    docs = appointments.query(("userId", "==", user_email), ("status", "==", "booked"))
 
     if not docs:
         return False, "❌ You have no active appointments to cancel."
 
     # Sort by date and time in Python
     latest_doc = sorted(docs, key=lambda d: (d.get("date"), d.get("time")), reverse=True)[0]
-    latest_doc.reference.delete()
+    appointments.delete(latest_doc)
     
     return True, "✅ Your latest appointment has been cancelled."
 
 
 # ---------------------- Suggestions ---------------------- #
 
+@_memoized_reads
 def suggest_alternatives(barber_id, date_str, time_str=None, duration_minutes=60, limit=3):
     """
     Suggest up to `limit` next valid slots (date, time) for a given barber,
@@ -443,6 +553,8 @@ def suggest_alternatives(barber_id, date_str, time_str=None, duration_minutes=60
                     if len(collected) >= limit:
                         break
         return collected
+    except ReadBudgetExceeded:
+        raise
     except Exception as e:
         print(f"Error suggesting alternatives: {e}")
         return []
@@ -0,0 +1,212 @@
+# layout.py
+"""
+Where appointments are stored (APPOINTMENTS_LAYOUT):
+
+    flat         appointments/{id}                                   (original layout)
+    partitioned  barbers/{barberId}/barber_appointments/{id}
+                 or, with APPOINTMENTS_PARTITION=barber_month,
+                 barbers/{barberId}/months/{YYYY-MM}/barber_appointments/{id}
+    dual         writes go to both (same document id, one batch), reads merge both
+                 and de-duplicate by id — for the cutover
+
+Availability scans (one barber, one day) only touch that barber's partition; per-user
+and shop-wide reads use a collection group query on `barber_appointments`.
+
+Cutover: switch to dual, run `python layout.py migrate`, check `python layout.py verify`,
+switch to partitioned, then `python layout.py migrate --delete-flat` removes the old copies.
+"""
+import argparse
+import os
+import time
+
+# ---------------- CONFIG ----------------
+APPOINTMENTS_LAYOUT = os.getenv("APPOINTMENTS_LAYOUT", "flat").lower()
+APPOINTMENTS_PARTITION = os.getenv("APPOINTMENTS_PARTITION", "barber").lower()   # barber | barber_month
+FLAT_COLLECTION = "appointments"
+PARTITION_COLLECTION = "barber_appointments"
+
+
+class AppointmentLayout:
+    def __init__(self, db, layout=APPOINTMENTS_LAYOUT, partition=APPOINTMENTS_PARTITION):
+        if layout not in ("flat", "partitioned", "dual"):
+            raise ValueError(f"❌ Unknown APPOINTMENTS_LAYOUT '{layout}' (flat, partitioned or dual)")
+        if partition not in ("barber", "barber_month"):
+            raise ValueError(f"❌ Unknown APPOINTMENTS_PARTITION '{partition}' (barber or barber_month)")
+        self.db = db
+        self.layout = layout
+        self.partition = partition
+
+    @property
+    def uses_flat(self):
+        return self.layout in ("flat", "dual")
+
+    @property
+    def uses_partitions(self):
+        return self.layout in ("partitioned", "dual")
+
+    # -------- references --------
+    def flat(self):
+        return self.db.collection(FLAT_COLLECTION)
+
+    def partition_for(self, barber_id, date):
+        ref = self.db.collection("barbers").document(barber_id)
+        if self.partition == "barber_month":
+            ref = ref.collection("months").document(date[:7])
+        return ref.collection(PARTITION_COLLECTION)
+
+    def partitions(self):
+        return self.db.collection_group(PARTITION_COLLECTION)
+
+    # -------- reads --------
+    def _merge(self, queries, order_by=()):
+        """ Run every query and de-duplicate by document id (the partitioned copy wins). """
+        docs = {}
+        for q in queries:
+            for doc in q.stream():
+                if doc.id not in docs or PARTITION_COLLECTION in doc.reference.path:
+                    docs[doc.id] = doc
+        out = list(docs.values())
+        if order_by and len(queries) > 1:
+            out.sort(key=lambda d: tuple(d.get(f) or "" for f in order_by))
+        return out
+
+    def query(self, *filters, order_by=()):
+        """ Snapshots matching (field, op, value) filters across the layout's storage. """
+        queries = []
+        for base in self.sources():
+            q = base
+            for f in filters:
+                q = q.where(*f)
+            for field in order_by:
+                q = q.order_by(field)
+            queries.append(q)
+        return self._merge(queries, order_by)
+
+    def barber_day(self, barber_id, date):
+        """ One barber's appointments on one day; partition-local when partitioned. """
+        queries = []
+        if self.uses_flat:
+            queries.append(self.flat().where("barberId", "==", barber_id).where("date", "==", date))
+        if self.uses_partitions:
+            queries.append(self.partition_for(barber_id, date).where("date", "==", date))
+        return self._merge(queries)
+
+    # -------- writes --------
+    def add(self, data):
+        """ Store a new appointment; returns its id (shared by both copies in dual mode). """
+        doc_id = self.flat().document().id
+        if self.layout == "dual":
+            batch = self.db.batch()
+            batch.set(self.flat().document(doc_id), data)
+            batch.set(self.partition_for(data["barberId"], data["date"]).document(doc_id), data)
+            batch.commit()
+        elif self.layout == "partitioned":
+            self.partition_for(data["barberId"], data["date"]).document(doc_id).set(data)
+        else:
+            self.flat().document(doc_id).set(data)
+        return doc_id
+
+    def sources(self):
+        """ Collection / collection group queries holding appointments, flat first. """
+        return ([self.flat()] if self.uses_flat else []) + ([self.partitions()] if self.uses_partitions else [])
+
+    def delete_in(self, batch, snapshot):
+        """ Add the deletes for an appointment (both copies in dual mode) to a batch. """
+        if self.layout != "dual":
+            batch.delete(snapshot.reference)
+            return
+        data = snapshot.to_dict() or {}
+        batch.delete(self.flat().document(snapshot.id))
+        if data.get("barberId") and data.get("date"):
+            batch.delete(self.partition_for(data["barberId"], data["date"]).document(snapshot.id))
+
+    def delete(self, snapshot):
+        """ Delete an appointment (and its other copy in dual mode). """
+        if self.layout != "dual":
+            snapshot.reference.delete()
+            return
+        batch = self.db.batch()
+        self.delete_in(batch, snapshot)
+        batch.commit()
+
+
+# ---------------- Migration ----------------
+def migrate(layout, batch_size=200, delete_flat=False, dry_run=False):
+    """
+    Copy every flat appointment into its partition (same id, idempotent), page by page.
+    With delete_flat the flat copy is removed in the same batch.
+    """
+    copied = skipped = batches = 0
+    cursor = None
+    start = time.perf_counter()
+    while True:
+        # a cursor still works after its document was deleted
+        q = layout.flat().order_by("__name__").limit(batch_size)
+        if cursor is not None:
+            q = q.start_after(cursor)
+        docs = list(q.stream())
+        if not docs:
+            break
+        cursor = docs[-1]
+        batch = layout.db.batch()
+        for doc in docs:
+            data = doc.to_dict()
+            if not data.get("barberId") or not data.get("date"):
+                skipped += 1
+                continue
+            batch.set(layout.partition_for(data["barberId"], data["date"]).document(doc.id), data)
+            if delete_flat:
+                batch.delete(doc.reference)
+            copied += 1
+        if not dry_run:
+            batch.commit()
+        batches += 1
+        if len(docs) < batch_size:
+            break
+    seconds = round(time.perf_counter() - start, 2)
+    verb = "Would copy" if dry_run else "Copied"
+    print(f"✅ {verb} {copied} appointments into partitions in {batches} batches ({seconds}s); "
+          f"{skipped} without barberId/date skipped{'; flat copies deleted' if delete_flat and not dry_run else ''}")
+    return {"copied": copied, "skipped": skipped, "batches": batches, "seconds": seconds}
+
+
+def verify(layout):
+    """ Flat vs partitioned ids: what is only on one side. """
+    flat_ids = {d.id for d in layout.flat().stream()}
+    part_ids = {d.id for d in layout.partitions().stream()}
+    report = {"flat": len(flat_ids), "partitioned": len(part_ids),
+              "only_flat": sorted(flat_ids - part_ids)[:20], "only_flat_count": len(flat_ids - part_ids),
+              "only_partitioned_count": len(part_ids - flat_ids)}
+    print(f"flat {report['flat']}, partitioned {report['partitioned']}, "
+          f"missing from partitions {report['only_flat_count']}, only in partitions {report['only_partitioned_count']}")
+    return report
+
+
+def main():
+    try:
+        from Firebase import firebase_utils as fu
+    except ImportError:
+        import firebase_utils as fu
+
+    ap = argparse.ArgumentParser(description="Appointment layout migration")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("migrate", help="Copy flat appointments into barber partitions")
+    m.add_argument("--partition", choices=["barber", "barber_month"], default=APPOINTMENTS_PARTITION)
+    m.add_argument("--batch-size", type=int, default=200)
+    m.add_argument("--delete-flat", action="store_true", help="Remove the flat copy once copied")
+    m.add_argument("--dry-run", action="store_true")
+    v = sub.add_parser("verify", help="Compare flat and partitioned appointment ids")
+    v.add_argument("--partition", choices=["barber", "barber_month"], default=APPOINTMENTS_PARTITION)
+    args = ap.parse_args()
+
+    layout = AppointmentLayout(fu.db, layout="dual", partition=args.partition)
+    with fu.request_scope("migration", read_budget=0) as ops:  # whole collection: no per-turn budget
+        if args.cmd == "migrate":
+            migrate(layout, min(args.batch_size, 250) if args.delete_flat else min(args.batch_size, 500), args.delete_flat, args.dry_run)
+        else:
+            verify(layout)
+    print(f"Firestore: {ops.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
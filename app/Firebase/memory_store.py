@@ -0,0 +1,319 @@
+# memory_store.py
+"""
+In-memory stand-in for the subset of the Firestore client used by firebase_utils.
+
+Selected with FIREBASE_BACKEND=memory (benchmarks, load tests, local runs without
+credentials). MEMORY_SEED seeds demo data, e.g.
+    MEMORY_SEED="barbers=6,services=4,density=0.4,days=14,seed=42"
+"""
+import copy
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _field(data, doc_id, name):
+    if name == "__name__":
+        return doc_id
+    cur = data
+    for part in name.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(part)
+    return cur
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return copy.deepcopy(_field(self._data or {}, self.id, field))
+
+
+class MemoryDocument:
+    def __init__(self, client, collection_path, doc_id):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = doc_id
+        self.path = f"{collection_path}/{doc_id}"
+
+    def get(self, *args, **kwargs):
+        with self._client._lock:
+            data = self._client._docs(self._collection_path).get(self.id)
+            return MemorySnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            docs = self._client._docs(self._collection_path)
+            new = self._client._resolve(data)
+            if merge and self.id in docs:
+                docs[self.id].update(new)
+            else:
+                docs[self.id] = new
+
+    def update(self, data):
+        with self._client._lock:
+            docs = self._client._docs(self._collection_path)
+            if self.id not in docs:
+                raise KeyError(f"No document to update: {self.path}")
+            docs[self.id].update(self._client._resolve(data))
+
+    def delete(self):
+        with self._client._lock:
+            self._client._docs(self._collection_path).pop(self.id, None)
+
+    def collection(self, name):
+        return MemoryCollection(self._client, f"{self.path}/{name}")
+
+
+class MemoryQuery:
+    def __init__(self, client, paths, filters=(), orders=(), limit=None, cursor=None):
+        self._client = client
+        self._paths = paths              # callable -> list of collection paths
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        kw = dict(filters=self._filters, orders=self._orders, limit=self._limit, cursor=self._cursor)
+        kw.update(changes)
+        return MemoryQuery(self._client, self._paths, **kw)
+
+    def where(self, field, op, value):
+        if op not in _OPS:
+            raise ValueError(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field, str(direction).upper()),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields):
+        return self._copy(cursor=document_fields)
+
+    @staticmethod
+    def _order_value(item, field):
+        """ Like Firestore, documents are ordered by their full path for "__name__" (matters for collection groups). """
+        if field == "__name__":
+            return tuple(f"{item[0]}/{item[1]}".split("/"))
+        return _field(item[2], item[1], field)
+
+    def _sort_key(self, field, item):
+        value = self._order_value(item, field)
+        return (value is not None, value)
+
+    def _apply_cursor(self, items):
+        """ Keep the items that sort strictly after the start_after() cursor. """
+        cur = self._cursor
+        cur_path = None
+        if isinstance(cur, MemorySnapshot):
+            cur_path = cur.reference.path
+            values = [self._order_value((cur.reference._collection_path, cur.id, cur._data or {}), f)
+                      for f, _ in self._orders]
+        elif isinstance(cur, dict):
+            values = [tuple(cur[f].split("/")) if f == "__name__" and isinstance(cur.get(f), str) else cur.get(f)
+                      for f, _ in self._orders]
+        else:
+            values = list(cur)
+
+        def after(item):
+            for (f, direction), c in zip(self._orders, values):
+                v = self._order_value(item, f)
+                if v == c:
+                    continue
+                return (v > c) if direction == ASCENDING else (v < c)
+            # equal on every ordered field: document path is the tie-breaker
+            return cur_path is not None and f"{item[0]}/{item[1]}" > cur_path
+
+        return [it for it in items if after(it)]
+
+    def stream(self, *args, **kwargs):
+        with self._client._lock:
+            items = []
+            for path in self._paths():
+                for doc_id, data in self._client._docs(path).items():
+                    if all(_OPS[op](_field(data, doc_id, f), v) for f, op, v in self._filters):
+                        items.append((path, doc_id, copy.deepcopy(data)))
+        items.sort(key=lambda it: (it[0], it[1]))
+        for field, direction in reversed(self._orders):
+            items.sort(key=lambda it: self._sort_key(field, it), reverse=(direction == DESCENDING))
+        if self._cursor is not None:
+            items = self._apply_cursor(items)
+        if self._limit is not None:
+            items = items[:self._limit]
+        for path, doc_id, data in items:
+            yield MemorySnapshot(MemoryDocument(self._client, path, doc_id), data)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream())
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, client, path):
+        super().__init__(client, lambda: [path])
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id=None):
+        return MemoryDocument(self._client, self.path, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return datetime.now(), ref
+
+
+class MemoryBatch:
+    def __init__(self):
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self._ops.append(ref.delete)
+
+    def commit(self):
+        for op in self._ops:
+            op()
+        self._ops = []
+
+
+class MemoryClient:
+    def __init__(self, server_timestamp=None):
+        self._lock = threading.RLock()
+        self._store = {}   # collection path -> {doc_id: data}
+        self._server_timestamp = server_timestamp
+
+    def _docs(self, path):
+        return self._store.setdefault(path, {})
+
+    def _resolve(self, data):
+        # replace SERVER_TIMESTAMP sentinels before copying (deepcopy would clone them)
+        ts = self._server_timestamp
+        resolved = {k: (datetime.now() if ts is not None and v is ts else v) for k, v in data.items()}
+        return copy.deepcopy(resolved)
+
+    def collection(self, path):
+        return MemoryCollection(self, path)
+
+    def collection_group(self, name):
+        def paths():
+            return [p for p in list(self._store) if p.rsplit("/", 1)[-1] == name]
+        return MemoryQuery(self, paths)
+
+    def document(self, path):
+        collection_path, doc_id = path.rsplit("/", 1)
+        return MemoryDocument(self, collection_path, doc_id)
+
+    def batch(self):
+        return MemoryBatch()
+
+
+# ---------------------- Seeding ---------------------- #
+
+SEED_BARBER_NAMES = ["Imran Barber", "Ali Barber", "Sara Stylist", "Hamza Barber",
+                     "Usman Barber", "Bilal Stylist", "Ayesha Stylist", "Kamran Barber"]
+SEED_SERVICES = [("Haircut", 500), ("Beard Trim", 300), ("Shave", 350), ("Haircut + Beard", 750),
+                 ("Hair Color", 1500), ("Facial", 1200)]
+
+
+def seed_demo_data(client, barbers=4, services=4, density=0.3, days=14, seed=42, tz=None, add_appointment=None,
+                   today=None):
+    """
+    Fill `client` with barbers, services and booked appointments.
+    `density` is the fraction of each barber's hourly slots already booked on each of the next `days` days.
+    `add_appointment(data)` stores one appointment (default: the flat `appointments` collection).
+    `today` (a date) is the first seeded day (default: the current date).
+    """
+    add_appointment = add_appointment or client.collection("appointments").add
+    rng = random.Random(seed)
+    today = today or (datetime.now(tz) if tz else datetime.now()).date()
+    barber_ids = []
+    for i in range(barbers):
+        name = SEED_BARBER_NAMES[i % len(SEED_BARBER_NAMES)]
+        if i >= len(SEED_BARBER_NAMES):
+            name = f"{name} {i // len(SEED_BARBER_NAMES) + 1}"
+        ref = client.collection("barbers").document(f"barber{i:03d}")
+        ref.set({
+            "name": name,
+            "speciality": rng.choice(["Fades", "Beards", "Styling", "Classic cuts"]),
+            "workingHours": {"start": "10:00", "end": "22:00"},
+            "breakTimes": {"start": "14:00", "end": "15:00"},
+        })
+        barber_ids.append((ref.id, name))
+    for i in range(services):
+        name, price = SEED_SERVICES[i % len(SEED_SERVICES)]
+        client.collection("services").document(f"service{i:03d}").set({"name": name, "price": price})
+
+    hours = [f"{h:02d}:00" for h in range(10, 22) if h != 14]
+    n = 0
+    for d in range(days):
+        day = (today + timedelta(days=d)).strftime("%Y-%m-%d")
+        for barber_id, name in barber_ids:
+            for t in hours:
+                if rng.random() < density:
+                    add_appointment({
+                        "userId": f"seed{rng.randrange(10_000)}@example.com",
+                        "barberId": barber_id,
+                        "barberName": name,
+                        "serviceId": None,
+                        "serviceName": None,
+                        "date": day,
+                        "time": t,
+                        "duration": 60,
+                        "status": "booked",
+                    })
+                    n += 1
+    return {"barbers": barbers, "services": services, "appointments": n}
+
+
+def parse_seed_spec(spec):
+    """ "barbers=6,density=0.4" -> {"barbers": 6, "density": 0.4} """
+    out = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        k, v = (x.strip() for x in part.split("=", 1))
+        out[k] = float(v) if k == "density" else int(v)
+    return out
+
+
+def seed_from_env(client, tz=None, add_appointment=None):
+    spec = os.getenv("MEMORY_SEED")
+    if not spec:
+        return None
+    return seed_demo_data(client, tz=tz, add_appointment=add_appointment, **parse_seed_spec(spec))
@@ -0,0 +1,134 @@
+# prefetch.py
+"""
+Speculative prefetch of booking data.
+
+When a message looks like part of a booking, the app starts the Firestore reads that
+book_appointment is most likely to need (barbers, their appointments on the likely
+dates, the user's own appointments on those dates) in background threads as soon as
+the message arrives, so they overlap with intent inference.
+
+Results are kept per session for the current turn only (and never longer than the TTL).
+Each entry is consumed at most once through `lookup()`, so a second read of the same
+key (e.g. the re-check right before the write in book_appointment) always goes to
+Firestore. Every prefetched entry ends up either used (hit) or discarded (wasted).
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") == "1"
+PREFETCH_TTL_S = float(os.getenv("PREFETCH_TTL_S", "15"))
+# How long a lookup waits for a prefetch that is still in flight before reading itself
+PREFETCH_WAIT_S = float(os.getenv("PREFETCH_WAIT_S", "2"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+MISSING = object()
+
+# Session whose prefetched data lookups may use (set by the app around routing)
+_session = contextvars.ContextVar("prefetch_session", default=None)
+
+
+class PrefetchCache:
+    def __init__(self, ttl=PREFETCH_TTL_S, wait=PREFETCH_WAIT_S, workers=PREFETCH_WORKERS):
+        self.ttl = ttl
+        self.wait = wait
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._entries = {}  # session -> {key: (future, created)}
+        self._counts = defaultdict(lambda: {"issued": 0, "hits": 0, "wasted": 0, "misses": 0})
+
+    # -------- internals (call with self._lock held) --------
+    def _discard(self, key, entry):
+        entry[0].cancel()
+        self._counts[key[0]]["wasted"] += 1
+
+    def _sweep(self, now):
+        for session in list(self._entries):
+            entries = self._entries[session]
+            for key in [k for k, e in entries.items() if now - e[1] > self.ttl]:
+                self._discard(key, entries.pop(key))
+            if not entries:
+                del self._entries[session]
+
+    # -------- API --------
+    def submit(self, session, key, fn, *args):
+        """
+        Start fn(*args) in the background for `session` unless `key` is already pending.
+        fn runs in a copy of the caller's context. key[0] is the kind used in stats().
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entries = self._entries.setdefault(session, {})
+            if key in entries:
+                return entries[key][0]
+            ctx = contextvars.copy_context()
+            future = self._pool.submit(ctx.run, fn, *args)
+            entries[key] = (future, now)
+            self._counts[key[0]]["issued"] += 1
+            return future
+
+    def lookup(self, key):
+        """ Prefetched value for `key` in the active session (consumed), or MISSING. """
+        session = _session.get()
+        if session is None:
+            return MISSING
+        with self._lock:
+            entry = self._entries.get(session, {}).pop(key, None)
+            if entry is None:
+                self._counts[key[0]]["misses"] += 1
+                return MISSING
+            if time.monotonic() - entry[1] > self.ttl:
+                self._discard(key, entry)
+                self._counts[key[0]]["misses"] += 1
+                return MISSING
+        try:
+            value = entry[0].result(timeout=self.wait)
+        except Exception:
+            # still running, failed or cancelled: the caller reads for itself
+            with self._lock:
+                self._discard(key, entry)
+                self._counts[key[0]]["misses"] += 1
+            return MISSING
+        with self._lock:
+            self._counts[key[0]]["hits"] += 1
+        return value
+
+    def discard(self, session):
+        """ Drop everything left over for `session` (counted as wasted). """
+        with self._lock:
+            for key, entry in self._entries.pop(session, {}).items():
+                self._discard(key, entry)
+
+    @contextmanager
+    def active(self, session):
+        """ Let lookups in this block use `session`'s prefetched data; leftovers are discarded on exit. """
+        token = _session.set(session)
+        try:
+            yield
+        finally:
+            _session.reset(token)
+            self.discard(session)
+
+    def stats(self):
+        with self._lock:
+            by_kind = {kind: dict(c) for kind, c in self._counts.items()}
+            pending = sum(len(e) for e in self._entries.values())
+        issued = sum(c["issued"] for c in by_kind.values())
+        hits = sum(c["hits"] for c in by_kind.values())
+        wasted = sum(c["wasted"] for c in by_kind.values())
+        return {
+            "issued": issued,
+            "hits": hits,
+            "wasted": wasted,
+            "misses": sum(c["misses"] for c in by_kind.values()),
+            "pending": pending,
+            "hit_ratio": round(hits / issued, 4) if issued else None,
+            "waste_ratio": round(wasted / issued, 4) if issued else None,
+            "by_kind": by_kind,
+        }
@@ -0,0 +1,87 @@
+# singleflight.py
+"""
+Request coalescing for identical concurrent reads.
+
+While a read for a key is in flight, other threads asking for the same key wait for
+it and get a copy of its result instead of sending their own query. Nothing is kept
+after the read finishes, so results are never older than a read that was already
+running when the caller arrived.
+"""
+import copy
+import os
+import threading
+from collections import defaultdict
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT", "1") == "1"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self, enabled=SINGLEFLIGHT_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self._counts = defaultdict(lambda: {"calls": 0, "leaders": 0, "shared": 0, "saved_reads": 0})
+
+    def do(self, key, fn, *args, private_errors=()):
+        """
+        fn(*args), shared with concurrent callers of the same key. key[0] is the kind in stats().
+        Followers get a deep copy of the leader's result (or its exception). Exceptions in
+        `private_errors` belong to the leader's request only; followers then run fn themselves.
+        """
+        if not self.enabled:
+            return fn(*args)
+        with self._lock:
+            counts = self._counts[key[0]]
+            counts["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counts["leaders"] += 1
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn(*args)
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if call.error is None and call.followers:
+                        self._counts[key[0]]["shared"] += call.followers
+                        self._counts[key[0]]["saved_reads"] += call.followers * _billed_reads(call.result)
+                call.done.set()
+
+        call.done.wait()
+        if call.error is not None:
+            if isinstance(call.error, private_errors):
+                return fn(*args)
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def stats(self):
+        with self._lock:
+            by_kind = {kind: dict(c) for kind, c in self._counts.items()}
+        return {
+            "calls": sum(c["calls"] for c in by_kind.values()),
+            "shared": sum(c["shared"] for c in by_kind.values()),
+            "saved_reads": sum(c["saved_reads"] for c in by_kind.values()),
+            "by_kind": by_kind,
+        }
+
+
+def _billed_reads(result):
+    """ Reads a query returning `result` costs: one per document, at least one. """
+    return max(1, len(result)) if isinstance(result, list) else 1
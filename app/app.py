@@ -2,8 +2,6 @@
 import json
 import torch
 import gradio as gr
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from peft import AutoPeftModelForSeq2SeqLM
 import re
 from datetime import datetime, timedelta
 from huggingface_hub import InferenceClient
@@ -13,20 +11,43 @@ from dotenv import load_dotenv
 # Firebase utils
 try:
     from Firebase import firebase_utils as fu
+    from Firebase import export as appointment_export
 except ImportError:
     import firebase_utils as fu
+    import export as appointment_export
+
+from chat_history import ChatHistoryStore, payload_size
+import metrics
+import profiling
+from model_store import load_intent_model
+from conversation_log import ConversationLogger
+from model_registry import ADMIN_TOKEN, ModelRegistry, add_admin_routes
+import rephraser as rephrasers
+import hashlib
+import hmac
+import logging
+import shutil
+import time
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+turn_log = logging.getLogger("barber.turn")
 
 # ---------------- CONFIG ----------------
 
 
-MODEL_PATH = "GMR01231/Barber_Intent_Bot"
+MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "GMR01231/Barber_Intent_Bot")
+# Serve /metrics (Prometheus) next to the Gradio UI; set to 0 to use demo.launch(share=True)
+METRICS_ENDPOINT = os.getenv("METRICS_ENDPOINT", "1") == "1"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
 print("Loading model...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH).to(DEVICE)
-model.eval()
-print("✅ Model ready")
+# Local, checksum-verified, memory-mapped copy first; the Hub only when it's missing
+tokenizer, model, model_load_info = load_intent_model(MODEL_PATH, device=DEVICE)
+print(f"✅ Model ready ({model_load_info['resolved_from']}: resolve {model_load_info['resolve_s']}s, "
+      f"read {model_load_info['read_s']}s, init {model_load_info['init_s']}s)")
+for _phase in ("resolve", "read", "init"):
+    metrics.set_gauge("model_load_seconds", model_load_info[f"{_phase}_s"], phase=_phase)
+metrics.describe("model_load_seconds", "gauge", "Intent model cold-start time by phase")
 
 
 # Labels (must match training order)
@@ -41,6 +62,11 @@ id2label = {
 
 # ---------------- SESSION STATE ----------------
 sessions = {}
+# Windowed transcript per session, kept server-side so the UI never re-sends it
+chat_store = ChatHistoryStore()
+# Turns queued for retraining data (CONVERSATION_LOG_DIR); None when disabled
+conversation_logger = ConversationLogger.from_env()
+
 def get_session(session_id):
     if session_id not in sessions:
         sessions[session_id] = {"intent": None, "barber": None, "date": None, "time": None}
@@ -199,6 +225,9 @@ def regex_fallback(message: str):
     return {"intent": "small_talk"}
 
 # ---------------- MODEL INFERENCE (returns REPLY STRING) ----------------
+# REPHRASER=remote (default, HF Inference API), local (small seq2seq on CPU) or off
+REPHRASER = rephrasers.REPHRASER
+
 # Initialize once (requires HF token in your env: HUGGINGFACEHUB_API_TOKEN) 
 # Check if HF_TOKEN is already set in environment 
 hf_token = os.getenv("HF_TOKEN") 
@@ -207,72 +236,220 @@ if not hf_token:
     load_dotenv() 
     hf_token = os.getenv("HF_TOKEN") 
     
-# Final check 
-if not hf_token: 
+# Final check (only the remote rephraser needs the token)
+if not hf_token and REPHRASER == "remote": 
     raise EnvironmentError( "❌ Hugging Face API token not found. Please set HF_TOKEN or HUGGINGFACEHUB_API_TOKEN " "in your environment or in a .env file." ) 
-else: 
+elif hf_token: 
     print("✅ Hugging Face token loaded successfully.") 
 
 # Initialize client with token + model 
-hf_client = InferenceClient( model="mistralai/Mistral-7B-Instruct-v0.2", token=hf_token ) 
+# LLM_BASE_URL points at any OpenAI-style chat-completions server instead (e.g. bench/mock_llm.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+if LLM_BASE_URL:
+    hf_client = InferenceClient(base_url=LLM_BASE_URL, token=hf_token)
+else:
+    hf_client = InferenceClient( model="mistralai/Mistral-7B-Instruct-v0.2", token=hf_token ) 
+
+rephraser = rephrasers.from_env(hf_client)
 
 def make_response_natural(user_message: str, bot_message: str) -> str: 
     """ Take the system response and rephrase it in a natural conversational way. """
-    prompt = f""" You are a friendly AI barber assistant. 
-    The user said: "{user_message}" 
-    The system generated reply is: "{bot_message}" 
-    Rewrite the system reply into a natural, conversational sentence. 
-    Keep the meaning the same. 
-    Do NOT add questions, explanations, or commentary. 
-    Do NOT wrap the reply in quotes. 
-    Only output the final reply text. """ 
-    # Use chat completion (Mistral supports conversational API, not raw text_generation) 
-    response = hf_client.chat.completions.create( 
-        model="mistralai/Mistral-7B-Instruct-v0.2", 
-        messages=[{"role": "user", "content": prompt}], 
-        max_tokens=150, 
-        temperature=0.7 ) 
-    
-    return response.choices[0].message.content
+    return rephraser.rephrase(user_message, bot_message)
+
+
+def classify_text(tok, mdl, text: str) -> str:
+    """ Label for one message with the given tokenizer/model (used for shadow scoring). """
+    inputs = tok(text, return_tensors="pt", truncation=True, padding=True).to(DEVICE)
+    with torch.no_grad():
+        logits = mdl(**inputs).logits
+    return id2label[torch.argmax(logits, dim=-1).item()]
+
+
+# Serving model can be swapped at runtime (see model_registry.py)
+model_registry = ModelRegistry(classify_text, device=DEVICE)
+model_registry.set_serving(tokenizer, model, os.path.basename(MODEL_PATH.rstrip("/")), model_load_info)
 
 
 def predict_intent(text: str) -> str:
+    # One read of the serving pair per request: a concurrent swap can't mix versions
+    serving = model_registry.current()
+    start = time.perf_counter()
+
     # Tokenize
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(DEVICE)
+    with metrics.span("tokenize"):
+        inputs = serving.tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(DEVICE)
 
     # Forward pass
-    with torch.no_grad():
-        outputs = model(**inputs)
+    with metrics.span("forward"), profiling.torch_ops("predict_intent"), torch.no_grad():
+        outputs = serving.model(**inputs)
 
     # Prediction
     logits = outputs.logits
     predicted_class_id = torch.argmax(logits, dim=-1).item()
-    return id2label[predicted_class_id]
+    label = id2label[predicted_class_id]
+    model_registry.shadow(text, label, (time.perf_counter() - start) * 1000)
+    return label
+
+
+# Words that make a booking turn likely enough to start loading schedules before inference
+BOOKING_HINTS = ["book", "bok", "reserve", "schedule", "slot", "asap", "as soon as possible"]
+
+def maybe_prefetch(message, session_id):
+    """ Start booking reads in the background if this turn looks like (part of) a booking. """
+    sess = sessions.get(session_id) or {}
+    text = (message or "").lower()
+    if sess.get("intent") != "book_appointment" and not any(w in text for w in BOOKING_HINTS):
+        return
+    # Same date precedence as route_intent: session first, then the message
+    date = sess.get("date") or detect_date_time(message)[0]
+    fu.prefetch_booking(session_id, user_email=session_id or "demo@example.com",
+                        barber_name=sess.get("barber"), dates=[date] if date else None)
 
 
 def chatbot_fn(message, session_id="default"):
- 
-    print(predict_intent(message))
-    intent = predict_intent(message)
-
-    # Guarantee fields exist (default null if missing)
-    required_keys = ["intent", "barber", "date", "time"]
-   
-     # Always start with default dict
-    parsed = {"intent": intent, "barber": None, "date": None, "time": None}
-
-    # Fallback / guard-rails
-    if parsed.get("intent") is None:
-        parsed = regex_fallback(message)
-        for k in required_keys:
-            parsed.setdefault(k, None)
-
-    # Route & return final reply STRING
-    # reply = route_intent(parsed, message, session_id=session_id, user_email=session_id or "demo@example.com")
-    raw_reply = route_intent(parsed, message, session_id=session_id, user_email=session_id or "demo@example.com")
-    final_reply = make_response_natural(message, raw_reply)
+    with profiling.maybe_profile("chatbot_fn"), metrics.turn() as trace:
+        maybe_prefetch(message, session_id)
+        intent = predict_intent(message)
+        trace["intent"] = intent
+
+        # Guarantee fields exist (default null if missing)
+        required_keys = ["intent", "barber", "date", "time"]
+
+        # Always start with default dict
+        parsed = {"intent": intent, "barber": None, "date": None, "time": None}
+
+        # Fallback / guard-rails
+        if parsed.get("intent") is None:
+            parsed = regex_fallback(message)
+            for k in required_keys:
+                parsed.setdefault(k, None)
+            trace["intent"] = parsed["intent"]
+
+        # Route & return final reply STRING
+        with metrics.span("route", intent=trace["intent"]), fu.request_scope(trace["intent"]) as ops, \
+                fu.prefetch_cache.active(session_id):
+            raw_reply = route_intent(parsed, message, session_id=session_id, user_email=session_id or "demo@example.com")
+        record_firestore_ops(ops)
+        trace["firestore"] = ops.as_dict()
+        with metrics.span("rephrase", intent=trace["intent"]):
+            final_reply = make_response_natural(message, raw_reply)
+
+    log_turn(trace, session_id, message, final_reply)
+    if conversation_logger:
+        conversation_logger.log({
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "session": hashlib.sha1(str(session_id).encode("utf-8")).hexdigest()[:12],
+            "message": message,
+            "intent": trace.get("intent"),
+            "route_reply": raw_reply,
+            "reply": final_reply,
+            "total_ms": round(trace.get("total_ms", 0.0), 2),
+            "stages_ms": {k: round(v, 2) for k, v in trace["stages_ms"].items()},
+            "error": trace.get("error"),
+        })
     return final_reply
-    # return str(reply)
+
+
+def log_turn(trace, session_id, message, reply):
+    """ One structured (JSON) log line per chat turn. """
+    turn_log.info(json.dumps({
+        "event": "chat_turn",
+        "session": hashlib.sha1(str(session_id).encode("utf-8")).hexdigest()[:12],
+        "intent": trace.get("intent"),
+        "total_ms": round(trace.get("total_ms", 0.0), 2),
+        "stages_ms": {k: round(v, 2) for k, v in trace["stages_ms"].items()},
+        "firestore": trace.get("firestore"),
+        "message_chars": len(message or ""),
+        "reply_chars": len(reply or ""),
+    }, ensure_ascii=False))
+
+
+def record_firestore_ops(ops):
+    """ Export the Firestore operations of one request scope as metrics. """
+    metrics.inc("firestore_reads_total", ops.reads, intent=ops.intent)
+    metrics.inc("firestore_queries_total", ops.queries, intent=ops.intent)
+    metrics.inc("firestore_writes_total", ops.writes, intent=ops.intent)
+    metrics.inc("firestore_cached_reads_total", ops.cached_reads, intent=ops.intent)
+    metrics.observe("firestore_reads_per_request", ops.reads, intent=ops.intent)
+
+
+metrics.describe("firestore_reads_total", "counter", "Firestore documents read (billed reads), by intent")
+metrics.describe("firestore_queries_total", "counter", "Firestore queries issued, by intent")
+metrics.describe("firestore_writes_total", "counter", "Firestore document writes, by intent")
+metrics.describe("firestore_cached_reads_total", "counter",
+                 "Reads answered by the per-call identity map instead of Firestore, by intent")
+metrics.describe("firestore_reads_per_request", "summary", "Firestore documents read per request, by intent")
+metrics.describe("chat_payload_bytes_last", "gauge",
+                 "Bytes sent to (request: new message) / from (response: whole history window) the server on the latest turn")
+metrics.describe("chat_payload_bytes_max", "gauge", "Largest per-turn payload among recent turns, by direction")
+metrics.describe("chat_history_sessions", "gauge", "Sessions with a server-side transcript")
+metrics.describe("prefetch_issued_total", "counter", "Speculative booking reads started, by kind")
+metrics.describe("prefetch_hits_total", "counter", "Prefetched results used by book_appointment, by kind")
+metrics.describe("prefetch_wasted_total", "counter", "Prefetched results discarded unused, by kind")
+metrics.describe("prefetch_misses_total", "counter", "Booking reads with no usable prefetched result, by kind")
+metrics.describe("prefetch_hit_ratio", "gauge", "Prefetch hits / issued")
+metrics.describe("prefetch_waste_ratio", "gauge", "Prefetch wasted / issued")
+metrics.describe("firestore_prefetch_reads_total", "counter", "Firestore documents read by speculative prefetch")
+metrics.describe("firestore_coalesced_calls_total", "counter", "Reads served by joining an identical in-flight query, by kind")
+metrics.describe("firestore_coalesced_reads_saved_total", "counter", "Firestore document reads saved by coalescing, by kind")
+metrics.describe("conversation_log_records_total", "counter", "Conversation log records, by outcome (enqueued/written/dropped)")
+metrics.describe("conversation_log_queue_depth", "gauge", "Conversation log records waiting to be written")
+metrics.describe("intent_model_info", "gauge", "Intent model versions by role (serving/previous/candidate)")
+metrics.describe("intent_model_shadow_samples", "gauge", "Turns scored by the candidate model in shadow mode")
+metrics.describe("intent_model_shadow_agreement", "gauge", "Label agreement between candidate and serving model")
+
+
+@metrics.add_collector
+def _collect_payload_stats():
+    stats = chat_store.payload_stats()
+    if stats.get("count"):
+        for direction in ("request", "response"):
+            metrics.set_gauge("chat_payload_bytes_last", stats[direction]["last"], direction=direction)
+            metrics.set_gauge("chat_payload_bytes_max", stats[direction]["max"], direction=direction)
+        metrics.set_gauge("chat_history_sessions", stats["sessions"])
+
+
+@metrics.add_collector
+def _collect_prefetch_stats():
+    stats = fu.prefetch_cache.stats()
+    for kind, counts in stats["by_kind"].items():
+        for field in ("issued", "hits", "wasted", "misses"):
+            metrics.inc_to(f"prefetch_{field}_total", counts[field], kind=kind)
+    if stats["issued"]:
+        metrics.set_gauge("prefetch_hit_ratio", stats["hit_ratio"])
+        metrics.set_gauge("prefetch_waste_ratio", stats["waste_ratio"])
+    metrics.inc_to("firestore_prefetch_reads_total", fu.firestore_totals().get("prefetch", {}).get("reads", 0))
+
+
+@metrics.add_collector
+def _collect_coalescing_stats():
+    for kind, counts in fu.flights.stats()["by_kind"].items():
+        metrics.inc_to("firestore_coalesced_calls_total", counts["shared"], kind=kind)
+        metrics.inc_to("firestore_coalesced_reads_saved_total", counts["saved_reads"], kind=kind)
+
+
+@metrics.add_collector
+def _collect_conversation_log_stats():
+    if not conversation_logger:
+        return
+    stats = conversation_logger.stats()
+    for outcome in ("enqueued", "written", "dropped"):
+        metrics.inc_to("conversation_log_records_total", stats[outcome], outcome=outcome)
+    metrics.set_gauge("conversation_log_queue_depth", stats["queue_depth"])
+
+
+_model_info_labels = set()
+
+@metrics.add_collector
+def _collect_model_registry_stats():
+    status = model_registry.status()
+    current = {(role, status[role]) for role in ("serving", "previous", "candidate") if status[role]}
+    for role, version in _model_info_labels | current:
+        metrics.set_gauge("intent_model_info", int((role, version) in current), role=role, version=version)
+    _model_info_labels.update(current)
+    metrics.set_gauge("intent_model_shadow_samples", status["shadow"]["samples"])
+    if status["shadow"]["agreement"] is not None:
+        metrics.set_gauge("intent_model_shadow_agreement", status["shadow"]["agreement"])
 
 # ---------------- GRADIO UI ----------------
 with gr.Blocks(css="""
@@ -339,24 +516,65 @@ with gr.Blocks(css="""
                 )
             refresh_btn = gr.Button("🔄 Refresh Data")
 
+    # --- EXPORT PAGE (needs ADMIN_TOKEN) ---
+    with gr.Row(visible=False) as export_row:
+        with gr.Column():
+            gr.Markdown("### 📤 Export appointments")
+            with gr.Row():
+                export_period = gr.Radio(["day", "month"], value="month", label="Period")
+                export_value = gr.Textbox(label="Day or month", placeholder="YYYY-MM-DD or YYYY-MM")
+                export_format = gr.Radio(["csv", "parquet"] if appointment_export.PARQUET_AVAILABLE else ["csv"],
+                                         value="csv", label="Format")
+            export_token = gr.Textbox(label="Admin token", type="password")
+            export_btn = gr.Button("Export")
+            export_status = gr.Markdown()
+            export_file = gr.File(label="Download", interactive=False)
+
     # --- FUNCTIONS ---
     def do_login(email):
         if not email or "@" not in email:
-            return gr.update(value="❌ Please enter a valid email."), gr.update(visible=True), gr.update(visible=False), ""
+            return (gr.update(value="❌ Please enter a valid email."), gr.update(visible=True), gr.update(visible=False),
+                    "", [], gr.update(visible=False))
         return (
             gr.update(value=f"✅ Logged in as {email}"),
             gr.update(visible=False),
             gr.update(visible=True),
-            email
+            email,
+            chat_store.window_for(email),  # restore the server-side window
+            gr.update(visible=bool(ADMIN_TOKEN))
         )
 
     login_btn.click(
         do_login,
         inputs=email_box,
-        outputs=[login_status, login_row, chat_row, user_email]
+        outputs=[login_status, login_row, chat_row, user_email, chatbot, export_row]
     )
 
+    def run_export(period, value, fmt, token):
+        # the login is just a typed email, so the token is the only access control here
+        if not ADMIN_TOKEN:
+            return "❌ Exports are disabled (ADMIN_TOKEN not set).", None
+        if not hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()):
+            return "❌ Invalid admin token.", None
+        try:
+            report = appointment_export.export_period(period, (value or "").strip(), fmt)
+        except Exception as e:
+            return f"❌ Export failed: {e}", None
+        path = report["out"]
+        if fmt == "parquet":  # a folder of part files; hand it out as one zip
+            path = shutil.make_archive(path, "zip", path)
+        return f"✅ {report['rows']} appointments ({report['from']} → {report['to']}) in {report['seconds']}s", path
+
+    export_btn.click(run_export, [export_period, export_value, export_format, export_token],
+                     [export_status, export_file], api_name=False)
+
     def load_data():
+        with fu.request_scope("side_panel") as ops:
+            result = _load_data()
+        record_firestore_ops(ops)
+        return result
+
+    def _load_data():
         try:
             services = fu.get_all_services()
             if not isinstance(services, list):
@@ -376,25 +594,28 @@ with gr.Blocks(css="""
 
     refresh_btn.click(load_data, None, [services_box, barbers_box])
 
-    def respond(user_message, chat_history, email):
+    def respond(user_message, email):
         # email also doubles as session_id for per-user sessions
         session_id = email or "default"
         reply = chatbot_fn(user_message, session_id=session_id)
-
-        # Gradio Chatbot expects list of (user, bot) tuples
-        chat_history = chat_history + [(user_message, reply)]
-        return chat_history, ""  # clear input
-    
-    def respond(user_message, chat_history, email):
-        if chat_history is None:
-            chat_history = []
-        session_id = email or "default"
-        reply = chatbot_fn(user_message, session_id=session_id)
-        chat_history.append((str(user_message), str(reply)))  # ensure strings
-        return chat_history, ""  # clear input box
-    msg.submit(respond, [msg, chatbot, user_email], [chatbot, msg])
-    send.click(respond, [msg, chatbot, user_email], [chatbot, msg])
+        # Only the new message comes in; the bounded server-side window goes out
+        window = chat_store.append(session_id, user_message, reply)
+        # the request is just the new message; the response re-sends the whole window
+        chat_store.record_payload(session_id, payload_size(user_message, email), payload_size(window, ""))
+        return window, ""  # clear input box
+
+    msg.submit(respond, [msg, user_email], [chatbot, msg], api_name="respond")
+    send.click(respond, [msg, user_email], [chatbot, msg], api_name=False)
     # clear.click(lambda: [], None, chatbot, queue=False)
 
 if __name__ == "__main__":
-    demo.launch(share=True)
+    if METRICS_ENDPOINT:
+        import uvicorn
+        api = metrics.make_asgi_app()
+        add_admin_routes(api, model_registry)   # /admin/model/* (needs ADMIN_TOKEN)
+        server = gr.mount_gradio_app(api, demo, path="/")
+        uvicorn.run(server,
+                    host=os.getenv("GRADIO_SERVER_NAME", "0.0.0.0"),
+                    port=int(os.getenv("GRADIO_SERVER_PORT", "7860")))
+    else:
+        demo.launch(share=True)
@@ -0,0 +1,95 @@
+# chat_history.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ---------------- CONFIG ----------------
+# How many (user, bot) turns are kept per session; the whole window is sent back to the UI every turn.
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+# Upper bound on the number of sessions held in memory (least recently used are evicted).
+CHAT_HISTORY_MAX_SESSIONS = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "1000"))
+# Upper bound on the characters of a single stored message (longer ones are truncated).
+CHAT_HISTORY_MAX_MESSAGE_CHARS = int(os.getenv("CHAT_HISTORY_MAX_MESSAGE_CHARS", "2000"))
+# How many recent per-turn payload sizes are kept for inspection.
+PAYLOAD_SAMPLES = int(os.getenv("CHAT_PAYLOAD_SAMPLES", "500"))
+
+
+def payload_size(*values) -> int:
+    """ Size in bytes of the values as Gradio would serialize them (JSON). """
+    return len(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class ChatHistoryStore:
+    """
+    Server-side conversation storage keyed by session.
+    Each session keeps only the last `window` turns and the store itself
+    keeps at most `max_sessions` sessions (LRU eviction).
+    """
+
+    def __init__(self, window=CHAT_HISTORY_WINDOW, max_sessions=CHAT_HISTORY_MAX_SESSIONS,
+                 max_message_chars=CHAT_HISTORY_MAX_MESSAGE_CHARS, payload_samples=PAYLOAD_SAMPLES):
+        self.window = max(1, window)
+        self.max_sessions = max(1, max_sessions)
+        self.max_message_chars = max_message_chars
+        self._sessions = OrderedDict()
+        self._payloads = deque(maxlen=payload_samples)
+        self._lock = threading.Lock()
+
+    def _clip(self, text):
+        text = str(text)
+        if self.max_message_chars and len(text) > self.max_message_chars:
+            return text[:self.max_message_chars] + "…"
+        return text
+
+    def append(self, session_id, user_message, bot_message):
+        """ Store one turn and return the current window for the session. """
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                turns = deque(maxlen=self.window)
+                self._sessions[session_id] = turns
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            turns.append((self._clip(user_message), self._clip(bot_message)))
+            return list(turns)
+
+    def window_for(self, session_id):
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            return list(turns) if turns else []
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    # ---------------- PAYLOAD ACCOUNTING ----------------
+    def record_payload(self, session_id, request_bytes, response_bytes):
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            self._payloads.append({
+                "ts": time.time(),
+                "session": session_id,
+                "turns": len(turns) if turns else 0,
+                "request": request_bytes,
+                "response": response_bytes,
+            })
+
+    def payload_stats(self):
+        """
+        Recorded per-turn payload sizes by direction. Requests carry only the new message;
+        responses carry the whole window again (a Chatbot update replaces its value), so they
+        grow with the chat until it fills `window` turns and then stay flat.
+        """
+        with self._lock:
+            samples = list(self._payloads)
+        if not samples:
+            return {"count": 0}
+        out = {"count": len(samples), "sessions": len(self._sessions)}
+        for direction in ("request", "response"):
+            sizes = [s[direction] for s in samples]
+            out[direction] = {"last": sizes[-1], "max": max(sizes), "mean": sum(sizes) / len(sizes)}
+        return out
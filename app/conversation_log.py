@@ -0,0 +1,214 @@
+# conversation_log.py
+"""
+Non-blocking conversation logging for retraining data.
+
+chatbot_fn hands each finished turn to `ConversationLogger.log()`, which only does a
+put_nowait on a bounded queue (when the queue is full the record is dropped and
+counted, the turn never waits). A background thread drains the queue in batches into
+gzip-compressed JSONL files that rotate by size and by day.
+
+Enabled with CONVERSATION_LOG_DIR. Turning the logs into training examples:
+    python conversation_log.py convert --dir logs/conversations --out ../training/Dataset/intent_real.json
+"""
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+# ---------------- CONFIG ----------------
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "")
+CONVERSATION_LOG_QUEUE = int(os.getenv("CONVERSATION_LOG_QUEUE", "10000"))
+CONVERSATION_LOG_BATCH = int(os.getenv("CONVERSATION_LOG_BATCH", "256"))
+CONVERSATION_LOG_FLUSH_S = float(os.getenv("CONVERSATION_LOG_FLUSH_S", "2"))
+CONVERSATION_LOG_ROTATE_MB = float(os.getenv("CONVERSATION_LOG_ROTATE_MB", "32"))
+
+_STOP = object()
+
+
+class ConversationLogger:
+    def __init__(self, directory, queue_size=CONVERSATION_LOG_QUEUE, batch_size=CONVERSATION_LOG_BATCH,
+                 flush_interval=CONVERSATION_LOG_FLUSH_S, rotate_mb=CONVERSATION_LOG_ROTATE_MB):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate_bytes = int(rotate_mb * 2**20)
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._counts = {"enqueued": 0, "dropped": 0, "written": 0, "batches": 0, "files": 0, "errors": 0}
+        self._file = None
+        self._path = None
+        self._day = None
+        self._batch = []   # records taken off the queue by the writer but not written yet
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls):
+        """ A logger writing to CONVERSATION_LOG_DIR, or None when it is not set. """
+        return cls(CONVERSATION_LOG_DIR) if CONVERSATION_LOG_DIR else None
+
+    # -------- producer side (request threads) --------
+    def log(self, record):
+        """ Queue one record; returns False (and counts a drop) instead of blocking when full. """
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._counts["dropped"] += 1
+            return False
+        with self._lock:
+            self._counts["enqueued"] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, queue_depth=self._queue.qsize(), file=self._path)
+
+    def close(self, timeout=10):
+        """
+        Flush what is queued and stop the writer, waiting at most `timeout` seconds in total.
+        Records still queued when the writer is stuck or dead are counted as dropped.
+        """
+        if not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+            stop_queued = 1
+        except queue.Full:
+            stop_queued = 0
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            lost = max(0, self._queue.qsize() - stop_queued) + len(self._batch)
+            with self._lock:
+                self._counts["dropped"] += lost
+            print(f"⚠️ Conversation log writer did not stop within {timeout}s; {lost} records not written")
+
+    # -------- writer thread --------
+    def _run(self):
+        batch = self._batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if item is not None and not stop:
+                batch.append(item)
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = self._batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _open(self):
+        day = time.strftime("%Y%m%d")
+        if self._file and (day != self._day or os.path.getsize(self._path) >= self.rotate_bytes):
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._day = day
+            self._path = os.path.join(self.directory,
+                                      f"conversations-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz")
+            self._file = gzip.open(self._path, "at", encoding="utf-8")
+            with self._lock:
+                self._counts["files"] += 1
+        return self._file
+
+    def _write(self, batch):
+        try:
+            f = self._open()
+            f.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch))
+            f.flush()  # sync-flush: everything written so far is readable from the .gz
+            with self._lock:
+                self._counts["written"] += len(batch)
+                self._counts["batches"] += 1
+        except Exception as e:
+            with self._lock:
+                self._counts["errors"] += 1
+            print(f"⚠️ Conversation log write failed ({len(batch)} records lost): {e}")
+
+
+# ---------------- Converter ----------------
+def read_records(paths):
+    """ Records from .jsonl.gz logs; a file cut off mid-write yields what was flushed. """
+    for path in paths:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            print(f"⚠️ {path}: stopped early ({e})")
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def to_training_examples(records, exclude_intents=(), skip_errors=True, dedupe=True):
+    """ {"text", "intent"} examples (the generator's format) from logged turns. """
+    seen = set()
+    for r in records:
+        text, intent = (r.get("message") or "").strip(), r.get("intent")
+        if not text or not intent or intent in exclude_intents:
+            continue
+        if skip_errors and r.get("error"):
+            continue
+        key = _normalize(text)
+        if dedupe:
+            if key in seen:
+                continue
+            seen.add(key)
+        yield {"text": text, "intent": intent}
+
+
+def convert(args):
+    paths = sorted(glob.glob(os.path.join(args.dir, "*.jsonl.gz")))
+    if not paths:
+        raise SystemExit(f"No *.jsonl.gz logs in {args.dir}")
+    examples = to_training_examples(read_records(paths), exclude_intents=set(args.exclude_intent or []),
+                                    dedupe=not args.no_dedupe)
+    n = 0
+    with open(args.out, "w", encoding="utf-8") as f:
+        if args.out.endswith(".jsonl"):
+            for ex in examples:
+                f.write(json.dumps(ex, ensure_ascii=False) + "\n")
+                n += 1
+        else:
+            # same layout as intent_train.json
+            items = list(examples)
+            json.dump(items, f, indent=2, ensure_ascii=False)
+            n = len(items)
+    print(f"✅ {n} examples from {len(paths)} log file(s) → {args.out}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Conversation log tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="Logged turns → {text, intent} training examples")
+    c.add_argument("--dir", default=CONVERSATION_LOG_DIR or "logs/conversations")
+    c.add_argument("--out", required=True, help=".json (list, like intent_train.json) or .jsonl")
+    c.add_argument("--exclude-intent", action="append", help="Skip turns with this intent (repeatable)")
+    c.add_argument("--no-dedupe", action="store_true")
+    args = ap.parse_args()
+    if args.cmd == "convert":
+        convert(args)
+
+
+if __name__ == "__main__":
+    main()
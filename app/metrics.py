@@ -0,0 +1,233 @@
+# metrics.py
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+# Observations kept per series for quantile estimation (sliding window)
+WINDOW_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)        # (name, labels) -> value
+_gauges = {}                          # (name, labels) -> value
+_observations = {}                    # (name, labels) -> deque of values
+_obs_totals = defaultdict(lambda: [0, 0.0])  # (name, labels) -> [count, sum]
+_synced_totals = {}                   # (name, labels) -> last total passed to inc_to()
+_help = {}                            # name -> (type, help)
+_collectors = []
+_turn_listeners = []
+
+# Stage timings of the turn currently being traced (per thread / task)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def describe(name, kind, text):
+    _help[name] = (kind, text)
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def inc_to(name, total, **labels):
+    """
+    Advance a counter to a running total kept elsewhere (e.g. a component's stats()), by the
+    delta since the last call. A total that went down (component reset) is added as-is.
+    """
+    key = _key(name, labels)
+    with _lock:
+        last = _synced_totals.get(key, 0)
+        _synced_totals[key] = total
+        _counters[key] += total - last if total >= last else total
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        window = _observations.get(key)
+        if window is None:
+            window = _observations[key] = deque(maxlen=WINDOW_SIZE)
+        window.append(value)
+        totals = _obs_totals[key]
+        totals[0] += 1
+        totals[1] += value
+
+
+def add_collector(fn):
+    """ Register a callable that refreshes gauges/counters right before metrics are read. """
+    _collectors.append(fn)
+    return fn
+
+
+def add_turn_listener(fn):
+    """ Register a callable that receives every finished turn trace (used by benchmarks). """
+    _turn_listeners.append(fn)
+    return fn
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+# ---------------- TRACING ----------------
+@contextmanager
+def span(stage, **labels):
+    """ Time one pipeline stage and record it as chat_stage_seconds{stage=...}. """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("chat_stage_seconds", elapsed, stage=stage, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["stages_ms"][stage] = trace["stages_ms"].get(stage, 0.0) + elapsed * 1000
+
+
+@contextmanager
+def turn():
+    """ Collect the stage timings of one chat turn; yields a dict the caller can annotate. """
+    trace = {"intent": None, "stages_ms": {}, "error": None}
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    except Exception as e:
+        trace["error"] = type(e).__name__
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace["total_ms"] = (time.perf_counter() - start) * 1000
+        intent = trace.get("intent") or "unknown"
+        observe("chat_turn_seconds", trace["total_ms"] / 1000, intent=intent)
+        inc("chat_turns_total", intent=intent)
+        if trace["error"]:
+            inc("chat_turn_errors_total", intent=intent)
+        for fn in list(_turn_listeners):
+            fn(trace)
+
+
+# ---------------- EXPORT ----------------
+def _refresh():
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+
+
+def snapshot():
+    """ Plain-dict view of all series (used by benchmarks and tests). """
+    _refresh()
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        obs = {k: sorted(v) for k, v in _observations.items()}
+        totals = {k: tuple(v) for k, v in _obs_totals.items()}
+
+    def fmt(key):
+        name, labels = key
+        return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+    out = {"counters": {fmt(k): v for k, v in counters.items()},
+           "gauges": {fmt(k): v for k, v in gauges.items()},
+           "summaries": {}}
+    for key, values in obs.items():
+        count, total = totals[key]
+        out["summaries"][fmt(key)] = {
+            "count": count,
+            "sum": total,
+            **{f"p{int(q * 100)}": _quantile(values, q) for q in QUANTILES},
+        }
+    return out
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
+        _obs_totals.clear()
+        _synced_totals.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """ Prometheus text exposition format (version 0.0.4). """
+    _refresh()
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        obs = {k: sorted(v) for k, v in _observations.items()}
+        totals = {k: tuple(v) for k, v in _obs_totals.items()}
+
+    def labelstr(labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+    lines = []
+    seen = set()
+
+    def header(name, default_kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = _help.get(name, (default_kind, name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{labelstr(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{labelstr(labels)} {value}")
+    for (name, labels), values in sorted(obs.items()):
+        header(name, "summary")
+        for q in QUANTILES:
+            lines.append(f"{name}{labelstr(labels, [('quantile', q)])} {_quantile(values, q)}")
+        count, total = totals[(name, labels)]
+        lines.append(f"{name}_sum{labelstr(labels)} {total}")
+        lines.append(f"{name}_count{labelstr(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def make_asgi_app():
+    """ FastAPI app exposing /metrics; the Gradio UI gets mounted next to it. """
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    api = FastAPI()
+
+    @api.get("/metrics")
+    def metrics_endpoint():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return api
+
+
+describe("chat_stage_seconds", "summary", "Latency of each chat pipeline stage in seconds")
+describe("chat_turn_seconds", "summary", "End-to-end latency of a chat turn in seconds")
+describe("chat_turns_total", "counter", "Chat turns handled, by predicted intent")
+describe("chat_turn_errors_total", "counter", "Chat turns that raised, by predicted intent")
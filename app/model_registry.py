@@ -0,0 +1,210 @@
+# model_registry.py
+"""
+Hot-swappable intent model.
+
+The serving (tokenizer, model) pair lives in one `Serving` tuple that request threads
+read with a single attribute access, so a swap is atomic and never pauses requests.
+A new version is loaded in a background thread as a *candidate*; while it is there a
+sample of live traffic is also scored by the candidate in a side thread (shadow mode)
+and label agreement / latency are compared with the serving model. promote() swaps it
+in, rollback() swaps the previous version back (it stays loaded for that).
+
+Admin endpoints (mounted next to /metrics, protected by ADMIN_TOKEN):
+    POST /admin/model/load      {"source": "<hub id or folder>", "version": "v2"}
+    GET  /admin/model/status
+    POST /admin/model/promote   (?force=1 to skip the shadow sample minimum)
+    POST /admin/model/rollback
+"""
+import hmac
+import os
+import random
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from model_store import INTENT_MODEL_DIR, load_intent_model
+
+# ---------------- CONFIG ----------------
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.2"))   # fraction of turns also scored by the candidate
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "32"))       # shadow work beyond this is skipped
+SHADOW_MIN_SAMPLES = int(os.getenv("SHADOW_MIN_SAMPLES", "50"))       # required before promote() without force
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+Serving = namedtuple("Serving", "tokenizer model version info")
+
+
+class ModelRegistry:
+    def __init__(self, classify, device="cpu", sample_rate=SHADOW_SAMPLE_RATE, versions_dir=None):
+        """ classify(tokenizer, model, text) -> label is used for shadow scoring. """
+        self.classify = classify
+        self.device = device
+        self.sample_rate = sample_rate
+        self.versions_dir = versions_dir or INTENT_MODEL_DIR + "_versions"
+        self._lock = threading.Lock()
+        self._serving = None
+        self._previous = None
+        self._candidate = None
+        self._candidate_state = None   # "loading" / "ready" / "failed: ..."
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_pending = 0
+        self._reset_shadow()
+
+    def _reset_shadow(self):
+        self._shadow = {"samples": 0, "agree": 0, "skipped": 0, "errors": 0,
+                        "serving_ms": deque(maxlen=1000), "candidate_ms": deque(maxlen=1000),
+                        "disagreements": deque(maxlen=20)}
+
+    # -------- serving --------
+    def set_serving(self, tokenizer, model, version, info=None):
+        self._serving = Serving(tokenizer, model, version, info or {})
+
+    def current(self):
+        """ The serving (tokenizer, model, version, info); read it once per request. """
+        return self._serving
+
+    # -------- candidate --------
+    def load_candidate(self, source, version=None):
+        """ Start loading `source` (Hub id or folder) in the background; returns the version name. """
+        version = version or f"{os.path.basename(source.rstrip('/'))}-{time.strftime('%Y%m%d-%H%M%S')}"
+        with self._lock:
+            if self._candidate_state == "loading":
+                raise RuntimeError("A candidate is already loading")
+            self._candidate, self._candidate_state = None, "loading"
+
+        def work():
+            try:
+                # Hub versions get their own verified local copy next to the serving one
+                local_dir = os.path.join(self.versions_dir, re.sub(r"[^\w.-]", "_", version))
+                tokenizer, model, info = load_intent_model(source, device=self.device, local_dir=local_dir)
+                with self._lock:
+                    self._candidate = Serving(tokenizer, model, version, dict(info, source=source))
+                    self._candidate_state = "ready"
+                    self._reset_shadow()
+                print(f"✅ Candidate model {version} ready ({info['total_s']}s); shadow scoring {self.sample_rate:.0%} of turns")
+            except Exception as e:
+                with self._lock:
+                    self._candidate_state = f"failed: {e}"
+                print(f"❌ Candidate model {version} failed to load: {e}")
+
+        threading.Thread(target=work, name="model-load", daemon=True).start()
+        return version
+
+    # -------- shadow --------
+    def shadow(self, text, served_label, served_ms):
+        """ Maybe score `text` with the candidate too, off the request thread. """
+        candidate = self._candidate
+        if candidate is None or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                self._shadow["skipped"] += 1
+                return
+            self._shadow_pending += 1
+        self._shadow_pool.submit(self._score, candidate, text, served_label, served_ms)
+
+    def _score(self, candidate, text, served_label, served_ms):
+        try:
+            start = time.perf_counter()
+            label = self.classify(candidate.tokenizer, candidate.model, text)
+            ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                if self._candidate is not candidate:
+                    return
+                s = self._shadow
+                s["samples"] += 1
+                s["agree"] += label == served_label
+                s["serving_ms"].append(served_ms)
+                s["candidate_ms"].append(ms)
+                if label != served_label:
+                    s["disagreements"].append({"text": text, "serving": served_label, "candidate": label})
+        except Exception:
+            with self._lock:
+                self._shadow["errors"] += 1
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    # -------- swap --------
+    def promote(self, force=False):
+        with self._lock:
+            if self._candidate is None:
+                raise RuntimeError(f"No candidate to promote ({self._candidate_state or 'none loaded'})")
+            if not force and self._shadow["samples"] < SHADOW_MIN_SAMPLES:
+                raise RuntimeError(f"Only {self._shadow['samples']} shadow samples (need {SHADOW_MIN_SAMPLES}); use force")
+            self._previous, self._serving = self._serving, self._candidate
+            self._candidate, self._candidate_state = None, None
+            version = self._serving.version
+        print(f"🔁 Serving intent model {version} (previous: {self._previous.version if self._previous else None})")
+        return version
+
+    def rollback(self):
+        with self._lock:
+            if self._previous is None:
+                raise RuntimeError("No previous version to roll back to")
+            self._serving, self._previous = self._previous, self._serving
+            version = self._serving.version
+        print(f"↩️ Rolled back to intent model {version}")
+        return version
+
+    def status(self):
+        with self._lock:
+            s = self._shadow
+            serving_ms, candidate_ms = sorted(s["serving_ms"]), sorted(s["candidate_ms"])
+            return {
+                "serving": self._serving.version if self._serving else None,
+                "previous": self._previous.version if self._previous else None,
+                "candidate": self._candidate.version if self._candidate else None,
+                "candidate_state": self._candidate_state,
+                "shadow": {
+                    "samples": s["samples"],
+                    "agreement": round(s["agree"] / s["samples"], 4) if s["samples"] else None,
+                    "skipped": s["skipped"],
+                    "errors": s["errors"],
+                    "serving_p50_ms": round(_median(serving_ms), 3),
+                    "candidate_p50_ms": round(_median(candidate_ms), 3),
+                    "disagreements": list(s["disagreements"]),
+                },
+            }
+
+
+def _median(values):
+    return values[len(values) // 2] if values else 0.0
+
+
+# ---------------- Admin HTTP ----------------
+def add_admin_routes(api, registry, token=ADMIN_TOKEN):
+    """ Mount /admin/model/* on a FastAPI app. Without ADMIN_TOKEN the routes are not added. """
+    if not token:
+        print("ADMIN_TOKEN not set; model admin endpoints disabled")
+        return
+    from fastapi import Body, Depends, Header, HTTPException
+
+    def check(authorization: str = Header(default="")):
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+    def run(fn, *args):
+        try:
+            return fn(*args)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @api.get("/admin/model/status", dependencies=[Depends(check)])
+    def model_status():
+        return registry.status()
+
+    @api.post("/admin/model/load", dependencies=[Depends(check)])
+    def model_load(body: dict = Body(...)):
+        if not body.get("source"):
+            raise HTTPException(status_code=400, detail="source is required")
+        return {"loading": run(registry.load_candidate, body["source"], body.get("version"))}
+
+    @api.post("/admin/model/promote", dependencies=[Depends(check)])
+    def model_promote(force: bool = False):
+        return {"serving": run(registry.promote, force)}
+
+    @api.post("/admin/model/rollback", dependencies=[Depends(check)])
+    def model_rollback():
+        return {"serving": run(registry.rollback)}
@@ -0,0 +1,246 @@
+# model_store.py
+"""
+Local-first intent model artifacts.
+
+load_intent_model() resolves a local, checksum-verified model folder first and only
+downloads from the Hub when it is missing (or fails verification). Files are hashed once,
+when the manifest is written; later starts only compare sizes and mtimes (a file whose mtime
+changed is re-hashed), or every hash with INTENT_MODEL_VERIFY=full. Weights are kept
+as safetensors and memory-mapped straight into the model's parameters, so they are
+not copied into the Python heap and pages are shared with any other process mapping
+the same file.
+"""
+import hashlib
+import json
+import mmap
+import os
+import time
+
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+
+# ---------------- CONFIG ----------------
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+INTENT_MODEL_DIR = os.getenv("INTENT_MODEL_DIR", os.path.join(APP_DIR, "..", "models", "intent_model"))
+MANIFEST_NAME = "manifest.json"
+WEIGHTS_NAME = "model.safetensors"
+# fast: size + mtime (re-hash only files that were touched) | full: SHA-256 of every file
+INTENT_MODEL_VERIFY = os.getenv("INTENT_MODEL_VERIFY", "fast").lower()
+
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+# ---------------- Manifest ----------------
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_manifest(model_dir, source=None, verified=True):
+    files = {}
+    for name in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, name)
+        if name != MANIFEST_NAME and os.path.isfile(path):
+            st = os.stat(path)
+            files[name] = {"sha256": file_sha256(path), "size": st.st_size, "mtime": st.st_mtime}
+    manifest = {"source": source, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "verified": verified,
+                "files": files}
+    with open(os.path.join(model_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify(model_dir, full=None):
+    """
+    (ok, reason). A folder without a manifest is not considered verified; a manifest pinned
+    from files nothing could vouch for passes with reason "unverified".
+    Unless `full` (default: INTENT_MODEL_VERIFY=full), files whose size and mtime still match
+    the manifest are not re-read, so a start doesn't page the whole weights file in.
+    """
+    full = INTENT_MODEL_VERIFY == "full" if full is None else full
+    manifest_path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return False, "no manifest"
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if WEIGHTS_NAME not in manifest.get("files", {}):
+        return False, f"no {WEIGHTS_NAME} in manifest"
+    for name, entry in manifest["files"].items():
+        if isinstance(entry, str):  # manifests written before sizes/mtimes were recorded
+            entry = {"sha256": entry}
+        path = os.path.join(model_dir, name)
+        if not os.path.isfile(path):
+            return False, f"missing {name}"
+        st = os.stat(path)
+        if "size" in entry and st.st_size != entry["size"]:
+            return False, f"size mismatch for {name}"
+        if (full or st.st_mtime != entry.get("mtime")) and file_sha256(path) != entry["sha256"]:
+            return False, f"checksum mismatch for {name}"
+    return True, "ok" if manifest.get("verified", True) else "unverified"
+
+
+def hub_checksums(repo_id):
+    """ {filename: sha256} of the repo's LFS files (weights etc.), as published on the Hub. """
+    from huggingface_hub import HfApi
+    info = HfApi().model_info(repo_id, files_metadata=True)
+    return {s.rfilename: s.lfs.sha256 for s in info.siblings if s.lfs}
+
+
+def verify_against_hub(model_dir, repo_id):
+    """ (ok, reason) for local files the Hub publishes a checksum for; ok is None when nothing could be checked. """
+    try:
+        expected = hub_checksums(repo_id)
+    except Exception as e:
+        return None, f"Hub checksums unavailable: {e}"
+    checked = 0
+    for name, digest in expected.items():
+        path = os.path.join(model_dir, name)
+        if not os.path.isfile(path):
+            continue
+        if file_sha256(path) != digest:
+            return False, f"checksum mismatch for {name} (vs {repo_id})"
+        checked += 1
+    return (True, "ok") if checked else (None, f"no local file has a checksum on {repo_id}")
+
+
+def ensure_safetensors(model_dir):
+    """ Convert a pytorch_model.bin checkpoint to model.safetensors (once). """
+    st_path = os.path.join(model_dir, WEIGHTS_NAME)
+    bin_path = os.path.join(model_dir, "pytorch_model.bin")
+    if os.path.isfile(st_path) or not os.path.isfile(bin_path):
+        return os.path.isfile(st_path)
+    from safetensors.torch import save_file
+    state = torch.load(bin_path, map_location="cpu", weights_only=True)
+    save_file({k: v.contiguous() for k, v in state.items()}, st_path, metadata={"format": "pt"})
+    return True
+
+
+def _has_model_files(model_dir):
+    return os.path.isfile(os.path.join(model_dir, "config.json")) and (
+        os.path.isfile(os.path.join(model_dir, WEIGHTS_NAME)) or
+        os.path.isfile(os.path.join(model_dir, "pytorch_model.bin")))
+
+
+# ---------------- Resolution ----------------
+def resolve(model_id_or_path, local_dir=INTENT_MODEL_DIR):
+    """
+    Returns (folder, how). An explicit folder is used as-is (a manifest is written on first use,
+    marked unverified). A Hub repo id is served from `local_dir` when that copy verifies (or, on
+    first use, matches the Hub's LFS checksums), otherwise downloaded into it.
+    """
+    if os.path.isdir(model_id_or_path):
+        model_dir, source = model_id_or_path, None
+    else:
+        model_dir, source = local_dir, model_id_or_path
+
+    ok, reason = verify(model_dir)
+    if ok:
+        return model_dir, "local" if reason == "ok" else "local (unverified)"
+    if reason == "no manifest" and _has_model_files(model_dir):
+        # First use of files nobody hashed: pin them only if the Hub vouches for them (or nothing can)
+        hub_ok, hub_reason = verify_against_hub(model_dir, source) if source else (None, "no Hub source")
+        if hub_ok is not False:
+            ensure_safetensors(model_dir)
+            write_manifest(model_dir, source, verified=bool(hub_ok))
+            if hub_ok:
+                return model_dir, "local (verified against Hub)"
+            print(f"⚠️ Using unverified local model at {model_dir} ({hub_reason})")
+            return model_dir, "local (unverified)"
+        reason = hub_reason
+    if source is None:
+        raise RuntimeError(f"❌ Local model at {model_dir} failed verification: {reason}")
+
+    print(f"Local model unavailable ({reason}); downloading {source} → {model_dir}")
+    from huggingface_hub import snapshot_download
+    snapshot_download(repo_id=source, local_dir=model_dir, force_download=reason != "no manifest",
+                      allow_patterns=["*.json", "*.txt", "*.safetensors", "*.bin", "*.model"])
+    ensure_safetensors(model_dir)
+    write_manifest(model_dir, source)
+    return model_dir, "hub"
+
+
+# ---------------- Loading ----------------
+def mmap_safetensors(path):
+    """
+    State dict whose tensors are views into a private (copy-on-write) mmap of the file.
+    Parses the safetensors header directly so no tensor data is copied.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_len = int.from_bytes(mm[:8], "little")
+    header = json.loads(mm[8:8 + header_len])
+    base = 8 + header_len
+    state = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        numel = 1
+        for dim in info["shape"]:
+            numel *= dim
+        if numel == 0:
+            state[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        state[name] = torch.frombuffer(mm, dtype=dtype, count=numel, offset=base + start).view(info["shape"])
+    return state, mm
+
+
+# Models loaded by a parent process before it forks workers (see prefork.py)
+_preloaded = {}
+
+
+def preload(model_id_or_path, device="cpu", local_dir=INTENT_MODEL_DIR):
+    """
+    Load once in the parent so forked workers get it from load_intent_model() for free.
+    The weights are always mapped from model.safetensors (a .bin checkpoint is converted
+    first), so their pages are file-backed and shared with every worker.
+    """
+    tokenizer, model, info = load_intent_model(model_id_or_path, device, local_dir)
+    _preloaded[(model_id_or_path, device)] = (tokenizer, model, info)
+    return tokenizer, model, info
+
+
+def load_intent_model(model_id_or_path, device="cpu", local_dir=INTENT_MODEL_DIR):
+    """ Returns (tokenizer, model, info) where info holds the resolve/read/init timings in seconds. """
+    if (model_id_or_path, device) in _preloaded:
+        tokenizer, model, info = _preloaded[(model_id_or_path, device)]
+        return tokenizer, model, dict(info, resolved_from="preloaded before fork",
+                                      resolve_s=0.0, read_s=0.0, init_s=0.0, total_s=0.0)
+    t0 = time.perf_counter()
+    model_dir, how = resolve(model_id_or_path, local_dir)
+    t1 = time.perf_counter()
+    state, mm = mmap_safetensors(os.path.join(model_dir, WEIGHTS_NAME))
+    t2 = time.perf_counter()
+
+    from accelerate import init_empty_weights
+    config = AutoConfig.from_pretrained(model_dir)
+    with init_empty_weights():
+        model = AutoModelForSequenceClassification.from_config(config)
+    _missing, unexpected = model.load_state_dict(state, strict=False, assign=True)
+    still_meta = [n for n, p in model.named_parameters() if p.is_meta]
+    if still_meta:
+        raise RuntimeError(f"❌ Weights missing from {model_dir}: {still_meta[:5]}")
+    model.tie_weights()
+    model._weights_mmap = mm  # keep the mapping alive as long as the model
+    model = model.to(device).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    t3 = time.perf_counter()
+
+    info = {
+        "model_dir": os.path.abspath(model_dir),
+        "resolved_from": how,
+        "resolve_s": round(t1 - t0, 3),
+        "read_s": round(t2 - t1, 3),
+        "init_s": round(t3 - t2, 3),
+        "total_s": round(t3 - t0, 3),
+        "unexpected_keys": list(unexpected),
+    }
+    return tokenizer, model, info
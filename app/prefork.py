@@ -0,0 +1,101 @@
+# prefork.py
+"""
+Multi-process serving with the intent model loaded once.
+
+The parent loads the model (model_store.preload) and then forks WORKERS processes.
+Each worker splits the CPU cores with the others (torch threads), initializes its own
+Firebase / LLM clients and Gradio app (those are not fork-safe, so they are never
+created in the parent) and serves on its own port: GRADIO_SERVER_PORT + i.
+
+Workers share nothing after the fork. Each one keeps its own:
+  - chat history windows and sessions  -> the load balancer in front MUST be sticky
+                                          (by cookie or client IP), or users lose their history
+  - booking prefetch cache              -> a prefetch only helps the worker that started it
+  - model registry (candidate, shadow, promotion, rollback)
+                                        -> /admin/model/* acts on the worker that receives it;
+                                           send it to every worker port, not through the balancer
+  - /metrics                            -> scrape every port; counters are per process
+Conversation logs are safe to share: each process writes its own files (pid in the name).
+
+    WORKERS=4 GRADIO_SERVER_PORT=7860 python prefork.py      # ports 7860-7863
+"""
+import os
+import signal
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------- CONFIG ----------------
+WORKERS = int(os.getenv("WORKERS", "2"))
+BASE_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+
+
+def threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def run_worker(index, threads):
+    """ Body of a forked worker: never returns. """
+    import runpy
+    import torch
+    torch.set_num_threads(threads)
+    os.environ["GRADIO_SERVER_PORT"] = str(BASE_PORT + index)
+    os.environ["WORKER_INDEX"] = str(index)
+    print(f"[worker {index}] pid {os.getpid()}, port {BASE_PORT + index}, {threads} torch threads")
+    try:
+        runpy.run_path(os.path.join(APP_DIR, "app.py"), run_name="__main__")
+        os._exit(0)
+    except BaseException as e:
+        print(f"[worker {index}] exited: {e!r}")
+        os._exit(1)
+
+
+def main():
+    if not hasattr(os, "fork"):
+        raise SystemExit("prefork.py needs os.fork (Linux/macOS); run app.py directly on Windows")
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    import torch
+    from model_store import preload
+
+    model_path = os.getenv("INTENT_MODEL_PATH", "GMR01231/Barber_Intent_Bot")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device != "cpu":
+        raise SystemExit("prefork.py shares CPU weights between processes; use a single app.py with CUDA")
+
+    start = time.perf_counter()
+    _, _, info = preload(model_path, device)
+    print(f"✅ Model preloaded once in {time.perf_counter() - start:.2f}s ({info['resolved_from']}); "
+          f"forking {WORKERS} workers")
+
+    threads = threads_per_worker(WORKERS)
+    children = {}
+    for i in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(i, threads)
+        children[pid] = i
+
+    def stop(signum, _frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None:
+            print(f"[worker {index}] pid {pid} stopped (status {status})")
+            stop(signal.SIGTERM, None)   # one worker down → shut the rest so the supervisor restarts us
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# profiling.py
+"""
+Opt-in profiling of live chat turns.
+
+Set PROFILE_SAMPLE_RATE (percent of chatbot_fn calls, 0 disables) to profile a
+sample of turns with cProfile. Each sampled turn writes a .pstats file, plus a
+torch op-level table for predict_intent, into PROFILE_DIR, keeping the newest
+PROFILE_KEEP samples.
+
+Summarize the hottest functions across all samples with:
+    python profiling.py summary --dir profiles --top 30
+"""
+import argparse
+import contextvars
+import cProfile
+import glob
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))   # percent of turns
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_TORCH_OPS = os.getenv("PROFILE_TORCH_OPS", "1") == "1"
+
+_sample_rate = PROFILE_SAMPLE_RATE
+_current_sample = contextvars.ContextVar("profile_sample", default=None)
+# Only one cProfile can be active per process (3.12+), so concurrent turns are not sampled
+_profiler_lock = threading.Lock()
+_counter_lock = threading.Lock()
+_counter = 0
+
+
+def set_sample_rate(percent: float):
+    """ Change the sampling rate at runtime (0 turns profiling off). """
+    global _sample_rate
+    _sample_rate = max(0.0, min(100.0, float(percent)))
+
+
+def sample_rate() -> float:
+    return _sample_rate
+
+
+def _next_stem(label):
+    global _counter
+    with _counter_lock:
+        _counter += 1
+        n = _counter
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{stamp}-{os.getpid()}-{n:06d}-{label}")
+
+
+def _rotate():
+    """ Keep only the newest PROFILE_KEEP samples (and their torch tables). """
+    files = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.pstats")), key=os.path.getmtime)
+    for old in files[:max(0, len(files) - PROFILE_KEEP)]:
+        stem = old[:-len(".pstats")]
+        for path in [old] + glob.glob(stem + "-*.txt"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@contextmanager
+def maybe_profile(label="chatbot_fn"):
+    """ Profile the block with cProfile for a PROFILE_SAMPLE_RATE % sample of calls. """
+    if _sample_rate <= 0 or random.random() * 100 >= _sample_rate or not _profiler_lock.acquire(blocking=False):
+        yield None
+        return
+    sample = {"stem": _next_stem(label)}
+    token = _current_sample.set(sample)
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+        try:
+            yield sample
+        finally:
+            prof.disable()
+    finally:
+        _current_sample.reset(token)
+        _profiler_lock.release()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            prof.dump_stats(sample["stem"] + ".pstats")
+            _rotate()
+        except OSError as e:
+            print(f"Could not write profile: {e}")
+
+
+@contextmanager
+def torch_ops(label="predict_intent"):
+    """ Record torch op-level timings when the current turn is being sampled. """
+    sample = _current_sample.get()
+    if sample is None or not PROFILE_TORCH_OPS:
+        yield
+        return
+    from torch.profiler import profile, ProfilerActivity
+    with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    try:
+        with open(f"{sample['stem']}-{label}.txt", "w", encoding="utf-8") as f:
+            f.write(prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=40))
+    except OSError as e:
+        print(f"Could not write torch profile: {e}")
+
+
+# ---------------- SUMMARY ----------------
+def summarize(directory=PROFILE_DIR, top=30, sort="cumulative", out=None):
+    """ Aggregate every .pstats sample in `directory` and print the hottest functions. """
+    files = sorted(glob.glob(os.path.join(directory, "*.pstats")))
+    if not files:
+        print(f"No profiles found in {directory}")
+        return None
+    stats = pstats.Stats(files[0])
+    for path in files[1:]:
+        stats.add(path)
+    print(f"Aggregated {len(files)} samples from {directory}")
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    if out:
+        stats.dump_stats(out)
+        print(f"Combined stats → {out}")
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Chat turn profiling tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="Aggregate the hottest functions across samples")
+    s.add_argument("--dir", default=PROFILE_DIR)
+    s.add_argument("--top", type=int, default=30)
+    s.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+    s.add_argument("--out", default=None, help="Write the combined stats to this .pstats file")
+    args = ap.parse_args()
+    if args.cmd == "summary":
+        summarize(args.dir, args.top, args.sort, args.out)
+
+
+if __name__ == "__main__":
+    main()
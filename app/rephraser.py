@@ -0,0 +1,182 @@
+# rephraser.py
+"""
+Rephrasing backends behind make_response_natural().
+
+REPHRASER selects one:
+    remote  (default) chat completion on the HF Inference API / LLM_BASE_URL (Mistral-7B)
+    local   small seq2seq model on CPU (REPHRASER_MODEL, optionally a PEFT adapter in
+            REPHRASER_ADAPTER); concurrent requests are micro-batched into one generate()
+    off     the router's reply is returned as-is
+
+Every backend has rephrase(user_message, bot_message) -> str and
+rephrase_batch([(user_message, bot_message), ...]) -> [str].
+"""
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+# ---------------- CONFIG ----------------
+REPHRASER = os.getenv("REPHRASER", "remote").lower()
+REMOTE_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+REPHRASER_MODEL = os.getenv("REPHRASER_MODEL", "google/flan-t5-small")
+REPHRASER_ADAPTER = os.getenv("REPHRASER_ADAPTER", "")          # PEFT adapter folder / Hub id
+REPHRASER_MAX_NEW_TOKENS = int(os.getenv("REPHRASER_MAX_NEW_TOKENS", "48"))
+REPHRASER_BATCH = int(os.getenv("REPHRASER_BATCH", "8"))
+REPHRASER_BATCH_WAIT_MS = float(os.getenv("REPHRASER_BATCH_WAIT_MS", "10"))
+REPHRASER_THREADS = int(os.getenv("REPHRASER_THREADS", "0"))    # 0 = leave torch's default (capped per prefork worker)
+
+# Dates, times, prices and counts that a rephrasing must keep
+_FACT_RE = re.compile(r"\d{4}-\d{2}-\d{2}|\d{1,2}:\d{2}|\d+")
+
+
+def facts(text):
+    return set(_FACT_RE.findall(text or ""))
+
+
+def keeps_facts(original, rephrased):
+    """ True if every date/time/number of the original reply is still in the rephrasing. """
+    return facts(original) <= facts(rephrased)
+
+
+# ---------------- Backends ----------------
+class OffRephraser:
+    name = "off"
+
+    def rephrase(self, user_message, bot_message):
+        return bot_message
+
+    def rephrase_batch(self, pairs):
+        return [bot for _, bot in pairs]
+
+
+class RemoteRephraser:
+    name = "remote"
+
+    def __init__(self, client, model=REMOTE_MODEL):
+        self.client = client
+        self.model = model
+
+    @staticmethod
+    def prompt(user_message, bot_message):
+        return f""" You are a friendly AI barber assistant.
+    The user said: "{user_message}"
+    The system generated reply is: "{bot_message}"
+    Rewrite the system reply into a natural, conversational sentence.
+    Keep the meaning the same.
+    Do NOT add questions, explanations, or commentary.
+    Do NOT wrap the reply in quotes.
+    Only output the final reply text. """
+
+    def rephrase(self, user_message, bot_message):
+        # Use chat completion (Mistral supports conversational API, not raw text_generation)
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": self.prompt(user_message, bot_message)}],
+            max_tokens=150,
+            temperature=0.7)
+        return response.choices[0].message.content
+
+    def rephrase_batch(self, pairs):
+        return [self.rephrase(user, bot) for user, bot in pairs]
+
+
+class LocalRephraser:
+    """
+    Seq2seq rephraser on CPU. Requests from concurrent turns wait up to `batch_wait_ms`
+    to share one greedy generate() call of at most `batch_size` inputs. Output is capped at
+    `max_new_tokens`; a rephrasing that is empty or drops a date/time/number falls back
+    to the original reply.
+    """
+    name = "local"
+
+    def __init__(self, model_name=REPHRASER_MODEL, adapter=REPHRASER_ADAPTER, max_new_tokens=REPHRASER_MAX_NEW_TOKENS,
+                 batch_size=REPHRASER_BATCH, batch_wait_ms=REPHRASER_BATCH_WAIT_MS, threads=REPHRASER_THREADS):
+        import torch
+        from transformers import AutoTokenizer
+        if threads:
+            if "WORKER_INDEX" in os.environ:  # under prefork.py: never raise the worker's share of the cores
+                threads = min(threads, torch.get_num_threads())
+            torch.set_num_threads(threads)
+        if adapter:
+            from peft import AutoPeftModelForSeq2SeqLM
+            self.model = AutoPeftModelForSeq2SeqLM.from_pretrained(adapter)
+            self.model = self.model.merge_and_unload()  # plain model: no adapter overhead per token
+            try:
+                self.tokenizer = AutoTokenizer.from_pretrained(adapter)
+            except (OSError, ValueError):  # adapter saved without a tokenizer: use the base model's
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model.config.name_or_path or model_name)
+        else:
+            from transformers import AutoModelForSeq2SeqLM
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model.eval()
+        self.max_new_tokens = max_new_tokens
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.fallbacks = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._batch_loop, name="rephraser", daemon=True).start()
+
+    @staticmethod
+    def prompt(user_message, bot_message):
+        return ("Rewrite this barber shop assistant reply so it sounds friendly and natural. "
+                f"Keep every name, date, time and price.\nReply: {bot_message}")
+
+    def _generate(self, pairs):
+        import torch
+        inputs = self.tokenizer([self.prompt(u, b) for u, b in pairs], return_tensors="pt",
+                                padding=True, truncation=True, max_length=256)
+        with torch.inference_mode():
+            out = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens, num_beams=1, do_sample=False)
+        texts = self.tokenizer.batch_decode(out, skip_special_tokens=True)
+        results = []
+        for (_, bot), text in zip(pairs, texts):
+            text = text.strip()
+            if not text or not keeps_facts(bot, text):
+                self.fallbacks += 1
+                text = bot
+            results.append(text)
+        return results
+
+    def rephrase_batch(self, pairs):
+        out = []
+        for i in range(0, len(pairs), self.batch_size):
+            out.extend(self._generate(pairs[i:i + self.batch_size]))
+        return out
+
+    def rephrase(self, user_message, bot_message):
+        future = Future()
+        self._queue.put(((user_message, bot_message), future))
+        return future.result()
+
+    def _batch_loop(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            try:
+                while len(items) < self.batch_size:
+                    items.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            try:
+                results = self._generate([pair for pair, _ in items])
+                for (_, future), text in zip(items, results):
+                    future.set_result(text)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+
+
+def from_env(client, backend=REPHRASER):
+    """ Rephraser selected by REPHRASER; `client` is the InferenceClient for the remote backend. """
+    if backend == "off":
+        return OffRephraser()
+    if backend == "local":
+        print(f"Loading local rephraser ({REPHRASER_ADAPTER or REPHRASER_MODEL})...")
+        return LocalRephraser()
+    if backend != "remote":
+        raise ValueError(f"❌ Unknown REPHRASER '{backend}' (expected remote, local or off)")
+    return RemoteRephraser(client)
@@ -0,0 +1,95 @@
+# fakes.py
+"""
+Stand-ins shared by the benchmark scripts: a seeded in-memory Firestore
+(via FIREBASE_BACKEND=memory) and a fake HF InferenceClient with configurable latency.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_ROOT, "app")
+VAL_DATASET = os.path.join(REPO_ROOT, "training", "Dataset", "intent_val.json")
+
+_REPLY_RE = re.compile(r'The system generated reply is: "(.*?)"\s*\n', re.S)
+
+
+class FakeInferenceClient:
+    """ Mimics InferenceClient.chat.completions.create(); echoes the system reply after a delay. """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, **kwargs):
+        self.calls += 1
+        delay = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        prompt = messages[-1]["content"] if messages else ""
+        m = _REPLY_RE.search(prompt)
+        content = m.group(1) if m else prompt
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def seed_spec(barbers=4, services=4, density=0.3, days=14, seed=42):
+    return f"barbers={barbers},services={services},density={density},days={days},seed={seed}"
+
+
+def load_app(seed="", llm_latency_ms=0.0, llm_jitter_ms=0.0, model_path=None):
+    """
+    Import app/app.py against the in-memory Firestore and a fake LLM client.
+    Must be called before anything else imports the app.
+    """
+    os.environ["FIREBASE_BACKEND"] = "memory"
+    os.environ["MEMORY_SEED"] = seed
+    os.environ.setdefault("HF_TOKEN", "bench-token")  # the fake client never uses it
+    if model_path:
+        os.environ["INTENT_MODEL_PATH"] = model_path
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    import app as barber_app
+    barber_app.hf_client = FakeInferenceClient(llm_latency_ms, llm_jitter_ms)
+    if barber_app.rephraser.name == "remote":
+        barber_app.rephraser.client = barber_app.hf_client
+    logging.getLogger("barber.turn").setLevel(logging.WARNING)
+    return barber_app
+
+
+def load_firebase_utils(seed=""):
+    """ Import firebase_utils on the in-memory backend without loading the rest of the app. """
+    os.environ["FIREBASE_BACKEND"] = "memory"
+    os.environ["MEMORY_SEED"] = seed
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    from Firebase import firebase_utils as fu
+    return fu
+
+
+# ---------------- Stats helpers ----------------
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def summarize(values_ms):
+    vals = sorted(values_ms)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "mean_ms": round(sum(vals) / len(vals), 3),
+        "p50_ms": round(percentile(vals, 0.50), 3),
+        "p95_ms": round(percentile(vals, 0.95), 3),
+        "p99_ms": round(percentile(vals, 0.99), 3),
+        "max_ms": round(vals[-1], 3),
+    }
@@ -0,0 +1,218 @@
+# load.py
+"""
+Concurrent-user load generator for the Gradio app.
+
+Each virtual user opens its own gradio_client session, logs in and then loops a
+realistic script (list services, book, view, cancel, ...). Concurrency levels are
+run one after another, giving throughput, error-rate and latency-vs-concurrency curves.
+
+Against an app started here (in-memory Firestore + local mock LLM):
+    python bench/load.py --launch --concurrency 1,4,8,16,32 --duration 60 --out load.json
+
+Against an app that is already running (e.g. pointed at the Firestore emulator
+via FIRESTORE_EMULATOR_HOST and at bench/mock_llm.py via LLM_BASE_URL):
+    python bench/load.py --url http://127.0.0.1:7860 --concurrency 1,8,32
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+from fakes import APP_DIR, seed_spec, summarize
+import mock_llm
+
+# ---------------- Scripts ----------------
+# (step name, messages to pick from)
+SCRIPTS = {
+    "browse": [
+        ("small_talk", ["hi", "hello there", "good morning"]),
+        ("list_services", ["what services do you offer", "show me the menu", "prices?"]),
+        ("list_barbers", ["who are your barbers", "barber list please"]),
+    ],
+    "book_view_cancel": [
+        ("list_services", ["what services do you offer", "service list please"]),
+        ("book", ["book me an appointment tomorrow at 5pm", "schedule a haircut on friday at 3pm",
+                  "I want to book a slot as soon as possible", "book a haircut tomorrow evening"]),
+        ("view", ["show my appointments", "what do i have", "list my appointments"]),
+        ("cancel", ["cancel my appointment", "please drop my booking"]),
+    ],
+}
+DEFAULT_MIX = {"book_view_cancel": 0.7, "browse": 0.3}
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []  # (step, latency_ms, ok, error)
+
+    def add(self, step, latency_ms, ok, error=None):
+        with self._lock:
+            self.samples.append((step, latency_ms, ok, error))
+
+
+def _timed(recorder, step, fn, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        recorder.add(step, (time.perf_counter() - start) * 1000, True)
+        return result
+    except Exception as e:
+        recorder.add(step, (time.perf_counter() - start) * 1000, False, type(e).__name__)
+        return None
+
+
+def virtual_user(uid, url, deadline, recorder, think_ms, mix, rng):
+    from gradio_client import Client
+
+    try:
+        client = Client(url, verbose=False)
+    except Exception as e:
+        recorder.add("connect", 0.0, False, type(e).__name__)
+        return
+    email = f"vu{uid}-{rng.randrange(1_000_000)}@loadtest.example.com"
+    _timed(recorder, "login", client.predict, email, api_name="/do_login")
+
+    names, weights = zip(*mix.items())
+    while time.time() < deadline:
+        script = SCRIPTS[rng.choices(names, weights)[0]]
+        for step, messages in script:
+            if time.time() >= deadline:
+                break
+            _timed(recorder, step, client.predict, rng.choice(messages), api_name="/respond")
+            if think_ms:
+                time.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+
+
+def run_level(url, users, duration, think_ms, mix, seed):
+    recorder = Recorder()
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=virtual_user,
+                                args=(i, url, deadline, recorder, think_ms, mix, random.Random(seed + i)),
+                                daemon=True)
+               for i in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    chat = [s for s in recorder.samples if s[0] not in ("login", "connect")]
+    errors = defaultdict(int)
+    for _, _, ok, err in recorder.samples:
+        if not ok:
+            errors[err] += 1
+    by_step = defaultdict(list)
+    for step, ms, ok, _ in recorder.samples:
+        if ok:
+            by_step[step].append(ms)
+    ok_chat = [ms for _, ms, ok, _ in chat if ok]
+    return {
+        "users": users,
+        "wall_s": round(wall, 2),
+        "requests": len(chat),
+        "throughput_per_s": round(len(ok_chat) / wall, 2) if wall else None,
+        "error_rate": round(sum(1 for s in chat if not s[2]) / len(chat), 4) if chat else None,
+        "errors": dict(errors),
+        "latency": summarize(ok_chat),
+        "per_step": {k: summarize(v) for k, v in sorted(by_step.items())},
+    }
+
+
+# ---------------- Local app launch ----------------
+def wait_until_up(url, timeout):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            urllib.request.urlopen(url, timeout=2)
+            return True
+        except Exception:
+            time.sleep(1)
+    return False
+
+
+def launch_app(args):
+    llm = mock_llm.start_server(port=args.llm_port, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+    env = dict(os.environ,
+               FIREBASE_BACKEND="memory",
+               MEMORY_SEED=seed_spec(args.barbers, args.services, args.density, args.days, args.seed),
+               LLM_BASE_URL=f"http://127.0.0.1:{args.llm_port}",
+               HF_TOKEN=os.getenv("HF_TOKEN", "loadtest-token"),
+               METRICS_ENDPOINT="1",
+               GRADIO_SERVER_NAME="127.0.0.1",
+               GRADIO_SERVER_PORT=str(args.port))
+    proc = subprocess.Popen([sys.executable, "app.py"], cwd=APP_DIR, env=env)
+    url = f"http://127.0.0.1:{args.port}"
+    if not wait_until_up(url, args.startup_timeout):
+        proc.terminate()
+        llm.shutdown()
+        raise SystemExit(f"App did not come up on {url} within {args.startup_timeout}s")
+    return url, proc, llm
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent-user load test for the Gradio app")
+    ap.add_argument("--url", default="http://127.0.0.1:7860")
+    ap.add_argument("--launch", action="store_true",
+                    help="Start app.py with in-memory Firestore and the mock LLM")
+    ap.add_argument("--port", type=int, default=7861)
+    ap.add_argument("--startup-timeout", type=int, default=300)
+    ap.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated virtual-user counts")
+    ap.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between messages")
+    ap.add_argument("--mix", default=None, help='JSON script weights, e.g. \'{"browse": 1}\'')
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--barbers", type=int, default=6)
+    ap.add_argument("--services", type=int, default=4)
+    ap.add_argument("--density", type=float, default=0.3)
+    ap.add_argument("--days", type=int, default=14)
+    ap.add_argument("--llm-port", type=int, default=8089)
+    ap.add_argument("--llm-latency-ms", type=float, default=300.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    ap.add_argument("--out", default=None, help="JSON report")
+    ap.add_argument("--csv", default=None, help="Latency-vs-concurrency curve as CSV")
+    args = ap.parse_args()
+
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    url, proc, llm = (launch_app(args) if args.launch else (args.url, None, None))
+    levels = []
+    try:
+        for users in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+            print(f"→ {users} virtual users for {args.duration:.0f}s ...")
+            level = run_level(url, users, args.duration, args.think_ms, mix, args.seed)
+            lat = level["latency"]
+            print(f"  {level['throughput_per_s']} req/s, error rate {level['error_rate']}, "
+                  f"p50 {lat.get('p50_ms')} ms, p95 {lat.get('p95_ms')} ms, p99 {lat.get('p99_ms')} ms")
+            levels.append(level)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if llm:
+            llm.shutdown()
+
+    report = {"url": url, "config": vars(args), "levels": levels}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report → {args.out}")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["users", "throughput_per_s", "error_rate", "p50_ms", "p95_ms", "p99_ms"])
+            for lv in levels:
+                lat = lv["latency"]
+                w.writerow([lv["users"], lv["throughput_per_s"], lv["error_rate"],
+                            lat.get("p50_ms"), lat.get("p95_ms"), lat.get("p99_ms")])
+        print(f"Curve → {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
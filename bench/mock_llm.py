@@ -0,0 +1,80 @@
+# mock_llm.py
+"""
+Local OpenAI-style chat-completions server standing in for the HF Inference API.
+Point the app at it with LLM_BASE_URL=http://127.0.0.1:8089 .
+
+    python bench/mock_llm.py --port 8089 --latency-ms 300 --jitter-ms 100
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_REPLY_RE = re.compile(r'The system generated reply is: "(.*?)"\s*\n', re.S)
+
+
+def make_handler(latency_ms=0.0, jitter_ms=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("chat/completions"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.send_error(400, "invalid JSON")
+                return
+            delay = latency_ms + (random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            messages = body.get("messages") or [{"content": ""}]
+            prompt = messages[-1].get("content", "")
+            m = _REPLY_RE.search(prompt)
+            content = m.group(1) if m else prompt
+            out = json.dumps({
+                "id": "mock-1",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                          "total_tokens": len(prompt.split()) + len(content.split())},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass  # keep load-test output readable
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=8089, latency_ms=0.0, jitter_ms=0.0):
+    """ Start the mock server in a daemon thread; returns the server (call .shutdown() to stop). """
+    server = ThreadingHTTPServer((host, port), make_handler(latency_ms, jitter_ms))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock chat-completions server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency_ms, args.jitter_ms))
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
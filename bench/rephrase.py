@@ -0,0 +1,158 @@
+# rephrase.py
+"""
+Latency and quality comparison of the rephraser backends (off / local / remote) on
+replies produced by route_intent for intent_val.json (gold intents, seeded in-memory
+Firestore).
+
+    python bench/rephrase.py --backends off,local --limit 200 --out rephrase.json
+    python bench/rephrase.py --backends local,remote --remote-real     # needs HF_TOKEN (or LLM_BASE_URL)
+
+Quality is checked mechanically: every date/time/number of the router's reply must
+survive (facts_kept), plus length ratio, unchanged rate and token-overlap F1 against a
+reference backend (the remote one when present). Sample outputs go into the report for
+reading by eye.
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("REPHRASER", "off")  # the app's own rephraser is not used here
+from fakes import VAL_DATASET, FakeInferenceClient, load_app, seed_spec, summarize  # noqa: E402
+
+
+def route_replies(app, data):
+    """ [(user message, route_intent reply)] using the gold intents. """
+    pairs = []
+    for i, ex in enumerate(data):
+        parsed = {"intent": ex["intent"], "barber": None, "date": None, "time": None}
+        email = f"rephrase-{i}@example.com"
+        pairs.append((ex["text"], app.route_intent(parsed, ex["text"], session_id=email, user_email=email)))
+    return pairs
+
+
+def make_backend(name, args, rephrasers):
+    if name == "off":
+        return rephrasers.OffRephraser()
+    if name == "local":
+        return rephrasers.LocalRephraser(model_name=args.local_model, adapter=args.adapter,
+                                         max_new_tokens=args.max_new_tokens, batch_size=args.batch_size)
+    if name == "remote":
+        if args.remote_real:
+            from huggingface_hub import InferenceClient
+            base_url = os.getenv("LLM_BASE_URL")
+            client = (InferenceClient(base_url=base_url, token=os.getenv("HF_TOKEN")) if base_url else
+                      InferenceClient(model=rephrasers.REMOTE_MODEL, token=os.getenv("HF_TOKEN")))
+        else:
+            client = FakeInferenceClient(args.llm_latency_ms, args.llm_jitter_ms)
+        return rephrasers.RemoteRephraser(client)
+    raise ValueError(f"Unknown backend {name}")
+
+
+def _tokens(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def token_f1(a, b):
+    ta, tb = _tokens(a), _tokens(b)
+    if not ta or not tb:
+        return 0.0
+    common = sum(min(ta.count(t), tb.count(t)) for t in set(ta))
+    if not common:
+        return 0.0
+    p, r = common / len(ta), common / len(tb)
+    return 2 * p * r / (p + r)
+
+
+def evaluate(backend, pairs, args, rephrasers):
+    # warm-up (lazy init, first-call allocations)
+    for user, bot in pairs[:args.warmup]:
+        backend.rephrase(user, bot)
+
+    outputs, per_reply = [], []
+    for user, bot in pairs:
+        start = time.perf_counter()
+        outputs.append(backend.rephrase(user, bot))
+        per_reply.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    backend.rephrase_batch(pairs)
+    batch_wall = time.perf_counter() - start
+
+    n = len(pairs)
+    return outputs, {
+        "per_reply": summarize(per_reply),
+        "batch_throughput_per_s": round(n / batch_wall, 2) if batch_wall else None,
+        "facts_kept": round(sum(rephrasers.keeps_facts(bot, out) for (_, bot), out in zip(pairs, outputs)) / n, 4),
+        "unchanged": round(sum(out.strip() == bot.strip() for (_, bot), out in zip(pairs, outputs)) / n, 4),
+        "empty": round(sum(not (out or "").strip() for out in outputs) / n, 4),
+        "length_ratio": round(sum(len(out) / max(1, len(bot)) for (_, bot), out in zip(pairs, outputs)) / n, 3),
+        "fallbacks": getattr(backend, "fallbacks", None),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare rephraser backends on route_intent replies")
+    ap.add_argument("--backends", default="off,local,remote")
+    ap.add_argument("--dataset", default=VAL_DATASET)
+    ap.add_argument("--limit", type=int, default=200)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--barbers", type=int, default=4)
+    ap.add_argument("--density", type=float, default=0.3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--local-model", default=None, help="Default: REPHRASER_MODEL")
+    ap.add_argument("--adapter", default=None, help="PEFT adapter (default: REPHRASER_ADAPTER)")
+    ap.add_argument("--max-new-tokens", type=int, default=None)
+    ap.add_argument("--batch-size", type=int, default=None)
+    ap.add_argument("--remote-real", action="store_true", help="Call the real remote LLM instead of a fake")
+    ap.add_argument("--llm-latency-ms", type=float, default=600.0, help="Fake remote latency")
+    ap.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    ap.add_argument("--samples", type=int, default=10, help="Example outputs kept in the report")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    app = load_app(seed_spec(barbers=args.barbers, density=args.density, seed=args.seed))
+    import rephraser as rephrasers
+    args.local_model = args.local_model or rephrasers.REPHRASER_MODEL
+    args.adapter = rephrasers.REPHRASER_ADAPTER if args.adapter is None else args.adapter
+    args.max_new_tokens = args.max_new_tokens or rephrasers.REPHRASER_MAX_NEW_TOKENS
+    args.batch_size = args.batch_size or rephrasers.REPHRASER_BATCH
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        data = json.load(f)[:args.limit or None]
+    pairs = route_replies(app, data)
+    print(f"{len(pairs)} route_intent replies")
+
+    names = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results, outputs = {}, {}
+    for name in names:
+        print(f"→ {name} ...")
+        outputs[name], results[name] = evaluate(make_backend(name, args, rephrasers), pairs, args, rephrasers)
+
+    reference = "remote" if "remote" in outputs and args.remote_real else None
+    if reference:
+        for name in names:
+            f1s = [token_f1(a, b) for a, b in zip(outputs[name], outputs[reference])]
+            results[name][f"token_f1_vs_{reference}"] = round(sum(f1s) / len(f1s), 4)
+
+    print(f"\n{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{'batch/s':>10}{'facts':>8}{'unchanged':>11}{'len':>7}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['per_reply']['p50_ms']:>10}{r['per_reply']['p95_ms']:>10}"
+              f"{r['batch_throughput_per_s']:>10}{r['facts_kept']:>8}{r['unchanged']:>11}{r['length_ratio']:>7}")
+
+    report = {
+        "config": vars(args),
+        "replies": len(pairs),
+        "backends": results,
+        "samples": [{"user": u, "route": b, **{n: outputs[n][i] for n in names}}
+                    for i, (u, b) in enumerate(pairs[:args.samples])],
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
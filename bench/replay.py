@@ -0,0 +1,139 @@
+# replay.py
+"""
+Offline end-to-end benchmark: replays intent_val.json through chatbot_fn and
+route_intent against seeded in-memory Firestore and a fake LLM client.
+
+    python bench/replay.py --barbers 6 --density 0.4 --llm-latency-ms 50 --out bench_replay.json
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+
+from fakes import VAL_DATASET, load_app, seed_spec, summarize
+
+
+def run(args):
+    app = load_app(seed_spec(args.barbers, args.services, args.density, args.days, args.seed),
+                   llm_latency_ms=args.llm_latency_ms, llm_jitter_ms=args.llm_jitter_ms,
+                   model_path=args.model_path)
+    metrics, fu = app.metrics, app.fu
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if args.limit:
+        data = data[:args.limit]
+
+    traces = []
+    metrics.add_turn_listener(traces.append)
+
+    # Warm-up so model/tokenizer lazy init is not billed to the first utterance
+    for ex in data[:args.warmup]:
+        app.predict_intent(ex["text"])
+
+    # ---------------- chatbot_fn (end to end) ----------------
+    t0 = time.perf_counter()
+    for i, ex in enumerate(data):
+        app.chatbot_fn(ex["text"], session_id=f"bench-{i}@example.com")
+    e2e_wall = time.perf_counter() - t0
+
+    stage_ms = defaultdict(list)
+    stage_by_intent = defaultdict(lambda: defaultdict(list))
+    turn_by_intent = defaultdict(list)
+    correct = 0
+    for ex, tr in zip(data, traces):
+        intent = tr.get("intent") or "unknown"
+        correct += intent == ex["intent"]
+        turn_by_intent[intent].append(tr["total_ms"])
+        for stage, ms in tr["stages_ms"].items():
+            stage_ms[stage].append(ms)
+            stage_by_intent[intent][stage].append(ms)
+
+    # ---------------- route_intent (gold intents) ----------------
+    route_by_intent = defaultdict(list)
+    ops_by_intent = defaultdict(lambda: defaultdict(int))
+    t0 = time.perf_counter()
+    if not args.skip_route:
+        for i, ex in enumerate(data):
+            parsed = {"intent": ex["intent"], "barber": None, "date": None, "time": None}
+            email = f"route-{i}@example.com"
+            start = time.perf_counter()
+            with fu.request_scope(ex["intent"]) as ops:
+                app.route_intent(parsed, ex["text"], session_id=email, user_email=email)
+            route_by_intent[ex["intent"]].append((time.perf_counter() - start) * 1000)
+            for k, v in ops.as_dict().items():
+                if k != "intent":
+                    ops_by_intent[ex["intent"]][k] += v
+    route_wall = time.perf_counter() - t0
+
+    n = len(data)
+    report = {
+        "config": vars(args),
+        "utterances": n,
+        "chatbot_fn": {
+            "wall_s": round(e2e_wall, 3),
+            "throughput_per_s": round(n / e2e_wall, 2) if e2e_wall else None,
+            "intent_accuracy": round(correct / n, 4) if n else None,
+            "turn": summarize([t["total_ms"] for t in traces]),
+            "stages": {s: summarize(v) for s, v in sorted(stage_ms.items())},
+            "per_intent": {
+                intent: {"turn": summarize(v),
+                         "stages": {s: summarize(x) for s, x in sorted(stage_by_intent[intent].items())}}
+                for intent, v in sorted(turn_by_intent.items())
+            },
+        },
+    }
+    if not args.skip_route:
+        report["route_intent"] = {
+            "wall_s": round(route_wall, 3),
+            "throughput_per_s": round(n / route_wall, 2) if route_wall else None,
+            "per_intent": {
+                intent: {"latency": summarize(v),
+                         "firestore_per_call": {k: round(c / len(v), 2) for k, c in ops_by_intent[intent].items()}}
+                for intent, v in sorted(route_by_intent.items())
+            },
+        }
+    return report
+
+
+def print_report(report):
+    e2e = report["chatbot_fn"]
+    print(f"Replayed {report['utterances']} utterances: {e2e['throughput_per_s']} turns/s, "
+          f"intent accuracy {e2e['intent_accuracy']}")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, s in e2e["stages"].items():
+        print(f"{stage:<12}{s['p50_ms']:>10}{s['p99_ms']:>10}")
+    if "route_intent" in report:
+        print(f"\n{'route_intent':<20}{'p50 ms':>10}{'p99 ms':>10}{'reads/call':>12}")
+        for intent, s in report["route_intent"]["per_intent"].items():
+            reads = s["firestore_per_call"].get("reads", 0)
+            print(f"{intent:<20}{s['latency']['p50_ms']:>10}{s['latency']['p99_ms']:>10}{reads:>12}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay intent_val.json through the chat pipeline")
+    ap.add_argument("--dataset", default=VAL_DATASET)
+    ap.add_argument("--limit", type=int, default=0, help="Only replay the first N utterances")
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--barbers", type=int, default=4)
+    ap.add_argument("--services", type=int, default=4)
+    ap.add_argument("--density", type=float, default=0.3, help="Fraction of slots already booked")
+    ap.add_argument("--days", type=int, default=14, help="Days of seeded appointments")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--llm-latency-ms", type=float, default=0.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    ap.add_argument("--model-path", default=None, help="Local or Hub intent model (default: app's MODEL_PATH)")
+    ap.add_argument("--skip-route", action="store_true", help="Skip the route_intent-only pass")
+    ap.add_argument("--out", default=None, help="Write the JSON report here")
+    args = ap.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# scheduling.py
+"""
+Microbenchmarks for the booking slot engine in firebase_utils:
+is_valid_time, _iter_slots, find_next_available_slot and suggest_alternatives.
+
+Synthetic schedules are built at increasing scale (barbers, appointment density,
+lookahead days). Appointment lookups are served from a prebuilt index and barber
+documents are fetched once, so the timings are pure scheduling CPU (pass --with-store
+to include the in-memory store). The clock is pinned (BENCH_NOW), so results do not
+depend on the time of day the benchmark runs.
+
+    python bench/scheduling.py --save-baseline bench/scheduling_baseline.json
+    # ... change the booking code ...
+    python bench/scheduling.py --check bench/scheduling_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fakes import load_firebase_utils
+
+fu = load_firebase_utils()
+from Firebase.memory_store import MemoryClient, seed_demo_data  # noqa: E402  (needs APP_DIR on sys.path)
+
+BASE = {"barbers": 4, "density": 0.5, "lookahead": 30}
+# Monday before opening: every slot of "today" is still ahead
+BENCH_NOW = fu.TZ.localize(datetime(2025, 1, 6, 8, 0))
+
+
+def build_schedule(barbers, density, lookahead, seed):
+    """ Fresh seeded store; returns (barber ids, {(barber_id, date): [appointments]}). """
+    fu.db = fu.CountingClient(MemoryClient())
+    fu.appointments = fu.AppointmentLayout(fu.db)
+    seed_demo_data(fu.db, barbers=barbers, services=4, density=density, days=lookahead + 1, seed=seed, tz=fu.TZ,
+                   add_appointment=fu.appointments.add, today=BENCH_NOW.date())
+    index = defaultdict(list)
+    for snap in fu.appointments.query():
+        d = snap.to_dict()
+        index[(d["barberId"], d["date"])].append(d)
+    barber_ids = [b.id for b in fu.db.collection("barbers").stream()]
+    return barber_ids, index
+
+
+def time_call(fn, repeats, number):
+    """ Median seconds per call over `repeats` rounds of `number` calls. """
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return statistics.median(rounds)
+
+
+def bench_point(barbers, density, lookahead, args):
+    barber_ids, index = build_schedule(barbers, density, lookahead, args.seed)
+    real_lookup, real_now = fu.get_appointments_for_barber_on_date, fu._now_local
+    fu._now_local = lambda: BENCH_NOW
+    if not args.with_store:
+        fu.get_appointments_for_barber_on_date = lambda barber_id, date: list(index.get((barber_id, date), []))
+    saved_lookahead = fu.MAX_LOOKAHEAD_DAYS
+    fu.MAX_LOOKAHEAD_DAYS = lookahead
+    try:
+        tomorrow = (BENCH_NOW.date() + timedelta(days=1)).strftime("%Y-%m-%d")
+        barber_docs = {b: fu.db.collection("barbers").document(b).get().to_dict() for b in barber_ids}
+        bdata = barber_docs[barber_ids[0]]
+        existing = index.get((barber_ids[0], tomorrow), [])
+        slots = list(fu._iter_slots("10:00", "22:00", fu.SLOT_STEP_MIN, 60))
+
+        def valid_day():
+            for t in slots:
+                fu.is_valid_time(tomorrow, t, 60, bdata, existing)
+
+        def next_slot_all():
+            for b in barber_ids:
+                fu.find_next_available_slot(b, 60, max_days=lookahead,
+                                            barber_data=None if args.with_store else barber_docs[b])
+
+        r, n = args.repeats, args.number
+        all_barbers = time_call(next_slot_all, r, n)
+        return {
+            "_iter_slots": time_call(lambda: list(fu._iter_slots("10:00", "22:00", fu.SLOT_STEP_MIN, 60)), r, n * 10),
+            "is_valid_time": time_call(valid_day, r, n) / max(1, len(slots)),
+            "find_next_available_slot": all_barbers / max(1, len(barber_ids)),
+            "find_next_available_slot[all_barbers]": all_barbers,
+            "suggest_alternatives": time_call(
+                lambda: fu.suggest_alternatives(barber_ids[0], tomorrow, None, 60, limit=args.limit), r, n),
+        }
+    finally:
+        fu.get_appointments_for_barber_on_date, fu._now_local = real_lookup, real_now
+        fu.MAX_LOOKAHEAD_DAYS = saved_lookahead
+
+
+def point_key(point):
+    return f"barbers={point['barbers']},density={point['density']},lookahead={point['lookahead']}"
+
+
+def sweep(args):
+    """ One-factor-at-a-time sweeps around BASE: these are the scaling curves. """
+    axes = {
+        "barbers": [int(x) for x in args.barbers.split(",")],
+        "density": [float(x) for x in args.density.split(",")],
+        "lookahead": [int(x) for x in args.lookahead.split(",")],
+    }
+    results, curves = {}, {}
+    for axis, values in axes.items():
+        curves[axis] = []
+        for v in values:
+            point = dict(BASE, **{axis: v})
+            key = point_key(point)
+            if key not in results:
+                results[key] = bench_point(point["barbers"], point["density"], point["lookahead"], args)
+                print(f"{key:<40}" + "  ".join(f"{fn}={sec * 1e6:,.1f}µs" for fn, sec in results[key].items()))
+            curves[axis].append({"value": v, **results[key]})
+    return {"base": BASE, "points": results, "curves": curves}
+
+
+def check_regressions(report, baseline, tolerance):
+    """ Every (scale point, function) must be within `tolerance` of the baseline median. """
+    failures = []
+    for key, fns in baseline["points"].items():
+        current = report["points"].get(key)
+        if not current:
+            continue
+        for fn, base_sec in fns.items():
+            cur = current.get(fn)
+            if cur is not None and base_sec > 0 and cur > base_sec * (1 + tolerance):
+                failures.append(f"{fn} @ {key}: {cur * 1e6:,.1f}µs vs baseline {base_sec * 1e6:,.1f}µs "
+                                f"(+{(cur / base_sec - 1) * 100:.0f}%)")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Slot engine microbenchmarks and scaling curves")
+    ap.add_argument("--barbers", default="1,2,4,8,16")
+    ap.add_argument("--density", default="0,0.25,0.5,0.75,0.95")
+    ap.add_argument("--lookahead", default="7,14,30,60")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--number", type=int, default=3, help="Calls per timing round")
+    ap.add_argument("--limit", type=int, default=3, help="suggest_alternatives limit")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--with-store", action="store_true", help="Include in-memory store queries in timings")
+    ap.add_argument("--out", default=None, help="Write the JSON report here")
+    ap.add_argument("--save-baseline", default=None, help="Write this run as the regression baseline")
+    ap.add_argument("--check", default=None, help="Baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    report = sweep(args)
+    report["config"] = vars(args)
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report → {path}")
+
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check_regressions(report, baseline, args.tolerance)
+        if failures:
+            print(f"\n❌ {len(failures)} regression(s) over {args.tolerance:.0%}:")
+            for line in failures:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\n✅ No regressions over {args.tolerance:.0%} against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
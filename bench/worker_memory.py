@@ -0,0 +1,174 @@
+# worker_memory.py
+"""
+Per-worker memory and startup time of the intent model under three ways of running
+N worker processes (Linux, reads /proc/<pid>/smaps_rollup):
+
+    from_pretrained  every worker calls AutoModelForSequenceClassification.from_pretrained (old app.py)
+    mmap             every worker calls model_store.load_intent_model (safetensors mmap)
+    prefork          one process loads via model_store.preload, then forks the workers (app/prefork.py)
+
+Only the model is loaded (no Firebase / Gradio), each worker runs one forward pass and
+then idles while memory is read. RSS counts shared pages in full for every process;
+PSS splits them between the processes sharing them, so sum(PSS) is the real total.
+
+    python bench/worker_memory.py --workers 4 --out worker_memory.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from fakes import APP_DIR, summarize
+
+MODES = ("from_pretrained", "mmap", "prefork")
+
+
+# ---------------- child side ----------------
+def _load(mode, model_path):
+    sys.path.insert(0, APP_DIR)
+    import model_store
+    if mode == "from_pretrained":
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        model_dir, _ = model_store.resolve(model_path)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+        return tokenizer, model
+    tokenizer, model, _ = model_store.load_intent_model(model_path)
+    return tokenizer, model
+
+
+def _ready(tokenizer, model, started):
+    import torch
+    with torch.no_grad():
+        model(**tokenizer("book me a haircut tomorrow at 5pm", return_tensors="pt"))
+    print(json.dumps({"pid": os.getpid(), "startup_s": round(time.perf_counter() - started, 3)}), flush=True)
+    sys.stdin.read()  # idle until the parent closes our stdin
+    os._exit(0)
+
+
+def child(mode, model_path, workers, threads):
+    import torch
+    torch.set_num_threads(threads)
+    if mode != "prefork":
+        started = time.perf_counter()
+        _ready(*_load(mode, model_path), started)
+
+    sys.path.insert(0, APP_DIR)
+    import model_store
+    started = time.perf_counter()
+    tokenizer, model, _ = model_store.preload(model_path)
+    print(json.dumps({"pid": os.getpid(), "parent": True,
+                      "startup_s": round(time.perf_counter() - started, 3)}), flush=True)
+    pids = []
+    for _ in range(workers):
+        fork_started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            tokenizer, model, _ = model_store.load_intent_model(model_path)  # served from the preload
+            _ready(tokenizer, model, fork_started)
+        pids.append(pid)
+    sys.stdin.read()
+    for pid in pids:
+        os.waitpid(pid, 0)
+    os._exit(0)
+
+
+# ---------------- parent side ----------------
+def smaps(pid):
+    """ {"rss_mb", "pss_mb", "uss_mb"} from /proc/<pid>/smaps_rollup. """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    kb = lambda *names: sum(fields.get(n, 0) for n in names) / 1024  # noqa: E731
+    return {"rss_mb": round(kb("Rss"), 1), "pss_mb": round(kb("Pss"), 1),
+            "uss_mb": round(kb("Private_Clean", "Private_Dirty"), 1)}
+
+
+def run_mode(mode, args):
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode, "--model-path", args.model_path,
+           "--workers", str(args.workers), "--threads", str(threads)]
+    wall_start = time.perf_counter()
+    n_procs = 1 if mode == "prefork" else args.workers
+    procs = [subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(n_procs)]
+
+    ready, parent = [], None
+    expected = args.workers + (1 if mode == "prefork" else 0)
+    while len(ready) + (parent is not None) < expected:
+        for p in procs:
+            line = p.stdout.readline()
+            if not line:
+                raise SystemExit(f"{mode}: a worker exited before becoming ready")
+            rec = json.loads(line)
+            if rec.get("parent"):
+                parent = rec
+            else:
+                ready.append(rec)
+            if len(ready) + (parent is not None) >= expected:
+                break
+    all_ready_s = time.perf_counter() - wall_start
+
+    workers = [dict(rec, **smaps(rec["pid"])) for rec in ready]
+    parent_mem = smaps(parent["pid"]) if parent else None
+    for p in procs:
+        p.stdin.close()
+    for p in procs:
+        p.wait(timeout=60)
+
+    total_pss = sum(w["pss_mb"] for w in workers) + (parent_mem["pss_mb"] if parent_mem else 0)
+    return {
+        "mode": mode,
+        "workers": args.workers,
+        "threads_per_worker": threads,
+        "all_ready_s": round(all_ready_s, 2),
+        "parent_load_s": parent["startup_s"] if parent else None,
+        "worker_startup": summarize([w["startup_s"] * 1000 for w in workers]),
+        "rss_mb_per_worker": round(sum(w["rss_mb"] for w in workers) / len(workers), 1),
+        "pss_mb_per_worker": round(sum(w["pss_mb"] for w in workers) / len(workers), 1),
+        "uss_mb_per_worker": round(sum(w["uss_mb"] for w in workers) / len(workers), 1),
+        "total_pss_mb": round(total_pss, 1),
+        "parent": parent_mem,
+        "per_worker": workers,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-worker memory/startup of the intent model across loading modes")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--model-path", default=os.getenv("INTENT_MODEL_PATH", "GMR01231/Barber_Intent_Bot"))
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--threads", type=int, default=1, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child, args.model_path, args.workers, args.threads)
+        return
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("Needs Linux /proc/<pid>/smaps_rollup")
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        print(f"→ {mode} × {args.workers} ...")
+        results.append(run_mode(mode, args))
+
+    print(f"\n{'mode':<16}{'ready s':>9}{'start p50 ms':>14}{'RSS/worker':>12}{'PSS/worker':>12}"
+          f"{'USS/worker':>12}{'total PSS':>11}")
+    for r in results:
+        print(f"{r['mode']:<16}{r['all_ready_s']:>9}{r['worker_startup']['p50_ms']:>14}{r['rss_mb_per_worker']:>12}"
+              f"{r['pss_mb_per_worker']:>12}{r['uss_mb_per_worker']:>12}{r['total_pss_mb']:>11}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"\nReport → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# hf_deploy.py
+"""
+Incremental deploys to the Hugging Face Hub (Spaces and model repos).
+
+A local manifest (.deploy_manifest.json, one entry per target repo) remembers the
+content hash of every file that was last pushed. A deploy hashes the local folder,
+diffs it against the manifest and sends only the added/changed/removed files in a
+single commit through the Hub commit API — no clone, and no network calls at all
+when nothing changed.
+
+The first deploy of a target (or --resync) reads the remote file list once and
+compares hashes against it, so files that are already up to date are not re-uploaded.
+
+Used by DeployAppToHF.py and models/UploadModel.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.getenv("DEPLOY_MANIFEST", os.path.join(ROOT_DIR, ".deploy_manifest.json"))
+DEFAULT_IGNORE = [".git", ".git/*", "__pycache__", "*/__pycache__/*", "*.pyc", ".env", "*.pstats",
+                  "profiles/*", ".cache/*", ".DS_Store",
+                  # runtime output with customer data: appointment exports, conversation logs, archives
+                  "exports", "exports/*", "*/exports/*", "logs", "logs/*", "*/logs/*",
+                  "archive", "archive/*", "*/archive/*", "*.ckpt"]
+
+
+# ---------------- Timing ----------------
+class StepTimer:
+    def __init__(self):
+        self.steps = []  # (name, seconds)
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def as_dict(self):
+        return {name: round(sec, 3) for name, sec in self.steps}
+
+    def summary(self):
+        total = sum(sec for _, sec in self.steps)
+        return " | ".join(f"{name} {sec:.2f}s" for name, sec in self.steps) + f" | total {total:.2f}s"
+
+
+# ---------------- Hashing ----------------
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def git_blob_sha1(path):
+    """ Git object id of a file, i.e. what the Hub reports as blob_id for non-LFS files. """
+    h = hashlib.sha1()
+    h.update(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ignored(rel_path, patterns):
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def scan(local_dir, previous=None, ignore=DEFAULT_IGNORE):
+    """
+    {repo-relative path: {"sha256", "size", "mtime"}} for every file under local_dir.
+    Files whose size and mtime match `previous` reuse its hash instead of being re-read.
+    """
+    previous = previous or {}
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(local_dir):
+        rel_dir = os.path.relpath(dirpath, local_dir).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = [d for d in dirnames if not _ignored(rel_dir + d, ignore)]
+        for name in filenames:
+            rel = rel_dir + name
+            if _ignored(rel, ignore):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            old = previous.get(rel)
+            if old and old.get("size") == st.st_size and old.get("mtime") == st.st_mtime:
+                digest = old["sha256"]
+            else:
+                digest = file_sha256(path)
+            files[rel] = {"sha256": digest, "size": st.st_size, "mtime": st.st_mtime}
+    return files
+
+
+# ---------------- Manifest ----------------
+def _target_key(repo_id, repo_type, path_in_repo):
+    return f"{repo_type}:{repo_id}:{path_in_repo.strip('/')}"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------------- Remote state ----------------
+def remote_files(api, repo_id, repo_type, path_in_repo=""):
+    """ {repo-relative path: RepoFile} under path_in_repo, or {} if the repo does not exist yet. """
+    from huggingface_hub.utils import RepositoryNotFoundError
+    prefix = path_in_repo.strip("/")
+    try:
+        entries = api.list_repo_tree(repo_id, path_in_repo=prefix or None, repo_type=repo_type,
+                                     recursive=True, expand=False)
+        out = {}
+        for entry in entries:
+            if getattr(entry, "blob_id", None) is None:  # folders
+                continue
+            rel = entry.path[len(prefix) + 1:] if prefix else entry.path
+            out[rel] = entry
+        return out
+    except RepositoryNotFoundError:
+        return {}
+
+
+def _matches_remote(local_dir, rel, info, remote):
+    lfs = getattr(remote, "lfs", None)
+    if lfs is not None:
+        sha = lfs.get("sha256") if isinstance(lfs, dict) else getattr(lfs, "sha256", None)
+        return sha == info["sha256"]
+    return remote.blob_id == git_blob_sha1(os.path.join(local_dir, *rel.split("/")))
+
+
+# ---------------- Deploy ----------------
+def plan(local, deployed):
+    """ (changed paths, deleted paths): local vs. what was last deployed. """
+    changed = sorted(p for p, info in local.items()
+                     if p not in deployed or deployed[p]["sha256"] != info["sha256"])
+    deleted = sorted(p for p in deployed if p not in local)
+    return changed, deleted
+
+
+def deploy(local_dir, repo_id, repo_type="model", token=None, path_in_repo="",
+           commit_message=None, ignore=DEFAULT_IGNORE, delete_removed=True,
+           resync=False, dry_run=False, create=True, manifest_path=MANIFEST_PATH):
+    """
+    Push only what changed in `local_dir` to `repo_id`. Returns a report dict with the
+    uploaded/deleted paths and per-step timings.
+    """
+    timer = StepTimer()
+    key = _target_key(repo_id, repo_type, path_in_repo)
+
+    with timer.step("scan"):
+        manifest = load_manifest(manifest_path)
+        target = manifest.get(key)
+        local = scan(local_dir, (target or {}).get("files"), ignore)
+
+    api = None
+    if target is None or resync:
+        # No local record of this target: one listing call to learn what is already there
+        from huggingface_hub import HfApi
+        api = HfApi(token=token)
+        with timer.step("remote_state"):
+            remote = remote_files(api, repo_id, repo_type, path_in_repo)
+            deployed = {rel: info for rel, info in local.items()
+                        if rel in remote and _matches_remote(local_dir, rel, info, remote[rel])}
+            # Files that only exist remotely are left alone: they were not deployed from here
+    else:
+        deployed = target["files"]
+
+    with timer.step("plan"):
+        changed, deleted = plan(local, deployed)
+        if not delete_removed or (target is None or resync):
+            deleted = []
+
+    report = {"repo_id": repo_id, "repo_type": repo_type, "uploaded": changed, "deleted": deleted,
+              "bytes": sum(local[p]["size"] for p in changed), "commit": None}
+
+    if not changed and not deleted:
+        if target is None or resync:
+            manifest[key] = {"files": local, "deployed": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            save_manifest(manifest, manifest_path)
+        print(f"✅ {repo_id}: no changes ({len(local)} files up to date) — {timer.summary()}")
+        report["timings"] = timer.as_dict()
+        return report
+
+    print(f"{repo_id}: {len(changed)} to upload ({report['bytes'] / 1e6:.2f} MB), {len(deleted)} to delete")
+    for p in changed:
+        print(f"  + {p}")
+    for p in deleted:
+        print(f"  - {p}")
+    if dry_run:
+        print(f"(dry run) — {timer.summary()}")
+        report["timings"] = timer.as_dict()
+        return report
+
+    from huggingface_hub import CommitOperationAdd, CommitOperationDelete, HfApi
+    api = api or HfApi(token=token)
+    prefix = path_in_repo.strip("/")
+    in_repo = (lambda p: f"{prefix}/{p}") if prefix else (lambda p: p)
+    operations = [CommitOperationAdd(path_in_repo=in_repo(p), path_or_fileobj=os.path.join(local_dir, *p.split("/")))
+                  for p in changed]
+    operations += [CommitOperationDelete(path_in_repo=in_repo(p)) for p in deleted]
+
+    if create and target is None:
+        with timer.step("create_repo"):
+            api.create_repo(repo_id, repo_type=repo_type, exist_ok=True,
+                            **({"space_sdk": "gradio"} if repo_type == "space" else {}))
+    with timer.step("commit"):
+        info = api.create_commit(repo_id=repo_id, repo_type=repo_type, operations=operations,
+                                 commit_message=commit_message or f"Update {len(changed)} file(s), delete {len(deleted)}")
+    report["commit"] = getattr(info, "commit_url", None)
+
+    with timer.step("save_manifest"):
+        manifest[key] = {"files": local, "deployed": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                         "commit": getattr(info, "oid", None)}
+        save_manifest(manifest, manifest_path)
+
+    print(f"✅ Deployed to {repo_id} — {timer.summary()}")
+    report["timings"] = timer.as_dict()
+    return report
+
+
+def add_arguments(ap):
+    """ Shared CLI flags for the deploy scripts. """
+    ap.add_argument("--dry-run", action="store_true", help="Show what would be uploaded/deleted")
+    ap.add_argument("--resync", action="store_true",
+                    help="Ignore the local manifest and compare against the remote repo")
+    ap.add_argument("--keep-removed", action="store_true", help="Do not delete files removed locally")
+    ap.add_argument("-m", "--message", default=None, help="Commit message")
+    return ap
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# ------------------ CONFIG ------------------
+MODEL_PATH = "../models/intent_model"
+MAX_LENGTH = 64
+
+# Streams a JSONL / text file of logged utterances through the intent model in a process
+# pool (one model copy per worker), writing "line, text, intent, prob" JSONL rows in input
+# order. At most --max-inflight chunks are in memory; the checkpoint lets an interrupted
+# run continue where it stopped:
+#
+#   python ClassifyLogs.py chat_logs.jsonl labelled.jsonl --workers 4
+#   python ClassifyLogs.py chat_logs.jsonl labelled.jsonl --workers 4   # again → resumes
+
+# ------------------ WORKER ------------------
+_tokenizer = None
+_model = None
+
+def _init_worker(model_path, threads):
+    global _tokenizer, _model
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    torch.set_num_threads(threads)
+    _tokenizer = AutoTokenizer.from_pretrained(model_path)
+    _model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+
+def classify_chunk(texts, micro_batch, max_length):
+    """ [(intent, prob)] for texts; each micro-batch holds texts of similar length to keep padding small. """
+    import torch
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    out = [None] * len(texts)
+    id2label = _model.config.id2label
+    with torch.inference_mode():
+        for start in range(0, len(order), micro_batch):
+            idx = order[start:start + micro_batch]
+            inputs = _tokenizer([texts[i] for i in idx], return_tensors="pt", truncation=True,
+                                padding=True, max_length=max_length)
+            probs = _model(**inputs).logits.softmax(-1)
+            best_p, best_id = probs.max(-1)
+            for i, p, c in zip(idx, best_p.tolist(), best_id.tolist()):
+                out[i] = (id2label[c], round(p, 4))
+    return out
+
+# ------------------ INPUT ------------------
+def read_records(path, text_field, skip):
+    """ Yields (line number, text, extra fields) from a JSONL or plain-text file, after `skip` lines. """
+    as_jsonl = path.endswith(".jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if n < skip:
+                continue
+            line = line.rstrip("\n")
+            if as_jsonl:
+                if not line.strip():
+                    yield n, None, None
+                    continue
+                rec = json.loads(line)
+                text = rec.get(text_field) or rec.get("message")
+                extra = {"logged_intent": rec["intent"]} if "intent" in rec else None
+                yield n, text, extra
+            else:
+                yield n, line if line.strip() else None, None
+
+def chunks(records, size):
+    chunk = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# ------------------ CHECKPOINT ------------------
+def load_checkpoint(path, input_path, output_path):
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return {"lines_done": 0, "output_bytes": 0, "rows": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        ckpt = json.load(f)
+    if ckpt.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"❌ Checkpoint {path} belongs to {ckpt.get('input')}, not {input_path}")
+    return ckpt
+
+def save_checkpoint(path, input_path, lines_done, output_bytes, rows):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"input": os.path.abspath(input_path), "lines_done": lines_done,
+                   "output_bytes": output_bytes, "rows": rows}, f)
+    os.replace(tmp, path)
+
+# ------------------ MAIN ------------------
+def write_chunk(out, chunk, preds):
+    rows = 0
+    pred_iter = iter(preds)
+    for n, text, extra in chunk:
+        if text is None:
+            continue
+        intent, prob = next(pred_iter)
+        row = {"line": n, "text": text, "intent": intent, "prob": prob}
+        if extra:
+            row.update(extra)
+            row["agrees"] = extra["logged_intent"] == intent
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        rows += 1
+    return rows
+
+def run(args):
+    checkpoint_path = args.checkpoint or args.output + ".ckpt"
+    ckpt = {"lines_done": 0, "output_bytes": 0, "rows": 0} if args.restart else \
+        load_checkpoint(checkpoint_path, args.input, args.output)
+    if ckpt["lines_done"]:
+        print(f"Resuming after line {ckpt['lines_done']:,} ({ckpt['rows']:,} rows already written)")
+
+    # Drop anything written after the last checkpoint, then append
+    mode = "r+" if ckpt["output_bytes"] else "w"
+    out = open(args.output, mode, encoding="utf-8")
+    out.seek(ckpt["output_bytes"])
+    out.truncate()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    max_inflight = args.max_inflight or 2 * args.workers
+    lines_done, rows = ckpt["lines_done"], ckpt["rows"]
+    start = last_report = time.perf_counter()
+    rows_at_start = rows
+
+    pending = []  # (chunk, future) in input order
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.model, threads)) as pool:
+        def drain(limit):
+            nonlocal lines_done, rows, last_report
+            while len(pending) > limit:
+                chunk, future = pending.pop(0)
+                rows += write_chunk(out, chunk, future.result())
+                lines_done = chunk[-1][0] + 1
+                out.flush()
+                save_checkpoint(checkpoint_path, args.input, lines_done, out.tell(), rows)
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    rate = (rows - rows_at_start) / (now - start)
+                    print(f"  {lines_done:,} lines, {rows:,} rows — {rate:,.0f} texts/s")
+                    last_report = now
+
+        for chunk in chunks(read_records(args.input, args.text_field, lines_done), args.batch_size):
+            texts = [text for _, text, _ in chunk if text is not None]
+            pending.append((chunk, pool.submit(classify_chunk, texts, args.micro_batch, args.max_length)))
+            drain(max_inflight)
+        drain(0)
+    out.close()
+
+    elapsed = time.perf_counter() - start
+    new_rows = rows - rows_at_start
+    print(f"✅ {new_rows:,} texts classified in {elapsed:.1f}s ({new_rows / elapsed if elapsed else 0:,.0f} texts/s, "
+          f"{args.workers} workers × {threads} threads) → {args.output}")
+    return {"rows": rows, "new_rows": new_rows, "seconds": round(elapsed, 2),
+            "texts_per_s": round(new_rows / elapsed, 1) if elapsed else None}
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch-classify logged utterances with the intent model")
+    ap.add_argument("input", help=".jsonl (one object per line) or plain text (one utterance per line)")
+    ap.add_argument("output", help="JSONL rows: line, text, intent, prob (+ logged_intent/agrees)")
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--text-field", default="text", help="JSONL field holding the utterance")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--threads", type=int, default=None, help="Torch threads per worker (default: cores / workers)")
+    ap.add_argument("--batch-size", type=int, default=512, help="Lines per chunk sent to a worker")
+    ap.add_argument("--micro-batch", type=int, default=64, help="Padded batch size inside a worker")
+    ap.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    ap.add_argument("--max-inflight", type=int, default=None, help="Chunks in flight (default: 2 × workers)")
+    ap.add_argument("--checkpoint", default=None, help="Default: <output>.ckpt")
+    ap.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    ap.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    run(ap.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 # generate_intent_dataset.py
-import json, random, re, argparse, os
+import json, random, re, argparse, os, hashlib
 from datetime import datetime, timedelta
 import pytz
 from collections import defaultdict
+from multiprocessing import Pool
 
 # ---------------- Firebase + Fallback ----------------
 def load_entities_from_firebase():
@@ -261,21 +262,112 @@ def stratified_split(data, val_ratio=0.1, seed=42):
     random.shuffle(val)
     return train, val
 
+# ---------------- Parallel streaming (JSONL) ----------------
+_PUNCT_TAIL = re.compile(r"[\s.!?…]+$")
+
+def normalize_text(text):
+    """ Lowercase, collapse whitespace, drop trailing punctuation (so "hi!" == "Hi"). """
+    return _PUNCT_TAIL.sub("", re.sub(r"\s+", " ", text.lower()).strip())
+
+def text_hash(text):
+    return int.from_bytes(hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=8).digest(), "big")
+
+def generate_shard(spec):
+    """ One shard of examples with its own seed, so shards are reproducible in any process. """
+    shard_idx, count, seed, barbers, services = spec
+    random.seed(seed * 1_000_003 + shard_idx)
+    return [make_one(barbers, services) for _ in range(count)]
+
+class StratifiedWriter:
+    """
+    Streams examples to train/val JSONL files. Every intent sends exactly `val_ratio`
+    of its examples to validation, so the split stays stratified without holding data in memory.
+    """
+
+    def __init__(self, train_path, val_path, val_ratio):
+        self.train_f = open(train_path, "w", encoding="utf-8")
+        self.val_f = open(val_path, "w", encoding="utf-8")
+        self.val_ratio = val_ratio
+        self.seen = defaultdict(int)
+        self.train_counts = defaultdict(int)
+        self.val_counts = defaultdict(int)
+
+    def write(self, ex):
+        intent = ex["intent"]
+        c = self.seen[intent]
+        self.seen[intent] += 1
+        to_val = int((c + 1) * self.val_ratio) > int(c * self.val_ratio)
+        f, counts = (self.val_f, self.val_counts) if to_val else (self.train_f, self.train_counts)
+        f.write(json.dumps(ex, ensure_ascii=False) + "\n")
+        counts[intent] += 1
+
+    def close(self):
+        self.train_f.close()
+        self.val_f.close()
+
+def generate_streaming(args, barbers, services):
+    shard_size = max(1, args.shard_size)
+    n_shards = (args.total + shard_size - 1) // shard_size
+    specs = [(i, min(shard_size, args.total - i * shard_size), args.seed, barbers, services)
+             for i in range(n_shards)]
+
+    writer = StratifiedWriter(args.out_train, args.out_val, args.val_ratio)
+    seen_hashes = set()
+    generated = duplicates = 0
+    workers = max(1, args.workers)
+    try:
+        with Pool(workers) as pool:
+            # Feed shards in small windows so finished shards never pile up in memory
+            window = workers * 2
+            for start in range(0, len(specs), window):
+                for shard in pool.imap(generate_shard, specs[start:start + window]):
+                    for ex in shard:
+                        generated += 1
+                        if args.dedupe:
+                            h = text_hash(ex["text"])
+                            if h in seen_hashes:
+                                duplicates += 1
+                                continue
+                            seen_hashes.add(h)
+                        writer.write(ex)
+    finally:
+        writer.close()
+
+    print(f"Generated {generated} examples across {n_shards} shards with {workers} workers; "
+          f"{duplicates} duplicates dropped, {generated - duplicates} unique.")
+    print("Train intent counts:", dict(sorted(writer.train_counts.items())))
+    print("Val intent counts:  ", dict(sorted(writer.val_counts.items())))
+    print(f"Train file → {args.out_train}")
+    print(f"Val file   → {args.out_val}")
+
 # ---------------- Main ----------------
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--total", type=int, default=15000, help="Total examples to generate")
     ap.add_argument("--val-ratio", type=float, default=0.1, help="Validation split ratio")
     ap.add_argument("--seed", type=int, default=42, help="Random seed")
-    ap.add_argument("--out-train", default="intent_train.json")
-    ap.add_argument("--out-val", default="intent_val.json")
+    ap.add_argument("--out-train", default=None, help="Default intent_train.json (.jsonl with --jsonl)")
+    ap.add_argument("--out-val", default=None, help="Default intent_val.json (.jsonl with --jsonl)")
+    ap.add_argument("--jsonl", action="store_true",
+                    help="Parallel streaming mode: sharded generation, JSONL output, dedupe")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for --jsonl mode")
+    ap.add_argument("--shard-size", type=int, default=10000, help="Examples per shard in --jsonl mode")
+    ap.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                    help="Keep exact duplicates (normalized text) in --jsonl mode")
     args = ap.parse_args()
+    ext = "jsonl" if args.jsonl else "json"
+    args.out_train = args.out_train or f"intent_train.{ext}"
+    args.out_val = args.out_val or f"intent_val.{ext}"
 
     random.seed(args.seed)
     barbers, services = ensure_entities()
     if not barbers:
         raise SystemExit("No barbers available; please ensure Firebase or fallback works.")
 
+    if args.jsonl:
+        generate_streaming(args, barbers, services)
+        return
+
     # Generate simplified examples: {"text": ..., "intent": ...}
     data = [make_one(barbers, services) for _ in range(args.total)]
 
@@ -0,0 +1,127 @@
+"""
+Fine-tune reduced-depth variants of the intent model and compare them with the full model.
+
+--init-from takes a local folder or a Hub repo id (default: INTENT_MODEL_PATH, the model the
+app serves); a repo id is resolved to a verified local copy through app/model_store.py,
+downloading it on first use.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+import TrainModel as tm
+
+# ------------------ CONFIG ------------------
+# fine-tuned 6-layer model the variants start from (Hub repo id or local folder)
+INIT_FROM = os.getenv("INTENT_MODEL_PATH", "GMR01231/Barber_Intent_Bot")
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+OUT_ROOT = "models/layer_sweep"
+
+# ------------------ MEASURE ------------------
+def model_size_mb(path):
+    total = 0
+    for name in os.listdir(path):
+        if name.endswith((".safetensors", ".bin")) and name != "training_args.bin":
+            total += os.path.getsize(os.path.join(path, name))
+    return round(total / 2**20, 2)
+
+def measure(path, texts, labels, latency_samples=200, batch_size=64):
+    """ Accuracy/F1 on the validation texts plus batch-1 CPU latency of a saved model. """
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    model = AutoModelForSequenceClassification.from_pretrained(path).to("cpu").eval()
+    max_length = min(tm.MAX_LENGTH, model.config.max_position_embeddings)
+
+    preds = []
+    with torch.no_grad():
+        for i in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", truncation=True,
+                               padding=True, max_length=max_length)
+            preds.extend(model(**inputs).logits.argmax(-1).tolist())
+    preds = np.array(preds)
+
+    timings = []
+    with torch.no_grad():
+        for text in texts[:5]:  # warm-up
+            model(**tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length))
+        for text in texts[:latency_samples]:
+            start = time.perf_counter()
+            model(**tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length))
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "path": path,
+        "layers": model.config.n_layers,
+        "max_positions": model.config.max_position_embeddings,
+        "params_m": round(sum(p.numel() for p in model.parameters()) / 1e6, 2),
+        "size_mb": model_size_mb(path),
+        "accuracy": round(float(tm.accuracy.compute(predictions=preds, references=labels)["accuracy"]), 4),
+        "f1": round(float(tm.f1.compute(predictions=preds, references=labels, average="weighted")["f1"]), 4),
+        "latency_p50_ms": round(statistics.median(timings), 3),
+        "latency_p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 3),
+    }
+
+def print_table(rows):
+    print(f"\n| {'model':<28} | layers | max_pos | params (M) | size (MB) | accuracy | F1     | p50 ms | p95 ms |")
+    print(f"|{'-' * 30}|--------|---------|------------|-----------|----------|--------|--------|--------|")
+    for r in rows:
+        print(f"| {os.path.basename(r['path'].rstrip('/')):<28} | {r['layers']:>6} | {r['max_positions']:>7} "
+              f"| {r['params_m']:>10} | {r['size_mb']:>9} | {r['accuracy']:>8} | {r['f1']:>6} "
+              f"| {r['latency_p50_ms']:>6} | {r['latency_p95_ms']:>6} |")
+
+# ------------------ MAIN ------------------
+def main():
+    ap = argparse.ArgumentParser(description="Fine-tune reduced-depth DistilBERT variants and compare them")
+    ap.add_argument("--init-from", default=INIT_FROM)
+    ap.add_argument("--layers", default="2,3,4", help="Comma-separated layer counts to try")
+    ap.add_argument("--max-positions", type=int, default=64, help="Truncated position embeddings (0 = keep)")
+    ap.add_argument("--out-root", default=OUT_ROOT)
+    ap.add_argument("--latency-samples", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=1, help="torch threads while measuring latency")
+    ap.add_argument("--max-f1-drop", type=float, default=0.005, help="Allowed F1 loss vs the full model")
+    ap.add_argument("--report", default="layer_sweep.json")
+    args = ap.parse_args()
+
+    tm.hf_login()
+    sys.path.insert(0, APP_DIR)
+    import model_store
+    args.init_from, how = model_store.resolve(args.init_from)
+    print(f"Starting from {args.init_from} ({how})")
+    with open(tm.VAL_PATH, "r") as f:
+        val = json.load(f)
+    texts = [x["text"] for x in val]
+    labels = [tm.label2id[x["intent"]] for x in val]
+
+    variants = []
+    for k in [int(x) for x in args.layers.split(",") if x.strip()]:
+        save_dir = os.path.join(args.out_root, f"intent_l{k}_p{args.max_positions or 512}")
+        tm.train("dynamic", output_dir=save_dir + "_ckpt", save_dir=save_dir, model_name=args.init_from,
+                 num_layers=k, max_positions=args.max_positions or None)
+        variants.append(save_dir)
+
+    torch.set_num_threads(args.threads)
+    rows = [measure(args.init_from, texts, labels, args.latency_samples)]
+    rows += [measure(path, texts, labels, args.latency_samples) for path in variants]
+    print_table(rows)
+
+    full = rows[0]
+    holding = [r for r in rows[1:] if r["f1"] >= full["f1"] - args.max_f1_drop]
+    best = min(holding, key=lambda r: (r["layers"], r["size_mb"])) if holding else None
+    if best:
+        print(f"\nSmallest variant within {args.max_f1_drop} F1 of the full model: {best['path']}")
+        print(f"Serve it with INTENT_MODEL_PATH={os.path.abspath(best['path'])}")
+    else:
+        print("\nNo variant held accuracy; keep the full model.")
+
+    with open(args.report, "w") as f:
+        json.dump({"full": full, "variants": rows[1:], "recommended": best and best["path"]}, f, indent=2)
+    print(f"Report → {args.report}")
+
+if __name__ == "__main__":
+    main()
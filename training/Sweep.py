@@ -0,0 +1,289 @@
+"""
+Hyperparameter sweep for the intent classifier.
+
+Trials (grid or random search over train() arguments, each repeated for every seed) run in
+parallel as separate processes. Each trial gets its own set of CPU cores, a matching torch /
+OpenMP thread count, and its own absolute output directory under --out-root. The dataset is
+tokenized once into the shared cache (TrainModel.load_tokenized) before any trial starts, so
+every trial memory-maps the same Arrow files. Trials use early stopping on validation F1.
+
+    python Sweep.py --spec sweep.json --parallel 4
+    python Sweep.py --spec '{"method": "random", "trials": 12, "seeds": [1, 2],
+                             "params": {"learning_rate": {"min": 1e-5, "max": 1e-4, "log": true},
+                                        "batch_size": [8, 16, 32]}}'
+
+Spec keys: method (grid | random), params (name -> list of values, or {min, max, log} for
+random search), trials (random only), seeds (default [42]), fixed (arguments for every trial).
+Finished trials (result.json present) are skipped when the sweep is re-run.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------ CONFIG ------------------
+OUT_ROOT = os.path.join(HERE, "models", "sweep")
+SWEEP_PARAMS = {"learning_rate", "batch_size", "epochs", "warmup_steps", "weight_decay", "grad_accum",
+                "num_layers", "max_positions", "model_name"}
+DEFAULT_SPEC = {
+    "method": "grid",
+    "params": {"learning_rate": [2e-5, 5e-5], "batch_size": [8, 16], "warmup_steps": [0, 200]},
+    "seeds": [42],
+    "fixed": {"epochs": 5},
+}
+
+
+# ------------------ SPEC ------------------
+def load_spec(value):
+    """ --spec is a path to a JSON file or an inline JSON object. """
+    if not value:
+        return DEFAULT_SPEC
+    if os.path.exists(value):
+        with open(value, "r") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def _sample(values, rng):
+    if isinstance(values, list):
+        return rng.choice(values)
+    lo, hi = values["min"], values["max"]
+    if values.get("log"):
+        x = math.exp(rng.uniform(math.log(lo), math.log(hi)))
+    else:
+        x = rng.uniform(lo, hi)
+    return int(round(x)) if isinstance(lo, int) and isinstance(hi, int) and not values.get("log") else x
+
+
+def expand(spec, sample_seed=0):
+    """ List of trial configs: every parameter combination (grid) or `trials` samples (random), times seeds. """
+    params = spec.get("params", {})
+    unknown = (set(params) | set(spec.get("fixed", {}))) - SWEEP_PARAMS
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)} (allowed: {sorted(SWEEP_PARAMS)})")
+    names = sorted(params)
+    if spec.get("method", "grid") == "grid":
+        if any(not isinstance(params[n], list) for n in names):
+            raise ValueError("Grid search needs a list of values for every parameter")
+        combos = [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+    else:
+        rng = random.Random(sample_seed)
+        combos = [{n: _sample(params[n], rng) for n in names} for _ in range(int(spec.get("trials", 10)))]
+    trials = []
+    for i, combo in enumerate(combos):
+        for seed in spec.get("seeds", [42]):
+            config = dict(spec.get("fixed", {}), **combo)
+            trials.append({"id": f"c{i:03d}-s{seed}", "config_id": f"c{i:03d}", "seed": seed, "params": config})
+    return trials
+
+
+# ------------------ CORES ------------------
+def core_slots(parallel, threads):
+    """ `parallel` disjoint lists of CPU ids with `threads` cores each (as far as the machine allows). """
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    ring = cpus * (threads // len(cpus) + 2)  # oversubscribed sweeps wrap around and share cores
+    return [sorted(set(ring[(i * threads) % len(cpus):(i * threads) % len(cpus) + threads])) for i in range(parallel)]
+
+
+# ------------------ TRIAL (child process) ------------------
+def run_trial(trial_path):
+    with open(trial_path, "r") as f:
+        trial = json.load(f)
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, trial["cores"])
+    import torch
+    torch.set_num_threads(trial["threads"])
+    torch.set_num_interop_threads(1)
+    import TrainModel as tm
+    from transformers import AutoTokenizer
+
+    params = dict(trial["params"])
+    model_name = params.pop("model_name", tm.MODEL_NAME)
+    max_positions = params.get("max_positions")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if max_positions:
+        tokenizer.model_max_length = max_positions
+    tokenized = tm.load_tokenized(tokenizer, trial["train_path"], trial["val_path"],
+                                  max_length=min(tm.MAX_LENGTH, max_positions or tm.MAX_LENGTH),
+                                  cache_dir=trial["cache_dir"])
+    out = trial["output_dir"]
+    result = tm.train("dynamic", output_dir=os.path.join(out, "checkpoints"), save_dir=os.path.join(out, "model"),
+                      tokenized=tokenized, model_name=model_name, seed=trial["seed"],
+                      early_stopping_patience=trial["patience"], metric_for_best_model="f1", save_total_limit=1,
+                      logging_dir=os.path.join(out, "logs"), **params)
+    with open(os.path.join(out, "result.json.tmp"), "w") as f:
+        json.dump(dict(trial, result=result), f, indent=2)
+    os.replace(os.path.join(out, "result.json.tmp"), os.path.join(out, "result.json"))
+
+
+# ------------------ SWEEP (parent) ------------------
+def warm_cache(trials, args):
+    """ Tokenize once per distinct tokenizer / max_positions so the trials only hit the cache. """
+    import TrainModel as tm
+    from transformers import AutoTokenizer
+    for model_name, max_positions in {(t["params"].get("model_name", tm.MODEL_NAME), t["params"].get("max_positions"))
+                                      for t in trials}:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if max_positions:
+            tokenizer.model_max_length = max_positions
+        tm.load_tokenized(tokenizer, args.train_file, args.val_file,
+                          max_length=min(tm.MAX_LENGTH, max_positions or tm.MAX_LENGTH), cache_dir=args.cache_dir)
+
+
+def launch(trial, slots):
+    """ Run one trial in a child process on a free core slot; returns its result dict (or an error). """
+    cores = slots.get()
+    try:
+        out = trial["output_dir"]
+        os.makedirs(out, exist_ok=True)
+        trial = dict(trial, threads=len(cores), cores=cores)
+        trial_path = os.path.join(out, "trial.json")
+        with open(trial_path, "w") as f:
+            json.dump(trial, f, indent=2)
+        env = dict(os.environ, OMP_NUM_THREADS=str(len(cores)), MKL_NUM_THREADS=str(len(cores)),
+                   TOKENIZERS_PARALLELISM="false")
+        start = time.perf_counter()
+        with open(os.path.join(out, "train.log"), "w") as log:
+            code = subprocess.call([sys.executable, os.path.abspath(__file__), "--run-trial", trial_path],
+                                   cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+        seconds = round(time.perf_counter() - start, 1)
+        if code != 0:
+            print(f"❌ {trial['id']} failed (exit {code}) after {seconds}s, see {out}/train.log")
+            return dict(trial, error=f"exit {code}")
+        with open(os.path.join(out, "result.json"), "r") as f:
+            done = json.load(f)
+        r = done["result"]
+        print(f"✅ {trial['id']} f1={r['eval_f1']:.4f} acc={r['eval_accuracy']:.4f} "
+              f"{r['wall_clock_s']}s, {r['epochs_run']} epochs{' (stopped early)' if r['stopped_early'] else ''}")
+        return done
+    finally:
+        slots.put(cores)
+
+
+def pareto(rows):
+    """ Configs no other config beats on both F1 (higher) and training time (lower). """
+    return [r for r in rows if not any(o["f1_mean"] >= r["f1_mean"] and o["train_s_mean"] <= r["train_s_mean"]
+                                       and (o["f1_mean"], o["train_s_mean"]) != (r["f1_mean"], r["train_s_mean"])
+                                       for o in rows)]
+
+
+def leaderboard(results):
+    """ One row per config (seeds aggregated), best mean F1 first. """
+    by_config = {}
+    for t in results:
+        if "result" in t:
+            by_config.setdefault(t["config_id"], []).append(t)
+    rows = []
+    for config_id, trials in by_config.items():
+        f1s = [t["result"]["eval_f1"] for t in trials]
+        accs = [t["result"]["eval_accuracy"] for t in trials]
+        secs = [t["result"]["wall_clock_s"] for t in trials]
+        best = max(trials, key=lambda t: t["result"]["eval_f1"])
+        rows.append({
+            "config_id": config_id,
+            "params": trials[0]["params"],
+            "seeds": len(trials),
+            "f1_mean": round(statistics.mean(f1s), 4),
+            "f1_std": round(statistics.stdev(f1s), 4) if len(f1s) > 1 else 0.0,
+            "accuracy_mean": round(statistics.mean(accs), 4),
+            "train_s_mean": round(statistics.mean(secs), 1),
+            "epochs_mean": round(statistics.mean(t["result"]["epochs_run"] for t in trials), 2),
+            "best_model": os.path.join(best["output_dir"], "model"),
+        })
+    rows.sort(key=lambda r: (-r["f1_mean"], r["train_s_mean"]))
+    front = {r["config_id"] for r in pareto(rows)}
+    for r in rows:
+        r["pareto"] = r["config_id"] in front
+    return rows
+
+
+def print_leaderboard(rows):
+    print(f"\n| {'config':<6} | {'params':<52} | seeds | F1 mean | F1 std | acc    | train s | epochs | pareto |")
+    print(f"|{'-' * 8}|{'-' * 54}|-------|---------|--------|--------|---------|--------|--------|")
+    for r in rows:
+        params = ", ".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in sorted(r["params"].items()))
+        print(f"| {r['config_id']:<6} | {params[:52]:<52} | {r['seeds']:>5} | {r['f1_mean']:>7} | {r['f1_std']:>6} "
+              f"| {r['accuracy_mean']:>6} | {r['train_s_mean']:>7} | {r['epochs_mean']:>6} | {'*' if r['pareto'] else '':>6} |")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel multi-seed hyperparameter sweep for the intent classifier")
+    ap.add_argument("--spec", default=None, help="JSON file or inline JSON (default: a small lr/batch/warmup grid)")
+    ap.add_argument("--parallel", type=int, default=0, help="Trials at once (default: cores // threads)")
+    ap.add_argument("--threads", type=int, default=0, help="Cores/threads per trial (default: cores // parallel)")
+    ap.add_argument("--patience", type=int, default=2, help="Early-stopping patience in epochs (0 = off)")
+    ap.add_argument("--out-root", default=OUT_ROOT)
+    ap.add_argument("--cache-dir", default=None, help="Tokenized dataset cache (default: TrainModel.CACHE_DIR)")
+    ap.add_argument("--train-file", default=None)
+    ap.add_argument("--val-file", default=None)
+    ap.add_argument("--sample-seed", type=int, default=0, help="RNG seed for random search")
+    ap.add_argument("--report", default="sweep_report.json")
+    ap.add_argument("--run-trial", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_trial:
+        run_trial(args.run_trial)
+        return
+
+    import TrainModel as tm
+    # Children run with cwd=training/, but every path they get is absolute
+    args.out_root = os.path.abspath(args.out_root)
+    args.cache_dir = os.path.abspath(args.cache_dir or os.path.join(HERE, tm.CACHE_DIR))
+    args.train_file = os.path.abspath(args.train_file or os.path.join(HERE, tm.TRAIN_PATH))
+    args.val_file = os.path.abspath(args.val_file or os.path.join(HERE, tm.VAL_PATH))
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    if args.parallel and not args.threads:
+        args.threads = max(1, cores // args.parallel)
+    args.threads = args.threads or min(4, cores)
+    args.parallel = args.parallel or max(1, cores // args.threads)
+
+    trials = expand(load_spec(args.spec), args.sample_seed)
+    for t in trials:
+        t.update(output_dir=os.path.join(args.out_root, t["id"]), train_path=args.train_file,
+                 val_path=args.val_file, cache_dir=args.cache_dir, patience=args.patience)
+    done = []
+    for t in trials:
+        path = os.path.join(t["output_dir"], "result.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                done.append(json.load(f))
+    pending = [t for t in trials if t["id"] not in {d["id"] for d in done}]
+    print(f"{len(trials)} trials ({len(done)} already done), {args.parallel} at a time × {args.threads} threads")
+
+    start = time.perf_counter()
+    warm_cache(pending, args)
+    slots = queue.Queue()
+    for cores_ in core_slots(args.parallel, args.threads):
+        slots.put(cores_)
+    with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+        results = done + list(pool.map(lambda t: launch(t, slots), pending))
+    wall = round(time.perf_counter() - start, 1)
+
+    rows = leaderboard(results)
+    print_leaderboard(rows)
+    failed = [t["id"] for t in results if "error" in t]
+    if failed:
+        print(f"⚠️ {len(failed)} trials failed: {', '.join(failed)}")
+    if rows:
+        print(f"\nBest: {rows[0]['config_id']} (F1 {rows[0]['f1_mean']}) → {rows[0]['best_model']}")
+    print(f"Sweep wall clock: {wall}s")
+
+    with open(args.report, "w") as f:
+        json.dump({"config": vars(args), "wall_clock_s": wall, "leaderboard": rows, "trials": results,
+                   "failed": failed}, f, indent=2)
+    print(f"Report → {args.report}")
+
+
+if __name__ == "__main__":
+    main()
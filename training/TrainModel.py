@@ -1,34 +1,53 @@
+import argparse
+import hashlib
 import json
-from datasets import Dataset, DatasetDict
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer
+import time
+import torch
+from datasets import Dataset, DatasetDict, load_dataset, load_from_disk
+from datasets.fingerprint import Hasher
+from transformers import (AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer,
+                          DataCollatorWithPadding, TrainerCallback, EarlyStoppingCallback)
 import evaluate
 import numpy as np
 import os
 from huggingface_hub import login
 from dotenv import load_dotenv
 
-# Load .env file (make sure .env is in project root)
-token = os.getenv("HF_TOKEN_LOGIN")
-
-if not token:
-    # Try loading again (or fallback)
-    load_dotenv()
-    token = os.getenv("HF_TOKEN_LOGIN")
-
-if not token:
-    raise ValueError("HF_TOKEN_LOGIN not found. Please set it in your .env file.")
-
-# Login to HuggingFace
-login(token)
-
 # ------------------ CONFIG ------------------
 MODEL_NAME = "Falconsai/intent_classification"
 LABELS = ["cancel_appointment", "view_appointments", "list_barbers",
           "list_services", "small_talk", "book_appointment"]
+MAX_LENGTH = 64
+TRAIN_PATH = "Dataset/intent_train.json"
+VAL_PATH = "Dataset/intent_val.json"
+CACHE_DIR = ".cache/tokenized"
+
+# Defaults of the hyperparameters train() accepts (Sweep.py searches over them)
+LEARNING_RATE = 2e-5
+EPOCHS = 5
+WARMUP_STEPS = 200
+WEIGHT_DECAY = 0.01
+SEED = 42
 
 label2id = {label: i for i, label in enumerate(LABELS)}
 id2label = {i: label for label, i in label2id.items()}
 
+
+def hf_login():
+    # Load .env file (make sure .env is in project root)
+    token = os.getenv("HF_TOKEN_LOGIN")
+
+    if not token:
+        # Try loading again (or fallback)
+        load_dotenv()
+        token = os.getenv("HF_TOKEN_LOGIN")
+
+    if not token:
+        raise ValueError("HF_TOKEN_LOGIN not found. Please set it in your .env file.")
+
+    # Login to HuggingFace
+    login(token)
+
 # ------------------ LOAD DATA ------------------
 def load_json(path):
     with open(path, "r") as f:
@@ -37,32 +56,141 @@ def load_json(path):
     labels = [label2id[item["intent"]] for item in data]
     return {"text": texts, "label": labels}
 
-train_data = load_json("Dataset/intent_train.json")
-val_data = load_json("Dataset/intent_val.json")
+def load_jsonl(train_path, val_path):
+    """ JSONL splits via the datasets JSON loader: parsed into on-disk Arrow, not held in RAM. """
+    dataset = load_dataset("json", data_files={"train": train_path, "validation": val_path})
+    return dataset.map(lambda batch: {"label": [label2id[i] for i in batch["intent"]]},
+                       batched=True, remove_columns=["intent"])
 
-dataset = DatasetDict({
-    "train": Dataset.from_dict(train_data),
-    "validation": Dataset.from_dict(val_data)
-})
+def build_dataset(train_path=TRAIN_PATH, val_path=VAL_PATH):
+    if train_path.endswith(".jsonl") and val_path.endswith(".jsonl"):
+        return load_jsonl(train_path, val_path)
+    return DatasetDict({
+        "train": Dataset.from_dict(load_json(train_path)),
+        "validation": Dataset.from_dict(load_json(val_path))
+    })
 
 # ------------------ TOKENIZER ------------------
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+def tokenize_dataset(dataset, tokenizer, padding="dynamic", max_length=MAX_LENGTH):
+    """
+    padding="dynamic": truncate only; batches are padded by the data collator to their longest example.
+    padding="max_length": pad every example to max_length (the old behaviour, kept for comparisons).
+    """
+    def preprocess(batch):
+        if padding == "max_length":
+            return tokenizer(batch["text"], truncation=True, padding="max_length", max_length=max_length)
+        return tokenizer(batch["text"], truncation=True, max_length=max_length)
+
+    return dataset.map(preprocess, batched=True)
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def tokenized_cache_key(train_path, val_path, tokenizer, padding, max_length):
+    """ Changes whenever the data files, the tokenizer or the tokenization settings change. """
+    h = hashlib.sha256()
+    for part in (_file_sha256(train_path), _file_sha256(val_path), Hasher.hash(tokenizer),
+                 padding, str(max_length), ",".join(LABELS)):
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def load_tokenized(tokenizer, train_path=TRAIN_PATH, val_path=VAL_PATH, padding="dynamic",
+                   max_length=MAX_LENGTH, cache_dir=CACHE_DIR):
+    """
+    Tokenized splits from the on-disk Arrow cache (memory-mapped), building them on a miss.
+    cache_dir=None skips the cache.
+    """
+    start = time.perf_counter()
+    if not cache_dir:
+        return tokenize_dataset(build_dataset(train_path, val_path), tokenizer, padding, max_length)
+
+    path = os.path.join(cache_dir, tokenized_cache_key(train_path, val_path, tokenizer, padding, max_length))
+    if os.path.isdir(path):
+        tokenized = load_from_disk(path)
+        print(f"[cache] hit {path} ({time.perf_counter() - start:.2f}s)")
+        return tokenized
+
+    tokenized = tokenize_dataset(build_dataset(train_path, val_path), tokenizer, padding, max_length)
+    tmp = path + ".tmp"
+    tokenized.save_to_disk(tmp)
+    os.replace(tmp, path)
+    print(f"[cache] miss, tokenized and saved to {path} ({time.perf_counter() - start:.2f}s)")
+    return load_from_disk(path)  # train from the memory-mapped copy
+
+class ThroughputCallback(TrainerCallback):
+    """ Logs training samples/second between logging steps. """
+
+    def __init__(self):
+        self._last_time = None
+        self._last_step = 0
 
-def preprocess(batch):
-    return tokenizer(batch["text"], truncation=True, padding="max_length", max_length=64)
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._last_time = time.perf_counter()
+        self._last_step = state.global_step
 
-tokenized_dataset = dataset.map(preprocess, batched=True)
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        now = time.perf_counter()
+        steps = state.global_step - self._last_step
+        if self._last_time is None or steps <= 0:
+            return
+        samples = steps * args.train_batch_size * args.gradient_accumulation_steps * max(1, args.world_size)
+        rate = samples / (now - self._last_time)
+        print(f"[throughput] step {state.global_step}: {rate:.1f} samples/s")
+        if logs is not None:
+            logs["samples_per_second"] = round(rate, 2)
+        self._last_time, self._last_step = now, state.global_step
 
-# ------------------ MODEL ------------------
-model = AutoModelForSequenceClassification.from_pretrained(
-    MODEL_NAME,
-    num_labels=len(LABELS),
-    id2label=id2label,
-    label2id=label2id,
-    ignore_mismatched_sizes=True   # 👈 important fix
-)
+class TokenCountingCollator:
+    """ Wraps a data collator and counts padded vs real tokens of every batch it builds. """
 
-# ------------------ TRAINER ------------------
+    def __init__(self, collator):
+        self.collator = collator
+        self.padded_tokens = 0
+        self.real_tokens = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        self.padded_tokens += int(batch["input_ids"].numel())
+        self.real_tokens += int(batch["attention_mask"].sum())
+        return batch
+
+# ------------------ PRUNING ------------------
+def evenly_spaced_layers(total, keep):
+    """ Indices of `keep` layers spread over `total`, always including the first and last. """
+    if keep >= total:
+        return list(range(total))
+    if keep == 1:
+        return [0]
+    return sorted({round(i * (total - 1) / (keep - 1)) for i in range(keep)})
+
+def prune_model(model, num_layers=None, max_positions=None):
+    """
+    Shrink a DistilBERT classifier in place: keep `num_layers` of its transformer
+    layers and/or only the first `max_positions` position embeddings.
+    """
+    distil = model.distilbert
+    if num_layers and num_layers < model.config.n_layers:
+        keep = evenly_spaced_layers(model.config.n_layers, num_layers)
+        distil.transformer.layer = torch.nn.ModuleList([distil.transformer.layer[i] for i in keep])
+        distil.transformer.n_layers = len(keep)
+        model.config.n_layers = len(keep)
+        print(f"Pruned to layers {keep}")
+    if max_positions and max_positions < model.config.max_position_embeddings:
+        emb = distil.embeddings
+        old = emb.position_embeddings
+        new = torch.nn.Embedding(max_positions, old.embedding_dim)
+        new.weight.data.copy_(old.weight.data[:max_positions])
+        emb.position_embeddings = new
+        if hasattr(emb, "position_ids"):
+            emb.register_buffer("position_ids", emb.position_ids[:, :max_positions].clone(), persistent=False)
+        model.config.max_position_embeddings = max_positions
+    return model
+
+# ------------------ METRICS ------------------
 accuracy = evaluate.load("accuracy")
 f1 = evaluate.load("f1")
 
@@ -74,33 +202,164 @@ def compute_metrics(eval_pred):
         "f1": f1.compute(predictions=preds, references=labels, average="weighted")["f1"]
     }
 
-training_args = TrainingArguments(
-    output_dir="models/intent_model",
-    eval_strategy="epoch",   # 👈 correct name
-    save_strategy="epoch",
-    learning_rate=2e-5,
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    num_train_epochs=5,
-    weight_decay=0.01,
-    warmup_steps=200,           # learning rate warmup
-    load_best_model_at_end=True,
-    logging_dir="./logs",
-     report_to="none",   # 👈 disable wandb
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized_dataset["train"],
-    eval_dataset=tokenized_dataset["validation"],
-    tokenizer=tokenizer,
-    compute_metrics=compute_metrics,
-)
-
 # ------------------ TRAIN ------------------
-trainer.train()
+def train(padding="dynamic", output_dir="models/intent_model", save_dir="./intent_model", tokenized=None,
+          batch_size=8, eval_batch_size=8, grad_accum=1, dataloader_workers=0, bf16=False,
+          cache_dir=CACHE_DIR, train_path=TRAIN_PATH, val_path=VAL_PATH,
+          model_name=MODEL_NAME, num_layers=None, max_positions=None,
+          learning_rate=LEARNING_RATE, epochs=EPOCHS, warmup_steps=WARMUP_STEPS, weight_decay=WEIGHT_DECAY,
+          seed=SEED, early_stopping_patience=0, metric_for_best_model=None, save_total_limit=None,
+          logging_dir="./logs"):
+    """
+    early_stopping_patience > 0 stops after that many evaluations without improvement of
+    metric_for_best_model (default: eval loss); the best checkpoint is what gets saved.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    max_length = min(MAX_LENGTH, max_positions or MAX_LENGTH)
+    if max_positions:
+        tokenizer.model_max_length = max_positions
+    tokenized_dataset = tokenized or load_tokenized(tokenizer, train_path, val_path, padding=padding,
+                                                    max_length=max_length, cache_dir=cache_dir)
+
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_name,
+        num_labels=len(LABELS),
+        id2label=id2label,
+        label2id=label2id,
+        ignore_mismatched_sizes=True   # 👈 important fix
+    )
+    prune_model(model, num_layers, max_positions)
+
+    dynamic = padding == "dynamic"
+    collator = TokenCountingCollator(DataCollatorWithPadding(tokenizer))
+
+    training_args = TrainingArguments(
+        output_dir=output_dir,
+        eval_strategy="epoch",   # 👈 correct name
+        save_strategy="epoch",
+        learning_rate=learning_rate,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=eval_batch_size,
+        gradient_accumulation_steps=grad_accum,
+        dataloader_num_workers=dataloader_workers,
+        dataloader_persistent_workers=dataloader_workers > 0,
+        bf16=bf16,                  # 👈 bf16 autocast (works on CPU too)
+        use_cpu=not torch.cuda.is_available(),
+        num_train_epochs=epochs,
+        weight_decay=weight_decay,
+        warmup_steps=warmup_steps,  # learning rate warmup
+        seed=seed,
+        load_best_model_at_end=True,
+        metric_for_best_model=metric_for_best_model,
+        save_total_limit=save_total_limit,
+        logging_dir=logging_dir,
+        report_to="none",   # 👈 disable wandb
+        group_by_length=dynamic,    # 👈 batch similar lengths together so padding stays small
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=tokenized_dataset["train"],
+        eval_dataset=tokenized_dataset["validation"],
+        tokenizer=tokenizer,
+        data_collator=collator,
+        compute_metrics=compute_metrics,
+        callbacks=[ThroughputCallback()] +
+                  ([EarlyStoppingCallback(early_stopping_patience)] if early_stopping_patience else []),
+    )
+
+    start = time.perf_counter()
+    train_output = trainer.train()
+    wall_clock = time.perf_counter() - start
+    eval_metrics = trainer.evaluate()
+
+    # ------------------ SAVE ------------------
+    trainer.save_model(save_dir)
+    tokenizer.save_pretrained(save_dir)
+
+    # Tokens cover train + per-epoch eval batches, as does the wall clock
+    return {
+        "save_dir": save_dir,
+        "padding": padding,
+        "group_by_length": dynamic,
+        "wall_clock_s": round(wall_clock, 2),
+        "train_samples_per_second": train_output.metrics.get("train_samples_per_second"),
+        "padded_tokens": collator.padded_tokens,
+        "real_tokens": collator.real_tokens,
+        "padding_fraction": round(1 - collator.real_tokens / collator.padded_tokens, 4) if collator.padded_tokens else None,
+        "tokens_per_second": round(collator.padded_tokens / wall_clock, 1) if wall_clock else None,
+        "eval_accuracy": eval_metrics.get("eval_accuracy"),
+        "eval_f1": eval_metrics.get("eval_f1"),
+        "epochs_run": round(trainer.state.epoch or 0, 2),
+        "stopped_early": bool(trainer.state.epoch and trainer.state.epoch < epochs),
+    }
+
+def print_comparison(before, after):
+    rows = ["wall_clock_s", "train_samples_per_second", "padded_tokens", "padding_fraction",
+            "tokens_per_second", "eval_accuracy", "eval_f1"]
+    print(f"{'':<26}{'max_length':>14}{'dynamic':>14}")
+    for key in rows:
+        print(f"{key:<26}{str(before.get(key)):>14}{str(after.get(key)):>14}")
+    if after["eval_f1"] is not None and before["eval_f1"] is not None and after["eval_f1"] < before["eval_f1"]:
+        print("⚠️ Dynamic padding lowered validation F1; keep --padding max_length until this is understood.")
+    if after["wall_clock_s"] and before["wall_clock_s"]:
+        print(f"Speed-up: {before['wall_clock_s'] / after['wall_clock_s']:.2f}x wall clock")
+
+def main():
+    ap = argparse.ArgumentParser(description="Fine-tune the intent classifier")
+    ap.add_argument("--padding", choices=["dynamic", "max_length"], default="dynamic")
+    ap.add_argument("--compare", action="store_true",
+                    help="Train with max_length padding, then dynamic padding, and report both")
+    ap.add_argument("--report", default="training_report.json", help="JSON throughput/accuracy report")
+    ap.add_argument("--batch-size", type=int, default=8)
+    ap.add_argument("--eval-batch-size", type=int, default=8)
+    ap.add_argument("--grad-accum", type=int, default=1, help="Gradient accumulation steps")
+    ap.add_argument("--dataloader-workers", type=int, default=0)
+    ap.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    ap.add_argument("--interop-threads", type=int, default=0, help="torch inter-op threads (0 = torch default)")
+    ap.add_argument("--bf16", action="store_true", help="bf16 autocast (CPU or GPU)")
+    ap.add_argument("--cache-dir", default=CACHE_DIR, help="Tokenized dataset cache")
+    ap.add_argument("--no-cache", action="store_true", help="Always re-tokenize")
+    ap.add_argument("--init-from", default=MODEL_NAME,
+                    help="Model to fine-tune from, e.g. ../models/intent_model for pruned variants")
+    ap.add_argument("--num-layers", type=int, default=None, help="Keep this many of the transformer layers")
+    ap.add_argument("--max-positions", type=int, default=None, help="Truncate position embeddings")
+    ap.add_argument("--train-file", default=TRAIN_PATH, help=".json array or .jsonl (loaded lazily)")
+    ap.add_argument("--val-file", default=VAL_PATH, help=".json array or .jsonl (loaded lazily)")
+    ap.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    ap.add_argument("--epochs", type=float, default=EPOCHS)
+    ap.add_argument("--warmup-steps", type=int, default=WARMUP_STEPS)
+    ap.add_argument("--weight-decay", type=float, default=WEIGHT_DECAY)
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("--early-stopping", type=int, default=0, help="Patience in epochs (0 = train all epochs)")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.interop_threads:
+        torch.set_num_interop_threads(args.interop_threads)
+
+    hf_login()
+    opts = dict(batch_size=args.batch_size, eval_batch_size=args.eval_batch_size, grad_accum=args.grad_accum,
+                dataloader_workers=args.dataloader_workers, bf16=args.bf16,
+                cache_dir=None if args.no_cache else args.cache_dir,
+                train_path=args.train_file, val_path=args.val_file,
+                model_name=args.init_from, num_layers=args.num_layers, max_positions=args.max_positions,
+                learning_rate=args.learning_rate, epochs=args.epochs, warmup_steps=args.warmup_steps,
+                weight_decay=args.weight_decay, seed=args.seed, early_stopping_patience=args.early_stopping)
+    if args.compare:
+        before = train("max_length", output_dir="models/intent_model_maxlen", save_dir="./intent_model_maxlen", **opts)
+        after = train("dynamic", **opts)
+        print_comparison(before, after)
+        report = {"before": before, "after": after}
+    else:
+        report = train(args.padding, **opts)
+        print(json.dumps(report, indent=2))
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report → {args.report}")
 
-# ------------------ SAVE ------------------
-trainer.save_model("./intent_model")
-tokenizer.save_pretrained("./intent_model")
+if __name__ == "__main__":
+    main()